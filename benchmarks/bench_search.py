@@ -0,0 +1,63 @@
+'''Benchmark of search results dataframe construction
+
+Compares the column-wise ilthermopy.search._SearchItemsToFrame with the former
+row-wise implementation (one dictionary per result row) on a synthetic search
+response of the full listing size.
+
+Usage:
+    python benchmarks/bench_search.py [n_rows]
+
+'''
+
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ilthermopy.search as search
+from ilthermopy.compound_list import SharedCompounds
+
+from payloads import SearchResponse
+
+
+def _SearchItemToRow(r):
+    '''Former row-wise implementation of search results transformation'''
+    row = {'id': r[0],
+           'reference': r[1],
+           'property': r[2],
+           'phases': r[3],
+           'num_phases': r[3].count(';') + 1,
+           'num_components': len(r) - 8,
+           'num_data_points': int(r[7])}
+    _cmp = SharedCompounds()
+    for i, j in enumerate(range(4, 7)):
+        code, name = (r[j], r[j+4]) if r[j] is not None else (None, None)
+        row[f'cmp{i+1}'] = name
+        row[f'cmp{i+1}_id'] = code
+        smiles = _cmp.id2smiles.get(code, None)
+        if not smiles:
+            smiles = _cmp.name2smiles.get(name, None)
+        row[f'cmp{i+1}_smiles'] = smiles
+    
+    return row
+
+
+def RowWise(res):
+    return pd.DataFrame([_SearchItemToRow(r) for r in res])
+
+
+def ColumnWise(res):
+    return search._SearchItemsToFrame(res)
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    res = SearchResponse(n_rows)['res']
+    old, new = RowWise(res), ColumnWise(res)
+    pd.testing.assert_frame_equal(old, new, check_dtype = False)
+    for func in (RowWise, ColumnWise):
+        runs = timeit.repeat(lambda: func(res), number = 1, repeat = 5)
+        print(f'{func.__name__:>10}: {min(runs) * 1000:8.1f} ms for {n_rows} rows')
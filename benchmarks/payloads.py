@@ -0,0 +1,119 @@
+'''Synthetic ILThermo API payloads of realistic structure and size
+
+All generators are seeded, so the payloads are identical between runs.
+
+'''
+
+import random
+
+from ilthermopy.compound_list import SharedCompounds
+
+
+PROPERTIES = ['Density', 'Viscosity', 'Heat capacity at constant pressure',
+              'Composition at phase equilibrium', 'Excess volume']
+PHASES = ['Liquid', 'Liquid;Gas', 'Crystal;Liquid', 'Liquid;Crystal of pure component 2']
+
+
+def _Formula(formula: str) -> str:
+    '''Transforms "C4 H10 O" formula to ILThermo's HTML format'''
+    tokens = []
+    for token in formula.split():
+        element = token.rstrip('0123456789.')
+        count = token[len(element):]
+        tokens.append(f'{element}<SUB>{count}</SUB>' if count else element)
+    
+    return ''.join(tokens)
+
+
+def EntryResponse(n_points: int = 50, n_components: int = 2, seed: int = 0) -> dict:
+    '''Generates data entry API response
+    
+    The table has pressure, mole fractions of all but the last component,
+    temperature, and viscosity with measurement error, as in typical
+    ILThermo entries.
+    
+    Arguments:
+        n_points: number of data points
+        n_components: number of components
+        seed: random seed
+    
+    Returns:
+        dictionary formatted as ilset response
+    
+    '''
+    rnd = random.Random(seed)
+    compounds = rnd.sample(SharedCompounds().records, n_components)
+    dhead = [['Pressure, kPa']]
+    dhead += [[f'Mole fraction of {c[1]}', 'Liquid'] for c in compounds[:-1]]
+    dhead += [['Temperature, K'], ['Viscosity, Pa&#8226;s', 'Liquid']]
+    data = []
+    for i in range(n_points):
+        row = [[f'{101.325:.3f}']]
+        row += [[f'{rnd.random():.4f}'] for c in compounds[:-1]]
+        row += [[f'{278.15 + i % 100:.2f}'], [f'{rnd.uniform(0.01, 1):.5f}', f'{rnd.uniform(0, 0.01):.1e}']]
+        data.append(row)
+    components = [{'idout': code, 'name': name, 'formula': _Formula(formula),
+                   'mw': f'{rnd.uniform(50, 500):.2f}',
+                   'sample': [['Source:', 'commercial source'], ['Purity:', '99 mass %']]} \
+                  for code, name, formula, smiles in compounds]
+    response = {'ref': {'full': 'Author, A.; Author, B. (2010) J. Chem. Eng. Data 55(1), 1-10.',
+                        'title': 'Viscosity of ionic liquid mixtures'},
+                'title': 'Transport properties: Viscosity',
+                'phases': ['Liquid'],
+                'components': components,
+                'expmeth': 'Capillary tube viscometer',
+                'solvent': None,
+                'constr': [],
+                'footer': '',
+                'dhead': dhead,
+                'data': data}
+    
+    return response
+
+
+def SearchResponse(n_rows: int = 50000, seed: int = 0) -> dict:
+    '''Generates search API response
+    
+    Arguments:
+        n_rows: number of found entries; the full ILThermo listing for
+            all numbers of compounds has about 50000 rows
+        seed: random seed
+    
+    Returns:
+        dictionary formatted as ilsearch response
+    
+    '''
+    rnd = random.Random(seed)
+    compounds = SharedCompounds().records
+    res = []
+    for i in range(n_rows):
+        n = rnd.choice( (1, 2, 3) )
+        cmps = rnd.sample(compounds, n)
+        codes = [c[0] for c in cmps]
+        if rnd.random() < 0.05: # outdated compound IDs, SMILES are retrieved via name
+            codes = [code[::-1] for code in codes]
+        row = [f'{i:05x}', f'Author{rnd.randrange(500)} et al. ({rnd.randrange(1990, 2023)})',
+               rnd.choice(PROPERTIES), rnd.choice(PHASES)]
+        row += codes + [None] * (3 - n) + [str(rnd.randrange(1, 1000))]
+        row += [c[1] for c in cmps]
+        res.append(row)
+    
+    return {'res': res, 'errors': []}
+
+
+def Formulas(n: int = 100000, seed: int = 0) -> list:
+    '''Returns ILThermo-formatted formulas of known compounds, repeated as in
+    a bulk download
+    
+    Arguments:
+        n: number of formulas
+        seed: random seed
+    
+    Returns:
+        list of HTML-formatted formulas
+    
+    '''
+    rnd = random.Random(seed)
+    formulas = [_Formula(record[2]) for record in SharedCompounds().records]
+    
+    return [rnd.choice(formulas) for _ in range(n)]
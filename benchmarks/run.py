@@ -0,0 +1,201 @@
+'''Benchmarks of parsing and search hot paths
+
+Each benchmark reports the best and median time of several runs and the peak
+memory allocated during a single run (tracemalloc). Payloads are synthetic
+and seeded (see payloads.py), so the results are comparable between commits.
+
+Usage:
+    python benchmarks/run.py                      # run all benchmarks
+    python benchmarks/run.py -k entry -r 10       # run matching benchmarks 10 times
+    python benchmarks/run.py -o new.json          # save results
+    python benchmarks/run.py -c old.json          # compare to saved results
+
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ilthermopy.data_structs as ds
+import ilthermopy.search as search
+import ilthermopy.compound_list as compound_list
+import ilthermopy.misc as misc
+import ilthermopy.units as units
+
+import payloads
+
+
+#%% Benchmarks
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    '''Registers function preparing the benchmark; it must return the callable
+    to be timed'''
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+@benchmark('ResponseToData[50 points]')
+def _():
+    response = payloads.EntryResponse(50)
+    return lambda: ds.ResponseToData(response)
+
+
+@benchmark('ResponseToData[10k points]')
+def _():
+    response = payloads.EntryResponse(10000, n_components = 3)
+    return lambda: ds.ResponseToData(response)
+
+
+@benchmark('ResponseToEntry[50 points]')
+def _():
+    response = payloads.EntryResponse(50)
+    return lambda: ds.ResponseToEntry('bench', response)
+
+
+@benchmark('ResponseToEntry[10k points]')
+def _():
+    response = payloads.EntryResponse(10000, n_components = 3)
+    return lambda: ds.ResponseToEntry('bench', response)
+
+
+@benchmark('ResponseToEntry[200 x 50 points, registry]')
+def _():
+    responses = [payloads.EntryResponse(50, seed = i % 20) for i in range(200)]
+    def run():
+        registry = ds.CompoundRegistry()
+        return [ds.ResponseToEntry('bench', r, keep_response = False, registry = registry) for r in responses]
+    return run
+
+
+@benchmark('Entry.Normalized[10k points]')
+def _():
+    entry = ds.ResponseToEntry('bench', payloads.EntryResponse(10000, n_components = 3))
+    return entry.Normalized
+
+
+@benchmark('ResponseToSearchResults[1k rows]')
+def _():
+    response = payloads.SearchResponse(1000)
+    return lambda: search.ResponseToSearchResults(response)
+
+
+@benchmark('ResponseToSearchResults[full listing, 50k rows]')
+def _():
+    response = payloads.SearchResponse(50000)
+    return lambda: search.ResponseToSearchResults(response)
+
+
+@benchmark('format_formula[100k, cold cache]')
+def _():
+    formulas = payloads.Formulas(100000)
+    def run():
+        misc.format_formula.cache_clear()
+        return [misc.format_formula(f) for f in formulas]
+    return run
+
+
+@benchmark('format_formula[100k, warm cache]')
+def _():
+    formulas = payloads.Formulas(100000)
+    for f in formulas:
+        misc.format_formula(f)
+    return lambda: [misc.format_formula(f) for f in formulas]
+
+
+@benchmark('ParseFullname[cold cache]')
+def _():
+    entry = ds.ResponseToEntry('bench', payloads.EntryResponse(50, n_components = 3))
+    headers = list(entry.header.values())
+    def run():
+        units.ParseFullname.cache_clear()
+        return [units.ParseFullname(h) for h in headers]
+    return run
+
+
+@benchmark('GetCompounds')
+def _():
+    return compound_list.GetCompounds
+
+
+@benchmark('GetCompounds().data')
+def _():
+    return lambda: compound_list.GetCompounds().data
+
+
+@benchmark('import ilthermopy (subprocess)')
+def _():
+    cmd = [sys.executable, '-c', 'import ilthermopy']
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    return lambda: subprocess.run(cmd, check = True, env = env)
+
+
+#%% Runner
+
+def Measure(func, repeat: int) -> dict:
+    '''Returns best and median time, seconds, and peak traced memory, bytes'''
+    func() # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {'best': min(times), 'median': statistics.median(times), 'peak': peak}
+
+
+def _FormatTime(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:7.2f} {unit:2}'
+    return f'{seconds / 1e-9:7.2f} ns'
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Runs ilthermopy benchmarks')
+    parser.add_argument('-k', '--filter', default = '', help = 'run benchmarks containing this substring')
+    parser.add_argument('-r', '--repeat', type = int, default = 5, help = 'number of timed runs')
+    parser.add_argument('-o', '--output', help = 'save results to the JSON file')
+    parser.add_argument('-c', '--compare', help = 'compare to results saved in the JSON file')
+    args = parser.parse_args()
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as inpf:
+            baseline = json.load(inpf)['results']
+    results = {}
+    width = max(len(name) for name in BENCHMARKS)
+    print(f'{"benchmark":{width}}  {"best":>10}  {"median":>10}  {"peak mem":>9}' + ('  vs baseline' if baseline else ''))
+    for name, setup in BENCHMARKS.items():
+        if args.filter.lower() not in name.lower():
+            continue
+        res = Measure(setup(), args.repeat)
+        results[name] = res
+        line = f'{name:{width}}  {_FormatTime(res["best"])}  {_FormatTime(res["median"])}  {res["peak"] / 2**20:6.1f} MB'
+        if name in baseline:
+            line += f'  {res["median"] / baseline[name]["median"]:6.2f}x time, {res["peak"] / max(baseline[name]["peak"], 1):5.2f}x mem'
+        print(line, flush = True)
+    if args.output:
+        meta = {'python': sys.version.split()[0], 'platform': sys.platform, 'repeat': args.repeat}
+        with open(args.output, 'w') as outf:
+            json.dump({'meta': meta, 'results': results}, outf, indent = 1)
+    
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,6 @@
 '''This package is a Python interface for the ILThermo 2.0 database that provides
 additional information about the chemical structure of compounds
 
-Attributes:
-    compounds (Compound): Compounds object, containing info on compound structures
-
 '''
 
 __version__ = '1.0.0'
@@ -11,10 +8,41 @@ __updated__ = 'June 28, 2023'
 __license__ = 'MIT'
 
 
-from ilthermopy.updates import CheckLastUpdate
-from ilthermopy.data_structs import PropertyList
-from ilthermopy.compound_list import GetCompounds
-from ilthermopy.search import ShowPropertyList, Search, GetAllEntries
-from ilthermopy.data_structs import GetEntry
+import importlib as _importlib
+
+
+# exported names are imported on first access, so that importing the package
+# or its light submodules (e.g. compound_list) does not load pandas
+_EXPORTS = {'Client': 'ilthermopy.requests',
+            'SetDefaultClient': 'ilthermopy.requests',
+            'ResponseCache': 'ilthermopy.cache',
+            'CheckLastUpdate': 'ilthermopy.updates',
+            'GetLastUpdate': 'ilthermopy.updates',
+            'PropertyList': 'ilthermopy.data_structs',
+            'GetCompounds': 'ilthermopy.compound_list',
+            'FindCompounds': 'ilthermopy.compound_index',
+            'ShowPropertyList': 'ilthermopy.search',
+            'Search': 'ilthermopy.search',
+            'GetAllEntries': 'ilthermopy.search',
+            'UpdateListing': 'ilthermopy.listing',
+            'GetEntry': 'ilthermopy.data_structs',
+            'GetEntriesBulk': 'ilthermopy.bulk',
+            'IterEntries': 'ilthermopy.bulk'}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(_importlib.import_module(module), name)
+    globals()[name] = value
+    
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
 
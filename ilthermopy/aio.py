@@ -0,0 +1,245 @@
+'''Asynchronous (asyncio) counterparts of the ILThermo API wrappers
+
+Requires aiohttp package (pip install ilthermopy[async]).
+
+'''
+
+import asyncio as _asyncio
+import json as _json
+import typing as _typing
+try:
+    from typing import Literal as _Literal
+except ImportError:
+    from typing_extensions import Literal as _Literal
+
+try:
+    import aiohttp as _aiohttp
+except ImportError:
+    _aiohttp = None
+
+import pandas as _pd
+
+import ilthermopy.requests as _req
+import ilthermopy.data_structs as _ds
+import ilthermopy.search as _search
+import ilthermopy.metrics as _metrics
+
+from ilthermopy.cache import ResponseCache
+
+
+class AsyncClient():
+    '''Asynchronous HTTP client for ILThermo APIs
+    
+    All requests share a single aiohttp session; the number of simultaneously
+    running requests is bounded by a semaphore, so thousands of coroutines can
+    be scheduled at once. Failed connections and responses with RETRY_STATUSES
+    codes are retried with exponential backoff. Responses are parsed by the
+    same functions as in the synchronous API.
+    
+    Arguments:
+        max_concurrency: max number of simultaneously running requests
+        timeout: total timeout of a single request, seconds
+        retries: max number of retries for a single request
+        backoff_factor: backoff factor for delays between retries, seconds
+        headers: additional HTTP headers sent with every request
+        cache: persistent response cache shared with synchronous clients;
+            responses are not cached if None; unlike requests.Client, the
+            cache is not cleared on database updates (invalidate_on_update)
+        base_url: if specified, replaces BASE_URL in requested URLs, e.g. to
+            use a local stand-in server (see testing.FixtureServer)
+    
+    Requests are reported as http.get events (see metrics module).
+    
+    Examples:
+        >>> async with AsyncClient(max_concurrency = 32) as client:
+        ...     df = await client.search(n_compounds = 1, year = 2004)
+        ...     entries = await asyncio.gather(*[client.get_entry(code) for code in df.id])
+    
+    '''
+    
+    def __init__(self, max_concurrency: int = 20,
+                       timeout: float = 60,
+                       retries: int = 3,
+                       backoff_factor: float = 0.5,
+                       headers: _typing.Optional[_typing.Dict[str, str]] = None,
+                       cache: _typing.Optional[ResponseCache] = None,
+                       base_url: _typing.Optional[str] = None):
+        if _aiohttp is None:
+            raise ImportError('AsyncClient requires aiohttp package: pip install aiohttp')
+        if max_concurrency < 1:
+            raise ValueError(f'Max concurrency must be positive: {max_concurrency}')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.headers = headers
+        self.cache = cache
+        self.base_url = base_url
+        self._session = None
+        self._semaphore = None
+        
+        return
+    
+    
+    async def __aenter__(self):
+        return self
+    
+    
+    async def __aexit__(self, *args):
+        await self.close()
+        
+        return
+    
+    
+    async def close(self) -> None:
+        '''Closes underlying HTTP session'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        
+        return
+    
+    
+    def _get_session(self):
+        '''Creates HTTP session inside the running event loop'''
+        if self._session is None:
+            connector = _aiohttp.TCPConnector(limit = self.max_concurrency)
+            timeout = _aiohttp.ClientTimeout(total = self.timeout)
+            self._session = _aiohttp.ClientSession(connector = connector,
+                                                   timeout = timeout,
+                                                   headers = self.headers)
+            self._semaphore = _asyncio.Semaphore(self.max_concurrency)
+        
+        return self._session
+    
+    
+    async def get(self, url: str,
+                        params: _typing.Optional[_typing.Dict] = None,
+                        use_cache: bool = True) -> bytes:
+        '''Sends GET request with retries and returns response body
+        
+        Arguments:
+            url: requested URL
+            params: query parameters
+            use_cache: if False, the response cache is bypassed
+        
+        Returns:
+            response body
+        
+        '''
+        url = _req._Rebase(url, self.base_url)
+        use_cache = use_cache and self.cache is not None
+        with _metrics.Span('http.get', url = url) as span:
+            if use_cache:
+                content = self.cache.get(url, params)
+                if content is not None:
+                    span.set(bytes = len(content), cached = True)
+                    return content
+            content = await self._request(url, params)
+            span.set(bytes = len(content), cached = False)
+        if use_cache:
+            self.cache.set(url, params, content)
+        
+        return content
+    
+    
+    async def _request(self, url: str, params: _typing.Optional[_typing.Dict]) -> bytes:
+        '''Sends GET request with retries and returns response body'''
+        session = self._get_session()
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                delay = self.backoff_factor * 2**attempt
+                try:
+                    async with session.get(url, params = params) as r:
+                        if r.status in _req.RETRY_STATUSES and attempt < self.retries:
+                            retry_after = r.headers.get('Retry-After', '')
+                            if retry_after.isdigit():
+                                delay = float(retry_after)
+                        else:
+                            r.raise_for_status()
+                            return await r.read()
+                except (_aiohttp.ClientConnectionError, _asyncio.TimeoutError):
+                    if attempt == self.retries:
+                        raise
+                await _asyncio.sleep(delay)
+        
+        return
+    
+    
+    async def get_property_list(self) -> _ds.PropertyList:
+        '''Extracts available ILThermo properties and their API keys
+        
+        Returns:
+            PropertyList object
+        
+        '''
+        response = _json.loads(await self.get(_req.PROPS_URL))
+        
+        return _ds.PropertyList(response = response)
+    
+    
+    async def search(self, compound: _typing.Optional[str] = None,
+                           n_compounds: _Literal[None,1,2,3] = None,
+                           prop: _typing.Optional[str] = None,
+                           prop_key: _typing.Optional[str] = None,
+                           year: _typing.Optional[int] = None,
+                           author: _typing.Optional[str] = None,
+                           keywords: _typing.Optional[str] = None) -> _pd.DataFrame:
+        '''Runs ILThermo search and returns results as a dataframe
+        
+        Property name is translated to its key with the property list shared
+        with the synchronous API (data_structs.SharedPropertyList), which is
+        only requested from ILThermo if the stored copy is outdated.
+        
+        Arguments:
+            compound: chemical formula, CAS registry number, or name (part or full)
+            n_compounds: number of mixture compounds
+            prop: name of physico-chemical property, only used if prop_key is not specified
+            prop_key: key of physico-chemical property (view available via get_property_list)
+            year: publication year
+            author: author's last name
+            keywords: keywords presumably specified in paper's title
+        
+        Returns:
+            dataframe containing main info on found entries
+        
+        '''
+        if not prop_key and prop:
+            # may read the disk copy or send a request, so it does not block the loop
+            plist = await _asyncio.get_running_loop().run_in_executor(None, _ds.SharedPropertyList)
+            prop_key = _search.PropertyKey(prop, plist)
+        params = _req.SearchParams(compound, n_compounds, prop_key, year, author, keywords)
+        response = _json.loads(await self.get(_req.SEARCH_URL, params))
+        
+        return _search.ResponseToSearchResults(response)
+    
+    
+    async def get_entry(self, code: str) -> _ds.Entry:
+        '''Extracts data entry from ILThermo database
+        
+        Arguments:
+            code: data entry ID
+        
+        Returns:
+            Entry object
+        
+        '''
+        response = _json.loads(await self.get(_req.DATA_URL, {'set': code}))
+        
+        return _ds.ResponseToEntry(code, response)
+    
+    
+    async def get_compound_image(self, idout: str) -> bytes:
+        '''Loads compound's image
+        
+        Arguments:
+            idout: compound ID
+        
+        Returns:
+            bytes-formatted PNG image
+        
+        '''
+        
+        return await self.get(_req.IMAGE_URL, {'key': idout})
+
+
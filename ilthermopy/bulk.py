@@ -0,0 +1,241 @@
+'''Concurrent download of multiple data entries'''
+
+import collections as _collections
+import itertools as _itertools
+import threading as _threading
+import time as _time
+import typing as _typing
+try:
+    from typing import Literal as _Literal
+except ImportError:
+    from typing_extensions import Literal as _Literal
+from concurrent import futures as _futures
+from dataclasses import dataclass as _dataclass
+from dataclasses import field as _field
+
+import ilthermopy.requests as _req
+import ilthermopy.data_structs as _ds
+import ilthermopy.search as _search
+
+
+#%% Rate limiting
+
+class RateLimiter():
+    '''Thread-safe limiter spacing consecutive calls evenly in time
+    
+    Arguments:
+        rate: max number of calls per second
+    
+    '''
+    
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError(f'Rate limit must be positive: {rate}')
+        self.interval = 1.0 / rate
+        self._next = _time.monotonic()
+        self._lock = _threading.Lock()
+        
+        return
+    
+    
+    def wait(self) -> None:
+        '''Blocks until the next call is allowed'''
+        with self._lock:
+            now = _time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            _time.sleep(start - now)
+        
+        return
+
+
+#%% Bulk mapping
+
+def _BulkMap(func: _typing.Callable,
+             items: _typing.Iterable,
+             max_workers: int,
+             rate_limit: _typing.Optional[float]) -> _typing.Iterator[_typing.Tuple[_typing.Any, _typing.Any, _typing.Optional[Exception]]]:
+    '''Applies func to items in a thread pool and yields (item, result, error)
+    tuples in order of completion; only a bounded window of items is submitted
+    at once, and remaining tasks are cancelled if the generator is closed'''
+    if max_workers < 1:
+        raise ValueError(f'Number of workers must be positive: {max_workers}')
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    
+    def call(item):
+        if limiter is not None:
+            limiter.wait()
+        return func(item)
+    
+    items = iter(items)
+    pending = {}
+    executor = _futures.ThreadPoolExecutor(max_workers)
+    try:
+        for item in _itertools.islice(items, 2 * max_workers):
+            pending[executor.submit(call, item)] = item
+        while pending:
+            done, _ = _futures.wait(pending, return_when = _futures.FIRST_COMPLETED)
+            results = []
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    results.append( (item, future.result(), None) )
+                except Exception as e:
+                    results.append( (item, None, e) )
+            # keep workers busy while results are consumed
+            for item in _itertools.islice(items, len(done)):
+                pending[executor.submit(call, item)] = item
+            yield from results
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait = False)
+    
+    return
+
+
+#%% Entries
+
+@_dataclass
+class BulkResult():
+    '''Result of loading a single entry during bulk download'''
+    
+    id: str
+    '''data entry ID'''
+    
+    entry: _typing.Optional[_ds.Entry] = _field(default = None)
+    '''loaded entry; None if loading failed'''
+    
+    error: _typing.Optional[Exception] = _field(default = None)
+    '''exception raised during loading; None if entry was loaded successfully'''
+    
+    @property
+    def ok(self) -> bool:
+        '''True if entry was loaded successfully'''
+        return self.error is None
+
+
+
+def GetEntriesBulk(ids: _typing.Iterable[str],
+                   max_workers: int = 8,
+                   rate_limit: _typing.Optional[float] = None,
+                   client: _typing.Optional[_req.Client] = None,
+                   keep_response: _typing.Union[bool, _Literal['compressed']] = True,
+                   registry: _typing.Optional[_ds.CompoundRegistry] = None) -> _typing.Iterator[BulkResult]:
+    '''Concurrently loads data entries and yields them as soon as they are ready
+    
+    Failure of a single entry (e.g. ILThermoResponseError or HTTP error after
+    all retries) does not abort the download; the exception is returned in the
+    corresponding BulkResult instead.
+    
+    Arguments:
+        ids: data entry IDs, e.g. id column of the GetAllEntries output
+        max_workers: number of download threads; should not exceed pool_size
+            of the client
+        rate_limit: max number of requests per second; no limit if None
+        client: HTTP client; default client is used if not specified
+        keep_response: how to store raw response in the entries: as is (True),
+            compressed ('compressed'), or not at all (False)
+        registry: if specified, components are shared by loaded entries
+            (see data_structs.CompoundRegistry)
+    
+    Returns:
+        iterator over BulkResult objects in order of completion
+    
+    Examples:
+        >>> ids = ilt.GetAllEntries().id
+        >>> for res in GetEntriesBulk(ids, max_workers = 8, rate_limit = 10):
+        ...     if res.ok:
+        ...         process(res.entry)
+    
+    '''
+    func = lambda code: _ds.GetEntry(code, client, keep_response, registry)
+    for code, entry, error in _BulkMap(func, ids, max_workers, rate_limit):
+        yield BulkResult(id = code, entry = entry, error = error)
+    
+    return
+
+
+
+def IterEntries(ids: _typing.Optional[_typing.Iterable[str]] = None,
+                prefetch: int = 16,
+                max_workers: int = 4,
+                rate_limit: _typing.Optional[float] = None,
+                skip_errors: bool = False,
+                client: _typing.Optional[_req.Client] = None,
+                keep_response: _typing.Union[bool, _Literal['compressed']] = True,
+                registry: _typing.Optional[_ds.CompoundRegistry] = None,
+                **search_kwargs) -> _typing.Iterator[_ds.Entry]:
+    '''Lazily loads data entries keeping only a bounded number of them in memory
+    
+    Raw responses are downloaded in background threads at most prefetch
+    entries ahead, and each one is parsed only when the corresponding entry
+    is requested, so whole-database scans run in constant memory while
+    downloading overlaps with processing of already loaded entries.
+    
+    Arguments:
+        ids: data entry IDs; if not specified, IDs are taken from Search
+            results for search_kwargs, or from GetAllEntries if no search
+            parameters are given
+        prefetch: max number of entries downloaded ahead
+        max_workers: number of download threads
+        rate_limit: max number of requests per second; no limit if None
+        skip_errors: if True, entries which failed to load are skipped,
+            otherwise the exception is raised
+        client: HTTP client; default client is used if not specified
+        keep_response: how to store raw response in the entries: as is (True),
+            compressed ('compressed'), or not at all (False)
+        registry: if specified, components are shared by loaded entries
+            (see data_structs.CompoundRegistry)
+        search_kwargs: parameters passed to Search if ids are not specified
+    
+    Returns:
+        iterator over Entry objects in order of ids
+    
+    Examples:
+        >>> for entry in IterEntries(prop = 'Viscosity', n_compounds = 1, prefetch = 32):
+        ...     process(entry)
+    
+    '''
+    if prefetch < 1 or max_workers < 1:
+        raise ValueError(f'Prefetch and number of workers must be positive: {prefetch}, {max_workers}')
+    if ids is None:
+        if search_kwargs:
+            listing = _search.Search(client = client, **search_kwargs)
+        else:
+            listing = _search.GetAllEntries(client = client)
+        ids = listing['id'].tolist()
+        del listing
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    
+    def fetch(code):
+        if limiter is not None:
+            limiter.wait()
+        return _req.GetEntryData(code, client)
+    
+    ids = iter(ids)
+    window = _collections.deque()
+    executor = _futures.ThreadPoolExecutor(max_workers)
+    try:
+        for code in _itertools.islice(ids, prefetch):
+            window.append( (code, executor.submit(fetch, code)) )
+        while window:
+            code, future = window.popleft()
+            for next_code in _itertools.islice(ids, 1):
+                window.append( (next_code, executor.submit(fetch, next_code)) )
+            try:
+                entry = _ds.ResponseToEntry(code, future.result(), keep_response, registry)
+            except Exception:
+                if skip_errors:
+                    continue
+                raise
+            yield entry
+    finally:
+        for code, future in window:
+            future.cancel()
+        executor.shutdown(wait = False)
+    
+    return
+
+
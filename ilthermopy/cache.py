@@ -0,0 +1,291 @@
+'''Persistent on-disk cache of ILThermo API responses'''
+
+import os as _os
+import sys as _sys
+import time as _time
+import zlib as _zlib
+import sqlite3 as _sqlite3
+import hashlib as _hashlib
+import threading as _threading
+import typing as _typing
+from urllib.parse import urlencode as _urlencode
+from dataclasses import dataclass as _dataclass
+
+import ilthermopy.json_stream as _json_stream
+
+
+def CacheDir() -> str:
+    '''Returns default directory for ilthermopy's cached data
+    
+    Returns:
+        path to the directory; ILTHERMOPY_CACHE_DIR environment variable is used
+            if specified, otherwise platform-specific user cache directory
+    
+    '''
+    path = _os.environ.get('ILTHERMOPY_CACHE_DIR')
+    if path:
+        return path
+    if _sys.platform.startswith('win'):
+        root = _os.environ.get('LOCALAPPDATA', _os.path.expanduser('~'))
+    elif _sys.platform == 'darwin':
+        root = _os.path.expanduser('~/Library/Caches')
+    else:
+        root = _os.environ.get('XDG_CACHE_HOME', _os.path.expanduser('~/.cache'))
+    
+    return _os.path.join(root, 'ilthermopy')
+
+
+def CacheKey(url: str, params: _typing.Optional[_typing.Dict] = None) -> str:
+    '''Returns unique key of the request
+    
+    Arguments:
+        url: requested URL
+        params: query parameters
+    
+    Returns:
+        SHA-256 hex digest of URL and sorted query parameters
+    
+    '''
+    query = _urlencode(sorted((params or {}).items()))
+    
+    return _hashlib.sha256(f'{url}?{query}'.encode()).hexdigest()
+
+
+def _IsErrorResponse(content: bytes) -> bool:
+    '''Checks if the response is a JSON object with errors field, e.g. search
+    error returned with status 200'''
+    if not content.lstrip().startswith(b'{') or b'"errors"' not in content:
+        return False
+    try:
+        response = _json_stream.loads(content)
+    except ValueError:
+        return False
+    
+    return isinstance(response, dict) and bool(response.get('errors'))
+
+
+@_dataclass
+class CacheStats():
+    '''Usage statistics of the response cache'''
+    
+    hits: int = 0
+    '''number of requests served from the cache'''
+    
+    misses: int = 0
+    '''number of requests not found in the cache (including expired ones)'''
+    
+    expired: int = 0
+    '''number of found responses which were discarded due to TTL'''
+    
+    evictions: int = 0
+    '''number of responses removed to keep the cache size bounded'''
+    
+    entries: int = 0
+    '''number of stored responses'''
+    
+    size: int = 0
+    '''total size of stored compressed responses, bytes'''
+    
+    @property
+    def hit_rate(self) -> float:
+        '''fraction of requests served from the cache'''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+
+class ResponseCache():
+    '''SQLite-backed cache of zlib-compressed API responses
+    
+    Responses are keyed by URL and query parameters. Expired responses are
+    dropped on access, and least recently used responses are evicted if the
+    total size exceeds the limit. JSON responses with errors field are not
+    stored. To use the cache, pass it to the HTTP client:
+    
+        >>> client = Client(cache = ResponseCache(ttl = 7*24*3600))
+        >>> SetDefaultClient(client)
+    
+    Arguments:
+        path: path to the SQLite file; responses.sqlite in CacheDir() by default
+        ttl: time to live of stored responses, seconds; no expiration if None
+        max_size: max total size of stored compressed responses, bytes;
+            no limit if None
+        invalidate_on_update: if True, the cache is cleared as soon as the
+            "Updated on" date of the ILThermo homepage differs from the stored one
+        compression: zlib compression level
+    
+    Attributes:
+        path (str): path to the SQLite file
+    
+    '''
+    
+    def __init__(self, path: _typing.Optional[str] = None,
+                       ttl: _typing.Optional[float] = None,
+                       max_size: _typing.Optional[int] = 512 * 2**20,
+                       invalidate_on_update: bool = False,
+                       compression: int = 6):
+        if path is None:
+            path = _os.path.join(CacheDir(), 'responses.sqlite')
+        directory = _os.path.dirname(_os.path.abspath(path))
+        _os.makedirs(directory, exist_ok = True)
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.invalidate_on_update = invalidate_on_update
+        self.compression = compression
+        self._stats = CacheStats()
+        self._lock = _threading.Lock()
+        self._conn = _sqlite3.connect(path, check_same_thread = False)
+        with self._lock, self._conn:
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                      key TEXT PRIMARY KEY,
+                                      url TEXT,
+                                      created REAL,
+                                      accessed REAL,
+                                      size INTEGER,
+                                      data BLOB)''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        
+        return
+    
+    
+    def get(self, url: str,
+                  params: _typing.Optional[_typing.Dict] = None) -> _typing.Optional[bytes]:
+        '''Returns stored response body
+        
+        Arguments:
+            url: requested URL
+            params: query parameters
+        
+        Returns:
+            response body; None if response is not stored or expired
+        
+        '''
+        key = CacheKey(url, params)
+        now = _time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT created, data FROM responses WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            created, data = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._stats.expired += 1
+                self._stats.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self._stats.hits += 1
+        
+        return _zlib.decompress(data)
+    
+    
+    def set(self, url: str,
+                  params: _typing.Optional[_typing.Dict],
+                  content: bytes) -> None:
+        '''Stores response body
+        
+        Arguments:
+            url: requested URL
+            params: query parameters
+            content: response body; not stored if it is a JSON object with
+                errors field
+        
+        '''
+        if _IsErrorResponse(content):
+            return
+        key = CacheKey(url, params)
+        data = _zlib.compress(content, self.compression)
+        now = _time.time()
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, url, now, now, len(data), data))
+            if self.max_size is not None:
+                self._evict()
+        
+        return
+    
+    
+    def _size(self) -> int:
+        '''Returns total size of stored responses, which may be written by
+        other processes as well'''
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    
+    
+    def _evict(self) -> None:
+        '''Removes least recently used responses until the size limit is met'''
+        total = self._size()
+        if total <= self.max_size:
+            return
+        cursor = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed')
+        keys = []
+        for key, size in cursor:
+            if total <= self.max_size:
+                break
+            keys.append( (key,) )
+            total -= size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', keys)
+        self._stats.evictions += len(keys)
+        
+        return
+    
+    
+    def clear(self) -> None:
+        '''Removes all stored responses'''
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses')
+        
+        return
+    
+    
+    def check_update(self, db_updated: str) -> bool:
+        '''Clears the cache if database update date differs from the stored one
+        
+        Arguments:
+            db_updated: date of the last ILThermo 2.0 update
+        
+        Returns:
+            True if the cache was cleared, i.e. the stored date was missing or
+                outdated
+        
+        '''
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'db_updated'").fetchone()
+            outdated = row is None or row[0] != db_updated
+            if outdated:
+                self._conn.execute('DELETE FROM responses')
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('db_updated', ?)", (db_updated,))
+        
+        return outdated
+    
+    
+    def stats(self) -> CacheStats:
+        '''Returns usage statistics of the cache
+        
+        Returns:
+            CacheStats object; hits, misses, expired and evictions are counted
+                since the cache object was created
+        
+        '''
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            stats = CacheStats(hits = self._stats.hits,
+                               misses = self._stats.misses,
+                               expired = self._stats.expired,
+                               evictions = self._stats.evictions,
+                               entries = entries,
+                               size = self._size())
+        
+        return stats
+    
+    
+    def close(self) -> None:
+        '''Closes the database connection'''
+        with self._lock:
+            self._conn.close()
+        
+        return
+
+
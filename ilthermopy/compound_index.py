@@ -0,0 +1,332 @@
+'''In-memory index of known compounds for offline lookups
+
+The index is built from the compound table shipped with the package (see
+compound_list) and resolves compound IDs, SMILES (whole or one of the
+dot-separated ions), chemical formulas in any element order, and name
+fragments without requests to ILThermo. Names are indexed by character
+trigrams, which also provide candidates for fuzzy matching.
+
+'''
+
+import re as _re
+import difflib as _difflib
+import threading as _threading
+import typing as _typing
+from itertools import chain as _chain
+try:
+    from typing import Literal as _Literal
+except ImportError:
+    from typing_extensions import Literal as _Literal
+
+import numpy as _np
+import pandas as _pd
+
+import ilthermopy.misc as _misc
+import ilthermopy.compound_list as _compound_list
+
+
+Record = _typing.Tuple[str, str, str, str]
+
+_FORMULA = _re.compile(r'(?:\s*[A-Z][a-z]?\s*(?:<SUB>)?\s*\d*(?:\.\d+)?\s*(?:</SUB>)?)+\s*')
+
+
+def _Trigrams(text: str) -> _typing.List[str]:
+    '''Returns distinct character trigrams of the text'''
+    return list(dict.fromkeys(text[i:i+3] for i in range(len(text) - 2)))
+
+
+def FormulaKey(formula: str) -> _typing.Optional[str]:
+    '''Transforms chemical formula to the canonical form independent of element order
+    
+    Arguments:
+        formula: chemical formula, e.g. "C8H15F6N2P", "C8 F6 H15 N2 P", or
+            HTML-formatted formula in ILThermo 2.0 format
+    
+    Returns:
+        formula formatted as by misc.format_formula, e.g. "C8 F6 H15 N2 P";
+            None if the text is not a chemical formula
+    
+    '''
+    if not _FORMULA.fullmatch(formula):
+        return None
+    counts = sorted(_misc.parse_formula(formula).items())
+    if not counts:
+        return None
+    
+    return ' '.join(f'{element}{count}' if count != 1 else element for element, count in counts)
+
+
+class CompoundIndex():
+    '''Index of compounds supporting lookups by ID, SMILES, formula, and name
+    
+    Arguments:
+        compounds: compound table; shared table of the package
+            (compound_list.SharedCompounds) is used if not specified
+    
+    Attributes:
+        records (list): list of (id, name, formula, smiles) tuples
+    
+    Examples:
+        >>> index = CompoundIndex()
+        >>> index.find('C8H15F6N2P')
+        [('ABChct', '1-butyl-3-methylimidazolium hexafluorophosphate', 'C8 F6 H15 N2 P', ...)]
+        >>> index.fuzzy('1-butyl-3-methylimidazolium hexafluorphosphate', limit = 1)
+    
+    '''
+    
+    def __init__(self, compounds: _typing.Optional[_compound_list.Compounds] = None):
+        if compounds is None:
+            compounds = _compound_list.SharedCompounds()
+        self.records = compounds.records
+        self._ids = {}
+        self._smiles = {}
+        self._formulas = {}
+        for i, (code, name, formula, smiles) in enumerate(self.records):
+            self._ids.setdefault(code, i)
+            if smiles:
+                self._smiles.setdefault(smiles, []).append(i)
+                for ion in set(smiles.split('.')) - {smiles}:
+                    self._smiles.setdefault(ion, []).append(i)
+            key = FormulaKey(formula) if formula else None
+            if key:
+                self._formulas.setdefault(key, []).append(i)
+        # names padded with spaces, so that trigrams mark word boundaries
+        self._names = [f' {name.lower()} ' for code, name, formula, smiles in self.records]
+        trigrams = [_Trigrams(name) for name in self._names]
+        self._num_trigrams = _np.array([len(t) for t in trigrams], dtype = _np.int32)
+        # posting lists: positions of names containing each trigram
+        vocabulary = {}
+        codes = _np.array([vocabulary.setdefault(t, len(vocabulary)) for t in _chain.from_iterable(trigrams)],
+                          dtype = _np.int32)
+        owners = _np.repeat(_np.arange(len(self._names), dtype = _np.int32), self._num_trigrams)
+        owners = owners[_np.argsort(codes, kind = 'stable')]
+        bounds = _np.concatenate([[0], _np.cumsum(_np.bincount(codes, minlength = len(vocabulary)))])
+        self._postings = {t: owners[bounds[j]:bounds[j+1]] for t, j in vocabulary.items()}
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    
+    def _records(self, positions: _typing.Iterable[int]) -> _typing.List[Record]:
+        return [self.records[i] for i in positions]
+    
+    
+    def by_id(self, code: str) -> _typing.List[Record]:
+        '''Returns compound with the given ID
+        
+        Arguments:
+            code: ILThermo compound ID
+        
+        Returns:
+            list containing matching record, or empty list
+        
+        '''
+        i = self._ids.get(code)
+        
+        return [] if i is None else [self.records[i]]
+    
+    
+    def by_smiles(self, smiles: str) -> _typing.List[Record]:
+        '''Returns compounds with the given SMILES or containing the given ion
+        
+        Arguments:
+            smiles: SMILES of the compound or of one of its dot-separated
+                components, e.g. "F[P-](F)(F)(F)(F)F"; SMILES are compared as
+                strings, as in the compound table
+        
+        Returns:
+            list of matching records
+        
+        '''
+        return self._records(self._smiles.get(smiles.strip(), []))
+    
+    
+    def by_formula(self, formula: str) -> _typing.List[Record]:
+        '''Returns compounds with the given chemical formula
+        
+        Arguments:
+            formula: chemical formula with elements in any order (see FormulaKey)
+        
+        Returns:
+            list of matching records
+        
+        '''
+        key = FormulaKey(formula)
+        
+        return self._records(self._formulas.get(key, [])) if key else []
+    
+    
+    def _overlap(self, trigrams: _typing.List[str]) -> _np.ndarray:
+        '''Returns number of the trigrams contained in each name'''
+        arrays = [self._postings[t] for t in trigrams if t in self._postings]
+        if not arrays:
+            return _np.zeros(len(self.records), dtype = _np.int64)
+        
+        return _np.bincount(_np.concatenate(arrays), minlength = len(self.records))
+    
+    
+    def by_name(self, fragment: str) -> _typing.List[Record]:
+        '''Returns compounds whose names contain the fragment (case-insensitive)
+        
+        Arguments:
+            fragment: part of the compound name
+        
+        Returns:
+            list of matching records: exact matches first, then names starting
+                with the fragment, then the others; shorter names go first
+                within each group
+        
+        '''
+        query = fragment.strip().lower()
+        if not query:
+            return []
+        trigrams = _Trigrams(query)
+        if trigrams:
+            candidates = _np.flatnonzero(self._overlap(trigrams) == len(trigrams))
+        else:
+            candidates = range(len(self.records))
+        found = []
+        for i in candidates:
+            name = self._names[i]
+            pos = name.find(query)
+            if pos >= 0:
+                rank = 0 if len(name) == len(query) + 2 else 1 if pos == 1 else 2
+                found.append( (rank, len(name), int(i)) )
+        found.sort()
+        
+        return self._records(i for rank, length, i in found)
+    
+    
+    def find(self, query: str,
+                   kind: _Literal['auto', 'id', 'smiles', 'formula', 'name'] = 'auto',
+                   limit: _typing.Optional[int] = None) -> _typing.List[Record]:
+        '''Finds compounds matching the query
+        
+        Arguments:
+            query: compound ID, SMILES, chemical formula, or name fragment
+            kind: type of the query; if 'auto', the query is tried as ID,
+                SMILES, formula, and name fragment, and the first non-empty
+                result is returned
+            limit: max number of returned records; all are returned if None
+        
+        Returns:
+            list of (id, name, formula, smiles) tuples
+        
+        '''
+        lookups = {'id': self.by_id, 'smiles': self.by_smiles,
+                   'formula': self.by_formula, 'name': self.by_name}
+        if kind == 'auto':
+            found = []
+            for lookup in lookups.values():
+                found = lookup(query)
+                if found:
+                    break
+        elif kind in lookups:
+            found = lookups[kind](query)
+        else:
+            raise ValueError(f'Unknown query kind: {kind}')
+        
+        return found[:limit] if limit is not None else found
+    
+    
+    def fuzzy(self, name: str,
+                    limit: int = 10,
+                    min_score: float = 0.5,
+                    num_candidates: int = 20) -> _typing.List[_typing.Tuple[Record, float]]:
+        '''Finds compounds with names similar to the given one, e.g. misspelled
+        
+        Candidates sharing most trigrams with the name are ranked by
+        difflib.SequenceMatcher similarity of lowercase names.
+        
+        Arguments:
+            name: compound name
+            limit: max number of returned records
+            min_score: min similarity, from 0 to 1
+            num_candidates: number of candidates compared with the name
+        
+        Returns:
+            list of (record, similarity) tuples sorted by decreasing similarity
+        
+        '''
+        query = f' {name.strip().lower()} '
+        trigrams = _Trigrams(query)
+        if not trigrams:
+            return []
+        overlap = self._overlap(trigrams)
+        dice = 2 * overlap / (len(trigrams) + self._num_trigrams)
+        num_candidates = min(num_candidates, len(self.records))
+        candidates = _np.argpartition(-dice, num_candidates - 1)[:num_candidates]
+        matcher = _difflib.SequenceMatcher(autojunk = False)
+        matcher.set_seq2(query.strip())
+        scored = []
+        for i in candidates:
+            if overlap[i] == 0:
+                continue
+            matcher.set_seq1(self._names[i].strip())
+            score = matcher.ratio()
+            if score >= min_score:
+                scored.append( (score, self.records[i]) )
+        scored.sort(key = lambda x: -x[0])
+        
+        return [(record, score) for score, record in scored[:limit]]
+
+
+
+_index = None
+_index_lock = _threading.Lock()
+
+
+def SharedCompoundIndex() -> CompoundIndex:
+    '''Returns compound index shared by the package, building it on first call
+    
+    Returns:
+        CompoundIndex object of the shared compound table
+    
+    '''
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CompoundIndex()
+    
+    return _index
+
+
+def FindCompounds(query: str,
+                  kind: _Literal['auto', 'id', 'smiles', 'formula', 'name'] = 'auto',
+                  fuzzy: bool = False,
+                  limit: _typing.Optional[int] = None) -> _pd.DataFrame:
+    '''Finds known compounds offline by ID, SMILES, formula, or name
+    
+    Arguments:
+        query: compound ID, SMILES, chemical formula, or name fragment
+        kind: type of the query; if 'auto', the first of ID, SMILES, formula,
+            and name fragment giving any results is used (see CompoundIndex.find)
+        fuzzy: if True, query is treated as a possibly misspelled name, and
+            compounds are ranked by name similarity
+        limit: max number of returned compounds; 10 if fuzzy is True, and
+            no limit otherwise
+    
+    Returns:
+        dataframe with id, name, formula, and smiles columns, and score
+            column (similarity from 0 to 1) if fuzzy is True
+    
+    Examples:
+        >>> FindCompounds('methylimidazolium hexafluoro')
+        >>> FindCompounds('C8H15F6N2P')
+        >>> FindCompounds('1-butyl-3-metylimidazolium chloride', fuzzy = True, limit = 3)
+    
+    '''
+    index = SharedCompoundIndex()
+    columns = ['id', 'name', 'formula', 'smiles']
+    if fuzzy:
+        found = index.fuzzy(query, limit = 10 if limit is None else limit)
+        df = _pd.DataFrame([record for record, score in found], columns = columns)
+        df['score'] = [score for record, score in found]
+    else:
+        df = _pd.DataFrame(index.find(query, kind, limit), columns = columns)
+    
+    return df
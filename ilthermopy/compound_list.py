@@ -1,7 +1,8 @@
 '''Loads pre-readied info on compounds structure
 
-Attributes:
-    compounds (Compounds): Compounds object, containing info on compound structures
+The compound table is not loaded on import: it is read on first access to the
+shared Compounds object (see SharedCompounds), and the pandas dataframe is only
+built when the data attribute is requested.
 
 '''
 
@@ -11,22 +12,72 @@ if _sys.version_info < (3, 9):
 else:
     import importlib.resources as _importlib_resources
 
-from dataclasses import dataclass as _dataclass
+import csv as _csv
+import io as _io
+import threading as _threading
 import typing as _typing
 
-import pandas as _pd
+
+COMPOUNDS_FILE = 'compounds.csv'
 
 
-@_dataclass(repr = False)
 class Compounds():
-    '''Contains info on compounds' structure'''
-    data: _pd.DataFrame
-    '''dataframe, containing compound's ID, name, chemical formula (all 
-    extracted from ILThermo 2.0), and manually verified SMILES'''
-    id2smiles: _typing.Dict[str, str]
-    '''dictionary mapping ILThermo's compound ids to SMILES'''
-    name2smiles: _typing.Dict[str, str]
-    '''dictionary mapping ILThermo's compound names to SMILES'''
+    '''Contains info on compounds' structure
+    
+    Arguments:
+        data: dataframe with id, name, formula, and smiles columns; not
+            needed if records are specified
+        id2smiles: dictionary mapping compound ids to SMILES; built from the
+            table if not specified
+        name2smiles: dictionary mapping compound names to SMILES; built from
+            the table if not specified
+        records: list of (id, name, formula, smiles) tuples, which can be
+            passed instead of data to avoid building the dataframe
+    
+    Attributes:
+        records (list): list of (id, name, formula, smiles) tuples
+        id2smiles (dict): dictionary mapping ILThermo's compound ids to SMILES
+        name2smiles (dict): dictionary mapping ILThermo's compound names to SMILES
+    
+    '''
+    
+    def __init__(self, data = None,
+                       id2smiles: _typing.Optional[_typing.Dict[str, str]] = None,
+                       name2smiles: _typing.Optional[_typing.Dict[str, str]] = None,
+                       records: _typing.Optional[_typing.List[_typing.Tuple[str, str, str, str]]] = None):
+        if records is None:
+            if data is None:
+                raise TypeError('Either data or records must be specified')
+            records = list(zip(data['id'], data['name'], data['formula'], data['smiles']))
+        self.records = records
+        self.id2smiles = id2smiles if id2smiles is not None else {code: smiles for code, name, formula, smiles in records}
+        self.name2smiles = name2smiles if name2smiles is not None else {name: smiles for code, name, formula, smiles in records}
+        self._data = data
+        
+        return
+    
+    
+    @property
+    def data(self):
+        '''dataframe, containing compound's ID, name, chemical formula (all
+        extracted from ILThermo 2.0), and manually verified SMILES'''
+        if self._data is None:
+            import pandas as _pd
+            self._data = _pd.DataFrame(self.records, columns = ['id', 'name', 'formula', 'smiles'])
+        
+        return self._data
+
+
+
+def _ReadRecords() -> _typing.List[_typing.Tuple[str, str, str, str]]:
+    '''Reads compound records from pre-readied csv-file'''
+    pkg = _importlib_resources.files('ilthermopy')
+    text = (pkg / COMPOUNDS_FILE).read_text(encoding = 'utf-8')
+    reader = _csv.reader(_io.StringIO(text))
+    next(reader) # header
+    records = [tuple(row) for row in reader if row]
+    
+    return records
 
 
 def GetCompounds() -> Compounds:
@@ -36,18 +87,28 @@ def GetCompounds() -> Compounds:
         Compounds object
     
     '''
-    # read data
-    pkg = _importlib_resources.files('ilthermopy')
-    data_file = pkg / 'compounds.csv'
-    with _importlib_resources.as_file(data_file) as path:
-        data = _pd.read_csv(path)
-    # prepare data
-    id2smiles = {code: smiles for code, smiles in zip(data.id, data.smiles)}
-    name2smiles = {name: smiles for name, smiles in zip(data.name, data.smiles)}
-    compounds = Compounds(data, id2smiles, name2smiles)
+    compounds = Compounds(records = _ReadRecords())
     
     return compounds
 
 
-_compounds = GetCompounds()
+_compounds = None
+_compounds_lock = _threading.Lock()
+
+
+def SharedCompounds() -> Compounds:
+    '''Returns Compounds object shared by the package, loading it on first call
+    
+    Returns:
+        Compounds object
+    
+    '''
+    global _compounds
+    if _compounds is None:
+        with _compounds_lock:
+            if _compounds is None:
+                _compounds = GetCompounds()
+    
+    return _compounds
+
 
@@ -2,16 +2,38 @@
 
 #%% Imports
 
+import os as _os
+import sys as _sys
+import json as _json
+import time as _time
+import zlib as _zlib
+import threading as _threading
+import numpy as _np
 import pandas as _pd
 import typing as _typing
+from itertools import chain as _chain
+from collections.abc import Mapping as _Mapping
+try:
+    from typing import Literal as _Literal
+except ImportError:
+    from typing_extensions import Literal as _Literal
 from dataclasses import dataclass as _dataclass
 from dataclasses import field as _field
+if _sys.version_info < (3, 9):
+    import importlib_resources as _importlib_resources
+else:
+    import importlib.resources as _importlib_resources
+
+from requests.exceptions import RequestException as _RequestException
 
 import ilthermopy.errors as _err
 import ilthermopy.requests as _req
 import ilthermopy.misc as _misc
+import ilthermopy.units as _units
+import ilthermopy.metrics as _metrics
 
-from ilthermopy.compound_list import _compounds as _cmp
+from ilthermopy.compound_list import SharedCompounds as _SharedCompounds
+from ilthermopy.cache import CacheDir as _CacheDir
 
 
 #%% Property list
@@ -25,10 +47,16 @@ class PropertyList():
         key2prop (dict): maps API keys to property names
         prop2key (dict): maps property names to their API keys
     
+    Arguments:
+        client: HTTP client; default client is used if not specified
+        response: already loaded property list API response; if specified,
+            no request is sent
+    
     '''
     
-    def __init__(self):
-        self.response = _req.GetPropertyList()
+    def __init__(self, client: _typing.Optional[_req.Client] = None,
+                       response: _typing.Optional[_typing.Dict] = None):
+        self.response = _req.GetPropertyList(client) if response is None else response
         try:
             self.properties = {item['cls'].strip(): {k.strip(): v.strip() for k, v in zip(item['key'], item['name'])} for item in self.response['plist']}
             self.key2prop = {k: v for name, lst in self.properties.items() for k, v in lst.items()}
@@ -50,8 +78,95 @@ class PropertyList():
         return
 
 
+PROPERTIES_FILE = 'properties.json'
+PROPERTY_LIST_TTL = 7 * 24 * 3600
+PROPERTY_LIST_RETRY = 600
+
+
+def _BundledPropertyList() -> PropertyList:
+    '''Returns property list snapshot shipped with the package'''
+    pkg = _importlib_resources.files('ilthermopy')
+    response = _json.loads((pkg / PROPERTIES_FILE).read_text(encoding = 'utf-8'))
+    
+    return PropertyList(response = response)
+
+
+def _ReadPropertyList(path: str) -> _typing.Optional[PropertyList]:
+    '''Reads property list stored on disk; returns None if it is missing or broken'''
+    try:
+        with open(path, encoding = 'utf-8') as inpf:
+            return PropertyList(response = _json.load(inpf))
+    except (OSError, ValueError, _err.ILThermoResponseError):
+        return None
+
+
+def _WritePropertyList(path: str, plist: PropertyList) -> None:
+    '''Stores property list on disk; failures are ignored'''
+    try:
+        _os.makedirs(_os.path.dirname(path), exist_ok = True)
+        tmp = f'{path}.{_os.getpid()}.tmp'
+        with open(tmp, 'w', encoding = 'utf-8') as outf:
+            _json.dump(plist.response, outf)
+        _os.replace(tmp, path)
+    except OSError:
+        pass
+    
+    return
+
+
+_plist = None
+_plist_expires = 0.0
+_plist_lock = _threading.Lock()
+
+
+def SharedPropertyList(client: _typing.Optional[_req.Client] = None,
+                       ttl: float = PROPERTY_LIST_TTL,
+                       refresh: bool = False) -> PropertyList:
+    '''Returns property list shared by the package
+    
+    The property list is kept in memory and in properties.json file in
+    cache.CacheDir(), and is only requested from ILThermo if both copies are
+    older than ttl. If the request fails, the outdated disk copy or, if it is
+    missing, the snapshot bundled with the package is used, and the request is
+    retried in PROPERTY_LIST_RETRY seconds.
+    
+    Arguments:
+        client: HTTP client; default client is used if not specified
+        ttl: max age of the stored property list, seconds
+        refresh: if True, the property list is requested from ILThermo
+            regardless of its age
+    
+    Returns:
+        PropertyList object
+    
+    '''
+    global _plist, _plist_expires
+    with _plist_lock:
+        now = _time.time()
+        if not refresh and _plist is not None and now < _plist_expires:
+            return _plist
+        path = _os.path.join(_CacheDir(), PROPERTIES_FILE)
+        # fresh disk copy
+        if not refresh and _os.path.exists(path) and now - _os.path.getmtime(path) < ttl:
+            plist = _ReadPropertyList(path)
+            if plist is not None:
+                _plist, _plist_expires = plist, _os.path.getmtime(path) + ttl
+                return _plist
+        # request
+        try:
+            plist = PropertyList(client)
+            _WritePropertyList(path, plist)
+            _plist, _plist_expires = plist, now + ttl
+        except (_RequestException, _err.ILThermoResponseError, ValueError):
+            plist = _ReadPropertyList(path) or _BundledPropertyList()
+            _plist, _plist_expires = plist, now + min(ttl, PROPERTY_LIST_RETRY)
+    
+    return _plist
+
+
 #%% Entry
 
+@_misc.add_slots
 @_dataclass
 class Compound():
     '''Class describing a chemical compound'''
@@ -78,9 +193,21 @@ class Compound():
     
     mw: _typing.Optional[float] = _field(default = None, repr = False)
     '''molar weight, g/mol'''
+    
+    @property
+    def elements(self) -> _typing.Dict[str, _typing.Union[int, float]]:
+        '''element counts parsed from the chemical formula (see misc.parse_formula);
+        empty if the formula is not specified'''
+        return _misc.parse_formula(self.formula) if self.formula else {}
+
+
 
+def _ResponseToSample(response: _typing.Dict) -> _typing.Dict[str, str]:
+    '''Extracts info on compound's source, purity, etc.'''
+    return {k.strip(':'): v for k, v in response.get('sample', None)}
 
 
+@_metrics.Instrument('parse.ResponseToCompound', lambda c: {'smiles_missing': c.smiles is None})
 def ResponseToCompound(response: _typing.Dict) -> Compound:
     '''Transforms entry data API response to the Compound object
     
@@ -98,6 +225,7 @@ def ResponseToCompound(response: _typing.Dict) -> Compound:
     formula = response.get('formula', None)
     if formula:
         formula = _misc.format_formula(formula)
+    _cmp = _SharedCompounds()
     smiles = _cmp.id2smiles.get(code, None)
     smiles_error = None
     if not smiles:
@@ -105,7 +233,7 @@ def ResponseToCompound(response: _typing.Dict) -> Compound:
         smiles = _cmp.name2smiles.get(name, None)
         if not smiles:
             smiles_error = 'No SMILES found for given id and name'
-    sample = {k.strip(':'): v for k, v in response.get('sample', None)}
+    sample = _ResponseToSample(response)
     mw = response.get('mw', None)
     if mw:
         mw = float(mw)
@@ -122,6 +250,75 @@ def ResponseToCompound(response: _typing.Dict) -> Compound:
 
 
 
+class CompoundRegistry():
+    '''Interns compounds shared by many data entries
+    
+    The same few thousand compounds occur in hundreds of thousands of entry
+    components. The registry keeps a single Compound object per compound
+    identity (ID, name, formula, and molar weight), so entries parsed with
+    the registry share their Compound objects, and the identical sample
+    dictionaries are shared as well. Shared Compound objects have no sample
+    info (sample is None); per-entry samples are stored in Entry.samples.
+    Shared objects must be treated as read-only.
+    
+    Examples:
+        >>> registry = CompoundRegistry()
+        >>> entries = [ResponseToEntry(code, response, registry = registry) for code, response in responses]
+    
+    '''
+    
+    def __init__(self):
+        self._compounds = {}
+        self._samples = {}
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        return len(self._compounds)
+    
+    
+    def compound(self, response: _typing.Dict) -> Compound:
+        '''Returns shared Compound object
+        
+        Arguments:
+            response: dictionary describing compound in entry data API response
+        
+        Returns:
+            Compound object with sample set to None
+        
+        '''
+        key = (response.get('idout', None), response.get('name', None),
+               response.get('formula', None), response.get('mw', None))
+        cmp = self._compounds.get(key, None)
+        if cmp is None:
+            cmp = ResponseToCompound(dict(response, sample = []))
+            cmp.sample = None
+            cmp = self._compounds.setdefault(key, cmp)
+        
+        return cmp
+    
+    
+    def sample(self, response: _typing.Dict) -> _typing.Dict[str, str]:
+        '''Returns shared sample dictionary
+        
+        Arguments:
+            response: dictionary describing compound in entry data API response
+        
+        Returns:
+            dictionary containing info on compound's source, purity, etc.
+        
+        '''
+        key = tuple(tuple(item) for item in response.get('sample', None))
+        sample = self._samples.get(key, None)
+        if sample is None:
+            sample = self._samples.setdefault(key, _ResponseToSample(response))
+        
+        return sample
+
+
+
+@_misc.add_slots
 @_dataclass
 class Reference():
     '''Class describing a scientific paper'''
@@ -184,11 +381,71 @@ class Entry():
     footnotes: _typing.Optional[str] = _field(repr = False)
     '''notes to the provided data'''
     
-    response: _typing.Dict = _field(repr = False)
-    '''data entry API response'''
+    response: _typing.Optional[_typing.Mapping] = _field(repr = False)
+    '''data entry API response; can be None or CompressedResponse depending
+    on the keep_response parameter of ResponseToEntry'''
+    
+    samples: _typing.List[_typing.Dict[str, str]] = _field(default_factory = list, repr = False)
+    '''info on source, purity, etc. of each component; the same as sample
+    attributes of components unless the entry was parsed with CompoundRegistry'''
+    
+    def Normalized(self, si: bool = True) -> _typing.Tuple[_pd.DataFrame, _typing.Dict[str, _units.ColumnInfo]]:
+        '''Returns experimental data with canonical column names and SI units
+        
+        Arguments:
+            si: if True, values and errors are converted to SI units
+        
+        Returns:
+            dataframe and dictionary mapping its columns to units.ColumnInfo
+                objects (see units.NormalizeData)
+        
+        '''
+        return _units.NormalizeData(self.data, self.header, si)
 
 
 
+class CompressedResponse(_Mapping):
+    '''Read-only mapping storing data entry API response as compressed JSON
+    
+    Takes several times less memory than the decoded response; the response
+    is decoded on each access, so use decode() for repeated access.
+    
+    Arguments:
+        response: data entry API response
+    
+    '''
+    
+    __slots__ = ('_data',)
+    
+    def __init__(self, response: _typing.Dict):
+        self._data = _zlib.compress(_json.dumps(response, separators = (',', ':')).encode())
+        
+        return
+    
+    
+    def decode(self) -> _typing.Dict:
+        '''Returns decoded data entry API response'''
+        return _json.loads(_zlib.decompress(self._data))
+    
+    
+    def __getitem__(self, key):
+        return self.decode()[key]
+    
+    
+    def __iter__(self):
+        return iter(self.decode())
+    
+    
+    def __len__(self) -> int:
+        return len(self.decode())
+    
+    
+    def __repr__(self) -> str:
+        return f'CompressedResponse(<{len(self._data)} bytes>)'
+
+
+
+@_metrics.Instrument('parse.ResponseToData', lambda result: {'items': result[0].shape[0]})
 def ResponseToData(response: _typing.Dict) -> _typing.Tuple[_pd.DataFrame, _typing.Dict]:
     '''Extracts and formats data from data entry API response
     
@@ -201,27 +458,33 @@ def ResponseToData(response: _typing.Dict) -> _typing.Tuple[_pd.DataFrame, _typi
         and phase name
     
     '''
-    # prepare data
-    data = [[float(elem) for lst in row for elem in lst] for row in response['data']]
+    # column layout: each cell contains value and, optionally, its error
+    rows = response['data']
+    widths = [len(cell) for cell in rows[0]]
     colnames = []
-    for i, elem in enumerate(response['data'][0]):
-        if len(elem) == 1:
+    for i, width in enumerate(widths):
+        if width == 1:
             addend = [f'V{i+1}']
-        elif len(elem) == 2:
+        elif width == 2:
             addend = [f'V{i+1}', f'dV{i+1}']
         else:
-            raise _err.ILThermoResponseError('Data API (ilset)', f'Number of datapoints per cell must be 1 or 2: {elem}')
+            raise _err.ILThermoResponseError('Data API (ilset)', f'Number of datapoints per cell must be 1 or 2: {rows[0][i]}')
         colnames += addend
-    data = _pd.DataFrame(data, columns = colnames)
+    # parse cells straight into the contiguous float64 array, without
+    # intermediate list of strings
+    values = _np.fromiter(_chain.from_iterable(_chain.from_iterable(rows)), dtype = _np.float64)
+    if values.size != len(rows) * len(colnames):
+        raise _err.ILThermoResponseError('Data API (ilset)', 'Number of datapoints per row is not constant')
+    data = _pd.DataFrame(values.reshape(len(rows), len(colnames)), columns = colnames)
     # set header
     fullnames = []
-    for i, column in enumerate(response['dhead']):
+    for column, width in zip(response['dhead'], widths):
         if len(column) == 1:
             fullname = column[0]
         else:
             colname, phase = column
             fullname = f'{colname} => {phase}' if phase else colname
-        if len(response['data'][0][i]) == 1:
+        if width == 1:
             fullnames.append(fullname)
         else:
             fullnames += [fullname, 'Error of ' + fullname[0].lower() + fullname[1:]]
@@ -231,31 +494,57 @@ def ResponseToData(response: _typing.Dict) -> _typing.Tuple[_pd.DataFrame, _typi
 
 
 
-def ResponseToEntry(code: str, response: _typing.Dict) -> Entry:
+@_metrics.Instrument('parse.ResponseToEntry')
+def ResponseToEntry(code: str, response: _typing.Dict,
+                    keep_response: _typing.Union[bool, _Literal['compressed']] = True,
+                    registry: _typing.Optional[CompoundRegistry] = None) -> Entry:
     '''Transforms data entry API response to Entry object
     
     Arguments:
         code: data entry ID
         response: data entry API response
+        keep_response: if True, the response is stored in the entry as is;
+            if 'compressed', it is stored as CompressedResponse; if False,
+            the response is discarded to save memory
+        registry: if specified, components are shared with other entries
+            parsed with this registry (see CompoundRegistry)
     
     Returns:
         Entry object
     
     '''
+    data, header = ResponseToData(response)
+    
+    return _ResponseToEntry(code, response, data, header, keep_response, registry)
+
+
+def _ResponseToEntry(code: str, response: _typing.Mapping,
+                     data: _pd.DataFrame, header: _typing.Dict[str, str],
+                     keep_response: _typing.Union[bool, _Literal['compressed']],
+                     registry: _typing.Optional[CompoundRegistry]) -> Entry:
+    '''Builds Entry object from the response and the already extracted data'''
     ref = Reference(full = response.get('ref', None).get('full', None),
                     title = response.get('ref', None).get('title', None))
     prop = ': '.join([_.strip() for _ in response['title'].split(':')[1:]])
     prop_type = response['title'].split(':')[0].strip()
     phases = response.get('phases', [])
-    components = [ResponseToCompound(r) for r in response['components']]
+    if registry is None:
+        components = [ResponseToCompound(r) for r in response['components']]
+        samples = [c.sample for c in components]
+    else:
+        components = [registry.compound(r) for r in response['components']]
+        samples = [registry.sample(r) for r in response['components']]
     num_components = len(components)
     num_phases = len(phases)
     expmeth = response.get('expmeth', None)
     solvent = response.get('solvent', None)
     constraints = response.get('constr', [])
     footnotes = response.get('footer', None)
-    data, header = ResponseToData(response)
     num_data_points = data.shape[0]
+    if keep_response == 'compressed':
+        response = CompressedResponse(response)
+    elif not keep_response:
+        response = None
     # build entry
     X = Entry(id = code,
               ref = ref,
@@ -272,23 +561,31 @@ def ResponseToEntry(code: str, response: _typing.Dict) -> Entry:
               data = data,
               header = header,
               footnotes = footnotes,
-              response = response)
+              response = response,
+              samples = samples)
     
     return X
 
 
-def GetEntry(code: str) -> Entry:
+def GetEntry(code: str, client: _typing.Optional[_req.Client] = None,
+             keep_response: _typing.Union[bool, _Literal['compressed']] = True,
+             registry: _typing.Optional[CompoundRegistry] = None) -> Entry:
     '''Extracts data entry from ILThermo database
     
     Arguments:
         code: data entry ID
+        client: HTTP client; default client is used if not specified
+        keep_response: how to store raw response in the entry: as is (True),
+            compressed ('compressed'), or not at all (False)
+        registry: if specified, components are shared with other entries
+            parsed with this registry (see CompoundRegistry)
     
     Returns:
         Entry object
     
     '''
-    response = _req.GetEntryData(code)
-    entry = ResponseToEntry(code, response)
+    response = _req.GetEntryData(code, client)
+    entry = ResponseToEntry(code, response, keep_response, registry)
     
     return entry
 
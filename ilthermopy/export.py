@@ -0,0 +1,209 @@
+'''Export of data entries to the normalized long-format table and Parquet
+
+Parquet export requires pyarrow package (pip install ilthermopy[parquet]).
+
+Attributes:
+    LONG_COLUMNS (list): columns of the long-format table
+
+'''
+
+import typing as _typing
+
+import numpy as _np
+import pandas as _pd
+
+try:
+    import pyarrow as _pa
+    import pyarrow.dataset as _pads
+    import pyarrow.parquet as _pq
+except ImportError:
+    _pa = None
+
+import ilthermopy.data_structs as _ds
+import ilthermopy.units as _units
+
+
+LONG_COLUMNS = ['entry_id', 'property', 'property_type', 'point',
+                'variable', 'unit', 'phase', 'value', 'error',
+                'num_components', 'cmp1_id', 'cmp1_smiles',
+                'cmp2_id', 'cmp2_smiles', 'cmp3_id', 'cmp3_smiles']
+
+
+#%% Long format
+
+def EntryToLongFormat(entry: _ds.Entry) -> _pd.DataFrame:
+    '''Transforms data entry to the long-format table with one row per value
+    
+    Arguments:
+        entry: Entry object
+    
+    Returns:
+        dataframe with LONG_COLUMNS columns; measurement errors are stored in
+            the error column of the corresponding value
+    
+    '''
+    data = entry.data
+    n_points = data.shape[0]
+    variables = [col for col in data.columns if not col.startswith('d')]
+    values = data[variables].to_numpy(dtype = _np.float64).T.ravel()
+    errors = _np.full( (len(variables), n_points), _np.nan)
+    for i, col in enumerate(variables):
+        if f'd{col}' in data:
+            errors[i] = data[f'd{col}'].to_numpy(dtype = _np.float64)
+    infos = [_units.ParseFullname(entry.header[col]) for col in variables]
+    columns = {
+        'entry_id': entry.id,
+        'property': entry.property,
+        'property_type': entry.property_type,
+        'point': _np.tile(_np.arange(n_points, dtype = _np.int32), len(variables)),
+        'variable': _np.repeat([info.variable for info in infos], n_points),
+        'unit': _np.repeat(_np.array([info.unit for info in infos], dtype = object), n_points),
+        'phase': _np.repeat(_np.array([info.phase for info in infos], dtype = object), n_points),
+        'value': values,
+        'error': errors.ravel(),
+        'num_components': entry.num_components}
+    for i in range(3):
+        cmp = entry.components[i] if i < len(entry.components) else None
+        columns[f'cmp{i+1}_id'] = cmp.id if cmp else None
+        columns[f'cmp{i+1}_smiles'] = cmp.smiles if cmp else None
+    df = _pd.DataFrame(columns)
+    
+    return df
+
+
+def EntriesToLongFormat(entries: _typing.Iterable[_ds.Entry]) -> _pd.DataFrame:
+    '''Transforms data entries to the single long-format table
+    
+    Arguments:
+        entries: Entry objects
+    
+    Returns:
+        dataframe with LONG_COLUMNS columns
+    
+    '''
+    frames = [EntryToLongFormat(entry) for entry in entries]
+    if not frames:
+        return _pd.DataFrame(columns = LONG_COLUMNS)
+    
+    return _pd.concat(frames, ignore_index = True)
+
+
+#%% Arrow / Parquet
+
+def _CheckArrow() -> None:
+    '''Raises ImportError if pyarrow is not available'''
+    if _pa is None:
+        raise ImportError('Parquet/Arrow export requires pyarrow package: pip install pyarrow')
+    
+    return
+
+
+def LongFormatSchema():
+    '''Returns Arrow schema of the long-format table
+    
+    Returns:
+        pyarrow.Schema object
+    
+    '''
+    _CheckArrow()
+    string = _pa.string()
+    fields = [('entry_id', string), ('property', string), ('property_type', string),
+              ('point', _pa.int32()), ('variable', string), ('unit', string),
+              ('phase', string), ('value', _pa.float64()), ('error', _pa.float64()),
+              ('num_components', _pa.int8())]
+    fields += [(f'cmp{i+1}_{field}', string) for i in range(3) for field in ('id', 'smiles')]
+    
+    return _pa.schema(fields)
+
+
+def _FramesToRecordBatch(frames: _typing.List[_pd.DataFrame], schema):
+    '''Concatenates long-format dataframes to the single Arrow record batch'''
+    table = _pa.Table.from_pandas(_pd.concat(frames, ignore_index = True),
+                                  schema = schema, preserve_index = False)
+    
+    return table.combine_chunks().to_batches()[0]
+
+
+def EntriesToRecordBatches(entries: _typing.Iterable[_ds.Entry],
+                           batch_rows: int = 500000) -> _typing.Iterator:
+    '''Transforms data entries to the stream of long-format Arrow record batches
+    
+    Arguments:
+        entries: Entry objects; can be a lazy iterator
+        batch_rows: approximate number of rows in a single batch; entries
+            are never split between batches
+    
+    Returns:
+        iterator over pyarrow.RecordBatch objects with LongFormatSchema schema
+    
+    '''
+    schema = LongFormatSchema()
+    frames, n_rows = [], 0
+    for entry in entries:
+        df = EntryToLongFormat(entry)
+        frames.append(df)
+        n_rows += df.shape[0]
+        if n_rows >= batch_rows:
+            yield _FramesToRecordBatch(frames, schema)
+            frames, n_rows = [], 0
+    if frames:
+        yield _FramesToRecordBatch(frames, schema)
+    
+    return
+
+
+def WriteParquet(entries: _typing.Iterable[_ds.Entry],
+                 path: str,
+                 partition_cols: _typing.Optional[_typing.Sequence[str]] = ('property',),
+                 batch_rows: int = 500000,
+                 compression: str = 'zstd') -> int:
+    '''Streams data entries to the long-format Parquet dataset
+    
+    Entries are converted and written in batches of batch_rows rows, which
+    also become Parquet row groups, so memory consumption does not depend
+    on the number of entries.
+    
+    In the partitioned dataset, the partitions receiving new rows are
+    replaced entirely, while other existing partitions are kept, e.g. a
+    dataset can be extended with entries of other properties.
+    
+    Arguments:
+        entries: Entry objects; can be a lazy iterator, e.g. GetEntriesBulk output
+        path: path to the dataset directory (if partition_cols are specified)
+            or to the Parquet file
+        partition_cols: columns used for hive-style partitioning of the dataset;
+            single Parquet file is written if None
+        batch_rows: approximate number of rows in a single batch
+        compression: Parquet compression codec
+    
+    Returns:
+        number of written rows
+    
+    Examples:
+        >>> entries = (res.entry for res in GetEntriesBulk(ids) if res.ok)
+        >>> WriteParquet(entries, 'ilthermo_dataset')
+    
+    '''
+    schema = LongFormatSchema()
+    n_rows = 0
+    def batches():
+        nonlocal n_rows
+        for batch in EntriesToRecordBatches(entries, batch_rows):
+            n_rows += batch.num_rows
+            yield batch
+    if partition_cols:
+        partitioning = _pads.partitioning(_pa.schema([schema.field(col) for col in partition_cols]),
+                                          flavor = 'hive')
+        _pads.write_dataset(batches(), path, schema = schema, format = 'parquet',
+                            partitioning = partitioning,
+                            file_options = _pads.ParquetFileFormat().make_write_options(compression = compression),
+                            existing_data_behavior = 'delete_matching',
+                            max_rows_per_group = batch_rows)
+    else:
+        with _pq.ParquetWriter(path, schema, compression = compression) as writer:
+            for batch in batches():
+                writer.write_batch(batch)
+    
+    return n_rows
+
+
@@ -0,0 +1,261 @@
+'''On-disk cache and concurrent download of compound images
+
+Images are stored content-addressed: each PNG is saved once under its SHA-256
+digest, and an SQLite index maps compound IDs to digests, so identical
+structure images are neither downloaded nor stored twice. Images are
+downloaded bypassing the HTTP response cache of the client (see
+cache.ResponseCache), so that they are not stored there as well.
+
+'''
+
+import os as _os
+import time as _time
+import hashlib as _hashlib
+import sqlite3 as _sqlite3
+import threading as _threading
+import typing as _typing
+
+import ilthermopy.requests as _req
+import ilthermopy.bulk as _bulk
+
+from ilthermopy.cache import CacheDir as _CacheDir
+from ilthermopy.compound_list import SharedCompounds as _SharedCompounds
+
+
+class ImageCache():
+    '''Content-addressed on-disk cache of compound images
+    
+    Arguments:
+        path: cache directory; images subdirectory of cache.CacheDir() by default
+    
+    Attributes:
+        path (str): cache directory
+    
+    '''
+    
+    def __init__(self, path: _typing.Optional[str] = None):
+        if path is None:
+            path = _os.path.join(_CacheDir(), 'images')
+        _os.makedirs(path, exist_ok = True)
+        self.path = path
+        self._lock = _threading.Lock()
+        self._conn = _sqlite3.connect(_os.path.join(path, 'index.sqlite'), check_same_thread = False)
+        with self._lock, self._conn:
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS images (
+                                      id TEXT PRIMARY KEY,
+                                      digest TEXT,
+                                      fetched REAL)''')
+        
+        return
+    
+    
+    def close(self) -> None:
+        '''Closes the index connection'''
+        with self._lock:
+            self._conn.close()
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+    
+    
+    def __contains__(self, idout: str) -> bool:
+        return self.path_of(idout) is not None
+    
+    
+    def _blob_path(self, digest: str) -> str:
+        '''Returns path to the image file with the given digest'''
+        return _os.path.join(self.path, digest[:2], f'{digest}.png')
+    
+    
+    def path_of(self, idout: str) -> _typing.Optional[str]:
+        '''Returns path to the stored image file
+        
+        Arguments:
+            idout: compound ID
+        
+        Returns:
+            path to the PNG file; None if the image is not stored
+        
+        '''
+        with self._lock:
+            row = self._conn.execute('SELECT digest FROM images WHERE id = ?', (idout,)).fetchone()
+        if row is None:
+            return None
+        path = self._blob_path(row[0])
+        
+        return path if _os.path.exists(path) else None
+    
+    
+    def get(self, idout: str) -> _typing.Optional[bytes]:
+        '''Returns stored image
+        
+        Arguments:
+            idout: compound ID
+        
+        Returns:
+            bytes-formatted PNG image; None if the image is not stored
+        
+        '''
+        path = self.path_of(idout)
+        if path is None:
+            return None
+        with open(path, 'rb') as inpf:
+            return inpf.read()
+    
+    
+    def _store(self, content: bytes) -> str:
+        '''Saves image file unless it is already stored; returns its digest'''
+        digest = _hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not _os.path.exists(path):
+            _os.makedirs(_os.path.dirname(path), exist_ok = True)
+            tmp = f'{path}.{_os.getpid()}.{_threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as outf:
+                outf.write(content)
+            _os.replace(tmp, path)
+        
+        return digest
+    
+    
+    def _index(self, items: _typing.List[_typing.Tuple[str, str]]) -> None:
+        '''Maps compound IDs to digests of stored images in a single transaction'''
+        now = _time.time()
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO images VALUES (?, ?, ?)',
+                                   [(idout, digest, now) for idout, digest in items])
+        
+        return
+    
+    
+    def set(self, idout: str, content: bytes) -> str:
+        '''Stores image
+        
+        Arguments:
+            idout: compound ID
+            content: bytes-formatted PNG image
+        
+        Returns:
+            SHA-256 digest of the image
+        
+        '''
+        digest = self._store(content)
+        self._index([(idout, digest)])
+        
+        return digest
+    
+    
+    def num_files(self) -> int:
+        '''Returns number of distinct stored images'''
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(DISTINCT digest) FROM images').fetchone()[0]
+
+
+
+_cache = None
+_cache_lock = _threading.Lock()
+
+
+def SharedImageCache() -> ImageCache:
+    '''Returns image cache shared by the package, creating it on first call
+    
+    Returns:
+        ImageCache object in the default directory
+    
+    '''
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache()
+    
+    return _cache
+
+
+def _FetchImages(ids: _typing.Iterable[str],
+                 max_workers: int,
+                 rate_limit: _typing.Optional[float],
+                 client: _typing.Optional[_req.Client],
+                 cache: ImageCache) -> _typing.Iterator[_typing.Tuple[str, _typing.Optional[bytes], _typing.Optional[Exception]]]:
+    '''Downloads missing images, stores them, and yields (id, image, error) tuples;
+    index is updated in batches, as each SQLite commit takes a disk sync'''
+    func = lambda idout: _req._get(_req.IMAGE_URL, {'key': idout}, client, use_cache = False)
+    batch = []
+    try:
+        for idout, content, error in _bulk._BulkMap(func, ids, max_workers, rate_limit):
+            if error is None:
+                batch.append( (idout, cache._store(content)) )
+                if len(batch) >= 100:
+                    cache._index(batch)
+                    batch = []
+            yield idout, content, error
+    finally:
+        if batch:
+            cache._index(batch)
+    
+    return
+
+
+def GetCompoundImages(ids: _typing.Iterable[str],
+                      max_workers: int = 8,
+                      rate_limit: _typing.Optional[float] = None,
+                      client: _typing.Optional[_req.Client] = None,
+                      cache: _typing.Optional[ImageCache] = None) -> _typing.Dict[str, _typing.Optional[bytes]]:
+    '''Returns images of compounds, downloading only the ones missing in the cache
+    
+    Arguments:
+        ids: compound IDs, e.g. cmp1_id column of Search output; duplicates and
+            None values are ignored
+        max_workers: number of download threads
+        rate_limit: max number of requests per second; no limit if None
+        client: HTTP client; default client is used if not specified
+        cache: image cache; shared cache in the default directory is used if
+            not specified
+    
+    Returns:
+        dictionary mapping compound IDs to bytes-formatted PNG images, in order
+            of ids; images which failed to download are None
+    
+    '''
+    cache = SharedImageCache() if cache is None else cache
+    ids = [idout for idout in dict.fromkeys(ids) if isinstance(idout, str)]
+    images = {idout: cache.get(idout) for idout in ids}
+    missing = [idout for idout, content in images.items() if content is None]
+    for idout, content, error in _FetchImages(missing, max_workers, rate_limit, client, cache):
+        images[idout] = content
+    
+    return images
+
+
+def PrefetchImages(ids: _typing.Optional[_typing.Iterable[str]] = None,
+                   max_workers: int = 8,
+                   rate_limit: _typing.Optional[float] = None,
+                   client: _typing.Optional[_req.Client] = None,
+                   cache: _typing.Optional[ImageCache] = None) -> _typing.Dict[str, str]:
+    '''Downloads images missing in the cache without keeping them in memory
+    
+    Arguments:
+        ids: compound IDs; all compounds from compounds.csv if not specified
+        max_workers: number of download threads
+        rate_limit: max number of requests per second; no limit if None
+        client: HTTP client; default client is used if not specified
+        cache: image cache; shared cache in the default directory is used if
+            not specified
+    
+    Returns:
+        dictionary mapping IDs of compounds which failed to download to error messages
+    
+    '''
+    cache = SharedImageCache() if cache is None else cache
+    if ids is None:
+        ids = [record[0] for record in _SharedCompounds().records]
+    ids = [idout for idout in dict.fromkeys(ids) if isinstance(idout, str) and idout not in cache]
+    failed = {}
+    for idout, content, error in _FetchImages(ids, max_workers, rate_limit, client, cache):
+        if error is not None:
+            failed[idout] = f'{type(error).__name__}: {error}'
+    
+    return failed
@@ -0,0 +1,153 @@
+'''JSON decoding of API responses: fast decoder and incremental parser
+
+loads uses orjson package if it is installed (pip install ilthermopy[fast])
+and the standard json module otherwise. IterArray decodes elements of an
+array inside the top-level object one by one while the response body is
+being downloaded, so large search responses are never decoded at once.
+
+'''
+
+import re as _re
+import json as _json
+import codecs as _codecs
+import typing as _typing
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+_decoder = _json.JSONDecoder()
+_whitespace = _re.compile(r'[ \t\n\r]*')
+_delimiter = _re.compile(r'[ \t\n\r,\]}]')
+
+
+def loads(content: _typing.Union[bytes, str]) -> _typing.Any:
+    '''Decodes JSON document using orjson if available
+    
+    Arguments:
+        content: JSON document
+    
+    Returns:
+        decoded object
+    
+    '''
+    if _orjson is not None:
+        return _orjson.loads(content)
+    
+    return _json.loads(content)
+
+
+def IterArray(chunks: _typing.Iterable[bytes],
+              key: str,
+              other: _typing.Optional[_typing.Dict] = None) -> _typing.Iterator:
+    '''Incrementally decodes the JSON object and yields elements of its array member
+    
+    Only the currently decoded element and the undecoded tail of the last
+    chunk are kept in memory.
+    
+    Arguments:
+        chunks: UTF-8 encoded JSON object split into chunks of arbitrary size,
+            e.g. Client.stream output
+        key: name of the array member of the object
+        other: if specified, the other members of the object are decoded
+            entirely and stored in this dictionary; they are available after
+            the iterator is exhausted
+    
+    Returns:
+        iterator over decoded elements of the array; KeyError is raised once
+            the object is decoded if it does not contain the key
+    
+    Examples:
+        >>> other = {}
+        >>> for row in IterArray(client.stream(SEARCH_URL, params), 'res', other):
+        ...     process(row)
+        >>> errors = other.get('errors', [])
+    
+    '''
+    chunks = iter(chunks)
+    utf8 = _codecs.getincrementaldecoder('utf-8')()
+    buf, pos = '', 0
+    
+    def more() -> bool:
+        '''Appends the next chunk to the buffer dropping its processed part;
+        returns False if there are no more chunks'''
+        nonlocal buf, pos
+        for chunk in chunks:
+            text = utf8.decode(chunk)
+            if text:
+                buf, pos = buf[pos:] + text, 0
+                return True
+        text = utf8.decode(b'', final = True)
+        if text:
+            buf, pos = buf[pos:] + text, 0
+            return True
+        return False
+    
+    def peek() -> str:
+        '''Skips whitespace and returns the next character; empty string at the end'''
+        nonlocal pos
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ''
+    
+    def expect(chars: str) -> str:
+        '''Consumes the next character, which must be one of chars'''
+        nonlocal pos
+        char = peek()
+        if not char or char not in chars:
+            raise _json.JSONDecodeError(f'Expecting one of {chars!r}', buf, pos)
+        pos += 1
+        return char
+    
+    def value() -> _typing.Any:
+        '''Decodes the next JSON value'''
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(buf, pos)
+            except _json.JSONDecodeError:
+                if more():
+                    continue
+                raise
+            # numbers and literals not followed by a delimiter may be incomplete
+            if not isinstance(obj, (list, dict, str)) and not _delimiter.match(buf, end) and more():
+                continue
+            pos = end
+            return obj
+    
+    found = False
+    expect('{')
+    end = peek() == '}'
+    while not end:
+        name = value()
+        if not isinstance(name, str):
+            raise _json.JSONDecodeError('Expecting property name', buf, pos)
+        expect(':')
+        if name == key and peek() == '[':
+            found = True
+            pos += 1
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield value()
+                    if expect(',]') == ']':
+                        break
+        else:
+            obj = value()
+            if other is not None:
+                other[name] = obj
+        end = expect(',}') == '}'
+    # exhaust the source, so that e.g. Client.stream caches the response
+    for chunk in chunks:
+        pass
+    if not found:
+        raise KeyError(key)
+    
+    return
@@ -0,0 +1,320 @@
+'''Offline search over a persisted copy of the ILThermo search listing
+
+The listing (GetAllEntries output) is stored in an SQLite file, in the
+listing table as in mirror.Mirror files, and loaded to LocalListing, which
+answers the filters of search.Search from precomputed arrays and posting
+lists without requests to ILThermo. Property names and keys are resolved
+with the property list snapshot shipped with the package.
+
+Offline results differ from ILThermo search in the following:
+
+* compound matches chemical formulas (in any element order, see
+  compound_index.FormulaKey) and parts of compound names; CAS registry
+  numbers are not supported;
+* author is matched against the reference text of the listing, which only
+  contains the first author, e.g. "Kabo et al. (2004)";
+* keywords are not supported, as the listing does not contain titles.
+
+Examples:
+    >>> UpdateListing()
+    >>> df = Search(compound = 'imidazolium', prop = 'Viscosity', offline = True)
+
+'''
+
+import os as _os
+import re as _re
+import sqlite3 as _sqlite3
+import threading as _threading
+import typing as _typing
+try:
+    from typing import Literal as _Literal
+except ImportError:
+    from typing_extensions import Literal as _Literal
+
+import numpy as _np
+import pandas as _pd
+
+import ilthermopy.errors as _err
+import ilthermopy.requests as _req
+import ilthermopy.data_structs as _ds
+import ilthermopy.search as _search
+import ilthermopy.compound_index as _compound_index
+
+from ilthermopy.cache import CacheDir as _CacheDir
+
+
+LISTING_FILE = 'listing.sqlite'
+
+_INT_COLUMNS = ('num_phases', 'num_components', 'num_data_points')
+_YEAR = _re.compile(r'\((\d{4})\)')
+
+
+def _Postings(keys: _typing.Iterable[_typing.Optional[str]],
+              rows: _typing.Iterable[int]) -> _typing.Dict[str, _np.ndarray]:
+    '''Maps distinct keys to arrays of rows containing them; None keys are skipped'''
+    postings = {}
+    for key, row in zip(keys, rows):
+        if key is not None:
+            postings.setdefault(key, []).append(row)
+    
+    return {key: _np.array(lst, dtype = _np.int64) for key, lst in postings.items()}
+
+
+class LocalListing():
+    '''In-memory index of the search listing answering Search filters offline
+    
+    Arguments:
+        listing: dataframe formatted as GetAllEntries output
+    
+    Examples:
+        >>> listing = LocalListing(GetAllEntries())
+        >>> listing.search(compound = 'C8H15F6N2P', year = 2004)
+    
+    '''
+    
+    def __init__(self, listing: _pd.DataFrame):
+        missing = [col for col in _search.SEARCH_COLUMNS if col not in listing.columns]
+        if missing:
+            raise ValueError(f'Listing misses columns: {", ".join(missing)}')
+        self._columns = {}
+        for col in _search.SEARCH_COLUMNS:
+            if col in _INT_COLUMNS:
+                values = listing[col].to_numpy(dtype = _np.int64)
+            else:
+                values = listing[col].to_numpy(dtype = object, copy = True)
+                values[_pd.isna(values)] = None
+            self._columns[col] = values
+        rows = range(len(listing))
+        refs = self._columns['reference']
+        years = [_YEAR.findall(ref) if ref else None for ref in refs]
+        self._year = _np.array([int(y[-1]) if y else -1 for y in years], dtype = _np.int64)
+        self._refs = _Postings([ref.lower() if ref else None for ref in refs], rows)
+        self._props = _Postings(self._columns['property'], rows)
+        # compounds in any position
+        self._cmp_ids, self._cmp_names = {}, {}
+        for i in (1,2,3):
+            ids = _Postings(self._columns[f'cmp{i}_id'], rows)
+            names = _Postings([name.lower() if name else None for name in self._columns[f'cmp{i}']], rows)
+            for postings, new in ( (self._cmp_ids, ids), (self._cmp_names, names) ):
+                for key, arr in new.items():
+                    postings[key] = _np.concatenate([postings[key], arr]) if key in postings else arr
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        return len(self._year)
+    
+    
+    def _mask(self, arrays: _typing.Iterable[_np.ndarray]) -> _np.ndarray:
+        '''Returns boolean mask of rows contained in the arrays'''
+        mask = _np.zeros(len(self), dtype = bool)
+        for arr in arrays:
+            mask[arr] = True
+        
+        return mask
+    
+    
+    def _compound_mask(self, compound: str) -> _np.ndarray:
+        '''Returns mask of rows containing compounds with the given formula or
+        name fragment'''
+        query = compound.strip()
+        codes = {code for code, name, formula, smiles in _compound_index.SharedCompoundIndex().by_formula(query)}
+        arrays = [self._cmp_ids[code] for code in codes if code in self._cmp_ids]
+        query = query.lower()
+        arrays += [arr for name, arr in self._cmp_names.items() if query in name]
+        
+        return self._mask(arrays)
+    
+    
+    def _property_name(self, prop: _typing.Optional[str], prop_key: _typing.Optional[str]) -> str:
+        '''Resolves property name with the bundled property list'''
+        plist = _BundledPropertyList()
+        if prop_key:
+            prop = plist.key2prop.get(prop_key)
+            if prop is None:
+                raise ValueError(f'Unknown property key: {prop_key}\nCheck available properties via the ilt.ShowPropertyList function')
+        elif prop not in self._props:
+            _search.PropertyKey(prop, plist)
+        
+        return prop
+    
+    
+    def search(self, compound: _typing.Optional[str] = None,
+                     n_compounds: _Literal[None,1,2,3] = None,
+                     prop: _typing.Optional[str] = None,
+                     prop_key: _typing.Optional[str] = None,
+                     year: _typing.Optional[int] = None,
+                     author: _typing.Optional[str] = None,
+                     keywords: _typing.Optional[str] = None) -> _pd.DataFrame:
+        '''Finds listed entries matching the filters of search.Search
+        
+        Arguments:
+            compound: chemical formula or name (part or full)
+            n_compounds: number of mixture compounds
+            prop: name of physico-chemical property, only used if prop_key is not specified
+            prop_key: key of physico-chemical property
+            year: publication year
+            author: author's last name (part or full)
+            keywords: not supported; ValueError is raised if specified
+        
+        Returns:
+            dataframe formatted as Search output, rows in order of the listing
+        
+        '''
+        if keywords:
+            raise ValueError('Search by keywords is not supported offline')
+        mask = _np.ones(len(self), dtype = bool)
+        if compound:
+            mask &= self._compound_mask(compound)
+        if n_compounds:
+            mask &= self._columns['num_components'] == int(n_compounds)
+        if prop_key or prop:
+            name = self._property_name(prop, prop_key)
+            mask &= self._mask([self._props[name]] if name in self._props else [])
+        if year:
+            mask &= self._year == int(year)
+        if author:
+            query = author.strip().lower()
+            mask &= self._mask(arr for ref, arr in self._refs.items() if query in ref)
+        rows = _np.flatnonzero(mask)
+        if not len(rows):
+            return _pd.DataFrame(columns = _search.SEARCH_COLUMNS)
+        # built as _SearchItemsToFrame, so that dtypes are the same
+        columns = {col: values[rows] if col in _INT_COLUMNS else values[rows].tolist()
+                   for col, values in self._columns.items()}
+        df = _pd.DataFrame(columns)
+        
+        return df
+
+
+
+_plist = None
+_listings = {}
+_lock = _threading.Lock()
+
+
+def _BundledPropertyList() -> _ds.PropertyList:
+    '''Returns memoized property list snapshot shipped with the package'''
+    global _plist
+    if _plist is None:
+        _plist = _ds._BundledPropertyList()
+    
+    return _plist
+
+
+def _ListingPath(path: _typing.Optional[str]) -> str:
+    '''Returns path to the listing file, the default one if path is None'''
+    return path if path is not None else _os.path.join(_CacheDir(), LISTING_FILE)
+
+
+def SaveListing(listing: _pd.DataFrame, path: _typing.Optional[str] = None) -> str:
+    '''Stores search listing on disk
+    
+    The file is replaced atomically, so concurrent readers see either the
+    old or the new listing.
+    
+    Arguments:
+        listing: dataframe formatted as GetAllEntries output
+        path: path to the SQLite file; listing.sqlite in the cache directory
+            (see cache.CacheDir) is used if not specified
+    
+    Returns:
+        path to the stored file
+    
+    '''
+    path = _ListingPath(path)
+    _os.makedirs(_os.path.dirname(_os.path.abspath(path)), exist_ok = True)
+    tmp = f'{path}.{_os.getpid()}.tmp'
+    try:
+        with _sqlite3.connect(tmp) as conn:
+            listing[_search.SEARCH_COLUMNS].to_sql('listing', conn, if_exists = 'replace', index = False)
+        conn.close()
+        _os.replace(tmp, path)
+    finally:
+        if _os.path.exists(tmp):
+            _os.remove(tmp)
+    
+    return path
+
+
+def LoadListing(path: _typing.Optional[str] = None) -> LocalListing:
+    '''Loads search listing stored by SaveListing, UpdateListing, or mirror.Mirror
+    
+    Arguments:
+        path: path to the SQLite file; listing.sqlite in the cache directory
+            is used if not specified
+    
+    Returns:
+        LocalListing object
+    
+    '''
+    path = _ListingPath(path)
+    if not _os.path.exists(path):
+        raise FileNotFoundError(f'Search listing is not stored: {path}\nDownload it via the ilt.UpdateListing function')
+    conn = _sqlite3.connect(path)
+    try:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'listing'").fetchone()
+        if not exists:
+            raise ValueError(f'File does not contain search listing: {path}')
+        df = _pd.read_sql('SELECT * FROM listing', conn)
+    finally:
+        conn.close()
+    
+    return LocalListing(df)
+
+
+def UpdateListing(path: _typing.Optional[str] = None,
+                  client: _typing.Optional[_req.Client] = None,
+                  shard_by_property: bool = False,
+                  max_workers: int = 3,
+                  stream: bool = False) -> LocalListing:
+    '''Downloads current search listing and stores it for offline search
+    
+    Arguments:
+        path: path to the SQLite file; listing.sqlite in the cache directory
+            is used if not specified
+        client: HTTP client; default client is used if not specified
+        shard_by_property, max_workers, stream: see search.GetAllEntries
+    
+    Returns:
+        LocalListing object of the downloaded listing, which is also returned
+            by the following SharedListing calls
+    
+    '''
+    df = _search.GetAllEntries(client = client,
+                               shard_by_property = shard_by_property,
+                               max_workers = max_workers,
+                               stream = stream)
+    if df.empty:
+        raise _err.ILThermoResponseError('Search API', 'Empty listing')
+    path = SaveListing(df, path)
+    listing = LocalListing(df)
+    with _lock:
+        _listings[_os.path.abspath(path)] = (_os.path.getmtime(path), listing)
+    
+    return listing
+
+
+def SharedListing(path: _typing.Optional[str] = None) -> LocalListing:
+    '''Returns stored search listing shared by the package, loading it on
+    first call and after the file is updated
+    
+    Arguments:
+        path: path to the SQLite file; listing.sqlite in the cache directory
+            is used if not specified
+    
+    Returns:
+        LocalListing object
+    
+    '''
+    path = _os.path.abspath(_ListingPath(path))
+    with _lock:
+        mtime = _os.path.getmtime(path) if _os.path.exists(path) else None
+        cached = _listings.get(path)
+        if cached is None or cached[0] != mtime:
+            listing = LoadListing(path)
+            _listings[path] = (mtime, listing)
+            cached = _listings[path]
+    
+    return cached[1]
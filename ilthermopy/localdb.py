@@ -0,0 +1,354 @@
+'''Local SQLite database of data entries supporting queries by data point values
+
+Entries are stored in three indexed tables:
+
+* entries: one row per data entry (reference, property, phases, etc.);
+* components: one row per entry component (ID, name, formula, SMILES);
+* points: one row per value, i.e. data entry table in the long format (see
+  export.EntryToLongFormat) with decoded variable names, units and phases;
+  values and errors are also stored converted to SI units (see
+  units.SI_UNITS), so that entries given in different units can be queried
+  together.
+
+'''
+
+import os as _os
+import sqlite3 as _sqlite3
+import typing as _typing
+
+import numpy as _np
+import pandas as _pd
+
+import ilthermopy.data_structs as _ds
+import ilthermopy.export as _export
+import ilthermopy.units as _units
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    reference TEXT,
+    title TEXT,
+    property TEXT,
+    property_type TEXT,
+    phases TEXT,
+    num_components INTEGER,
+    num_phases INTEGER,
+    num_data_points INTEGER,
+    expmeth TEXT,
+    solvent TEXT);
+CREATE TABLE IF NOT EXISTS components (
+    entry_id TEXT,
+    position INTEGER,
+    id TEXT,
+    name TEXT,
+    formula TEXT,
+    smiles TEXT);
+CREATE TABLE IF NOT EXISTS points (
+    entry_id TEXT,
+    point INTEGER,
+    variable TEXT,
+    unit TEXT,
+    phase TEXT,
+    value REAL,
+    error REAL,
+    si_unit TEXT,
+    si_value REAL,
+    si_error REAL);
+CREATE INDEX IF NOT EXISTS entries_property ON entries (property);
+CREATE INDEX IF NOT EXISTS components_entry ON components (entry_id);
+CREATE INDEX IF NOT EXISTS components_id ON components (id);
+CREATE INDEX IF NOT EXISTS components_name ON components (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS points_entry ON points (entry_id, point, variable);
+CREATE INDEX IF NOT EXISTS points_variable_si ON points (variable, si_value);
+'''
+
+
+def _SIUnit(unit: _typing.Optional[str]) -> _typing.Tuple[_typing.Optional[str], float]:
+    '''Returns SI unit and conversion factor; units missing in SI_UNITS are kept as is'''
+    return _units.SI_UNITS.get(unit, (unit, 1.0))
+
+
+class LocalDatabase():
+    '''Local SQLite database of data entries
+    
+    Arguments:
+        path: path to the SQLite file; ':memory:' creates in-memory database
+    
+    Examples:
+        >>> db = LocalDatabase('ilthermo_points.sqlite')
+        >>> db.add(res.entry for res in GetEntriesBulk(ids) if res.ok)
+        >>> df = db.query(prop = 'Viscosity', compound = 'imidazolium',
+        ...               conditions = {'Temperature': (290, 320),
+        ...                             'Pressure': (100e3, 102e3)})
+        >>> df = db.query(prop = 'Vapor-liquid equilibrium',
+        ...               conditions = {('Mole fraction of water', 'Gas'): (0.5, None)})
+    
+    '''
+    
+    def __init__(self, path: str):
+        if path != ':memory:':
+            directory = _os.path.dirname(_os.path.abspath(path))
+            _os.makedirs(directory, exist_ok = True)
+        self.path = path
+        self._conn = _sqlite3.connect(path)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        
+        return
+    
+    
+    def close(self) -> None:
+        '''Closes the database connection'''
+        self._conn.close()
+        
+        return
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    
+    
+    def __contains__(self, code: str) -> bool:
+        row = self._conn.execute('SELECT 1 FROM entries WHERE id = ?', (code,)).fetchone()
+        return row is not None
+    
+    
+    #%% Ingestion
+    
+    def _insert(self, entry: _ds.Entry) -> int:
+        '''Inserts single entry, replacing the stored one; returns number of points'''
+        conn = self._conn
+        for table, column in (('entries', 'id'), ('components', 'entry_id'), ('points', 'entry_id')):
+            conn.execute(f'DELETE FROM {table} WHERE {column} = ?', (entry.id,))
+        conn.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (entry.id, entry.ref.full, entry.ref.title, entry.property,
+                      entry.property_type, ';'.join(entry.phases), entry.num_components,
+                      entry.num_phases, entry.num_data_points, entry.expmeth, entry.solvent))
+        conn.executemany('INSERT INTO components VALUES (?, ?, ?, ?, ?, ?)',
+                         [(entry.id, i + 1, c.id, c.name, c.formula, c.smiles) \
+                          for i, c in enumerate(entry.components)])
+        df = _export.EntryToLongFormat(entry)
+        si_units, factors = zip(*map(_SIUnit, df['unit'])) if df.shape[0] else ((), ())
+        factors = _np.array(factors, dtype = _np.float64)
+        # SQLite stores NaN as NULL
+        columns = [df[col].tolist() for col in ('entry_id', 'point', 'variable', 'unit', 'phase', 'value', 'error')]
+        columns += [si_units, (df['value'] * factors).tolist(), (df['error'] * factors).tolist()]
+        conn.executemany('INSERT INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', zip(*columns))
+        
+        return df.shape[0]
+    
+    
+    def add(self, entries: _typing.Iterable[_ds.Entry],
+                  commit_every: int = 500) -> int:
+        '''Stores data entries; already stored entries with the same IDs are replaced
+        
+        Arguments:
+            entries: Entry objects; can be a lazy iterator
+            commit_every: number of entries committed at once
+        
+        Returns:
+            number of stored entries
+        
+        '''
+        count = 0
+        try:
+            for entry in entries:
+                self._insert(entry)
+                count += 1
+                if count % commit_every == 0:
+                    self._conn.commit()
+        finally:
+            self._conn.commit()
+            self._conn.execute('PRAGMA optimize')
+        
+        return count
+    
+    
+    def add_mirror(self, mirror, commit_every: int = 500) -> int:
+        '''Stores all entries of the local mirror
+        
+        Arguments:
+            mirror: mirror.Mirror object
+            commit_every: number of entries committed at once
+        
+        Returns:
+            number of stored entries
+        
+        '''
+        registry = _ds.CompoundRegistry()
+        entries = (_ds.ResponseToEntry(code, response, keep_response = False, registry = registry) \
+                   for code, response in mirror.iter_entry_data())
+        
+        return self.add(entries, commit_every)
+    
+    
+    def remove(self, codes: _typing.Iterable[str]) -> None:
+        '''Removes stored entries
+        
+        Arguments:
+            codes: data entry IDs
+        
+        '''
+        codes = [(code,) for code in codes]
+        with self._conn:
+            for table, column in (('entries', 'id'), ('components', 'entry_id'), ('points', 'entry_id')):
+                self._conn.executemany(f'DELETE FROM {table} WHERE {column} = ?', codes)
+        
+        return
+    
+    
+    #%% Queries
+    
+    def sql(self, query: str, params: _typing.Sequence = ()) -> _pd.DataFrame:
+        '''Runs arbitrary SQL query over entries, components, and points tables
+        
+        Arguments:
+            query: SQL query
+            params: query parameters
+        
+        Returns:
+            query results
+        
+        '''
+        return _pd.read_sql(query, self._conn, params = params)
+    
+    
+    def variables(self, prop: _typing.Optional[str] = None) -> _pd.DataFrame:
+        '''Returns stored variables with their units and number of values
+        
+        Arguments:
+            prop: if specified, only entries of this property are considered
+        
+        Returns:
+            dataframe with variable, unit, and count columns
+        
+        '''
+        query = 'SELECT p.variable, p.unit, COUNT(*) AS count FROM points p'
+        params = []
+        if prop is not None:
+            query += ' JOIN entries e ON e.id = p.entry_id WHERE e.property = ?'
+            params.append(prop)
+        query += ' GROUP BY p.variable, p.unit ORDER BY count DESC'
+        
+        return self.sql(query, params)
+    
+    
+    def _filter_entries(self, prop: _typing.Optional[str],
+                              compound: _typing.Optional[str],
+                              n_compounds: _typing.Optional[int]) -> _typing.Tuple[str, list]:
+        '''Returns SQL condition on the entries table aliased as e'''
+        where, params = ['1'], []
+        if prop is not None:
+            where.append('e.property = ?')
+            params.append(prop)
+        if n_compounds is not None:
+            where.append('e.num_components = ?')
+            params.append(n_compounds)
+        if compound is not None:
+            where.append('''e.id IN (SELECT entry_id FROM components
+                                     WHERE id = ? OR smiles = ? OR name LIKE ?)''')
+            params += [compound, compound, f'%{compound}%']
+        
+        return ' AND '.join(where), params
+    
+    
+    def entries(self, prop: _typing.Optional[str] = None,
+                      compound: _typing.Optional[str] = None,
+                      n_compounds: _typing.Optional[int] = None) -> _pd.DataFrame:
+        '''Returns metadata of stored entries
+        
+        Arguments:
+            prop: property name
+            compound: compound ID, SMILES, or part of the name (case-insensitive)
+            n_compounds: number of mixture compounds
+        
+        Returns:
+            dataframe with columns of the entries table
+        
+        '''
+        where, params = self._filter_entries(prop, compound, n_compounds)
+        
+        return self.sql(f'SELECT e.* FROM entries e WHERE {where} ORDER BY e.id', params)
+    
+    
+    def query(self, prop: _typing.Optional[str] = None,
+                    compound: _typing.Optional[str] = None,
+                    n_compounds: _typing.Optional[int] = None,
+                    conditions: _typing.Optional[_typing.Dict[_typing.Union[str, _typing.Tuple[str, str]], _typing.Tuple[float, float]]] = None,
+                    wide: bool = True) -> _pd.DataFrame:
+        '''Returns data points of stored entries satisfying the conditions
+        
+        Arguments:
+            prop: property name
+            compound: compound ID, SMILES, or part of the name (case-insensitive)
+            n_compounds: number of mixture compounds
+            conditions: maps variable names (see variables) or (variable, phase)
+                tuples to (min, max) ranges of values in SI units (see
+                units.SI_UNITS; values in other units are compared as stored);
+                None bound means no limit; a data point is returned only if all
+                variables are specified and within ranges
+            wide: if True, the result has one row per data point and one column
+                per variable containing values in SI units; phase is appended
+                to the column name, e.g. "Mole fraction of water => Gas", if the
+                variable is given for several phases; otherwise, the result
+                has one row per value
+        
+        Returns:
+            dataframe of data points; wide table is indexed by entry_id and point
+        
+        '''
+        where, where_params = self._filter_entries(prop, compound, n_compounds)
+        # each condition is a self-join of the points table on the data point;
+        # CROSS JOIN makes SQLite start from the value index of the first condition
+        tables, join_params = [], []
+        for i, (variable, (low, high)) in enumerate((conditions or {}).items()):
+            variable, phase = variable if isinstance(variable, tuple) else (variable, None)
+            cond = [f'c{i}.variable = ?']
+            cond_params = [variable]
+            if phase is not None:
+                cond.append(f'c{i}.phase = ?')
+                cond_params.append(phase)
+            if low is not None:
+                cond.append(f'c{i}.si_value >= ?')
+                cond_params.append(low)
+            if high is not None:
+                cond.append(f'c{i}.si_value <= ?')
+                cond_params.append(high)
+            if i == 0:
+                tables.append('points c0')
+                where += ' AND ' + ' AND '.join(cond)
+                where_params += cond_params
+            else:
+                cond = [f'c{i}.entry_id = c0.entry_id', f'c{i}.point = c0.point'] + cond
+                tables.append(f'CROSS JOIN points c{i} ON ' + ' AND '.join(cond))
+                join_params += cond_params
+        if tables:
+            tables.append('CROSS JOIN points p ON p.entry_id = c0.entry_id AND p.point = c0.point')
+        else:
+            tables.append('points p')
+        query = f'''SELECT p.*, e.property FROM {' '.join(tables)}
+                    JOIN entries e ON e.id = p.entry_id
+                    WHERE {where}
+                    ORDER BY p.entry_id, p.point'''
+        df = self.sql(query, join_params + where_params)
+        if wide:
+            # variables given for several phases get phase-qualified columns
+            num_phases = df.groupby('variable')['phase'].nunique(dropna = False)
+            qualified = df['variable'].map(num_phases).gt(1) & df['phase'].notna()
+            column = df['variable'].where(~qualified, df['variable'] + ' => ' + df['phase'])
+            df = df.assign(column = column).groupby(['entry_id', 'point', 'column'], sort = False)['si_value'].first()
+            df = df.unstack('column')
+            df.columns.name = None
+        
+        return df
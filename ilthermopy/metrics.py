@@ -0,0 +1,440 @@
+'''Instrumentation of HTTP requests and response parsing
+
+HTTP requests, JSON decoding, and parsing steps of the package report
+events (name, duration, attributes such as response size or number of
+rows) to registered handlers. Instrumentation is disabled until a handler
+is added, and then costs a single flag check per instrumented call.
+
+Handlers are callables receiving Event objects. MetricsRegistry aggregates
+events into per-operation counters and timings; OpenTelemetry spans are
+emitted after EnableOpenTelemetry is called (requires opentelemetry-api
+package). Events are reported by the calling thread and are not collected
+from worker processes (see parallel module).
+
+Event names:
+
+* http.get, http.stream: HTTP requests (attributes: url, bytes, cached);
+  for streamed responses, duration is the time spent waiting for the body;
+* json.decode: decoding of API responses (bytes);
+* api.GetHomepage, api.GetPropertyList, api.GetEntries, api.GetEntryData,
+  api.GetCompoundImage: API wrappers of the requests module, including
+  the HTTP request and decoding;
+* parse.ResponseToData (items = data points), parse.ResponseToCompound
+  (smiles_missing = compounds without SMILES), parse.ResponseToEntry,
+  parse.SearchItems (items = rows), parse.ResponseToSearchResults: parsing steps;
+* search.Search: search request including parsing.
+
+Examples:
+    >>> with Collect() as registry:
+    ...     entries = [GetEntry(code) for code in ids]
+    >>> print(registry.report())
+
+'''
+
+import time as _time
+import threading as _threading
+import functools as _functools
+import contextlib as _contextlib
+import typing as _typing
+from dataclasses import dataclass as _dataclass
+from dataclasses import field as _field
+
+import ilthermopy.misc as _misc
+
+
+_handlers = []
+_tracer = None
+_active = False
+_lock = _threading.Lock()
+
+
+#%% Events
+
+@_misc.add_slots
+@_dataclass
+class Event():
+    '''Single instrumented operation'''
+    
+    name: str
+    '''operation name, e.g. http.get or parse.ResponseToData'''
+    
+    start: float
+    '''start time, seconds since the epoch'''
+    
+    duration: float
+    '''duration of the operation, seconds'''
+    
+    attributes: _typing.Dict[str, _typing.Any] = _field(default_factory = dict)
+    '''operation details, e.g. url or bytes'''
+    
+    error: _typing.Optional[str] = _field(default = None)
+    '''name of the exception raised by the operation; None if it succeeded'''
+
+
+
+def _Update() -> None:
+    '''Recomputes whether instrumentation is active'''
+    global _active
+    _active = bool(_handlers) or _tracer is not None
+    
+    return
+
+
+def AddHandler(handler: _typing.Callable[[Event], None]) -> None:
+    '''Registers event handler and enables instrumentation
+    
+    Handlers are called synchronously in the instrumented thread, so they
+    must be fast and thread-safe; exceptions raised by handlers are ignored.
+    
+    Arguments:
+        handler: callable receiving Event objects, e.g. MetricsRegistry
+    
+    '''
+    with _lock:
+        _handlers.append(handler)
+        _Update()
+    
+    return
+
+
+def RemoveHandler(handler: _typing.Callable[[Event], None]) -> None:
+    '''Unregisters event handler; instrumentation is disabled if no handlers are left
+    
+    Arguments:
+        handler: previously registered handler
+    
+    '''
+    with _lock:
+        if handler in _handlers:
+            _handlers.remove(handler)
+        _Update()
+    
+    return
+
+
+def _Emit(event: Event) -> None:
+    '''Passes event to all handlers'''
+    for handler in list(_handlers):
+        try:
+            handler(event)
+        except Exception:
+            pass
+    
+    return
+
+
+def _Record(name: str, start: float, duration: float, **attributes) -> None:
+    '''Emits event of the operation measured by the caller, e.g. spread over
+    several calls of a generator; OpenTelemetry span is reported with the
+    given start time and duration'''
+    if not _active:
+        return
+    tracer = _tracer
+    if tracer is not None:
+        span = tracer.start_span(name, start_time = int(start * 1e9))
+        _SetAttributes(span, attributes)
+        span.end(end_time = int((start + duration) * 1e9))
+    if _handlers:
+        _Emit(Event(name, start, duration, attributes))
+    
+    return
+
+
+#%% OpenTelemetry
+
+def _SetAttributes(span, attributes: _typing.Dict[str, _typing.Any]) -> None:
+    '''Sets event attributes of primitive types as OpenTelemetry span attributes'''
+    for key, value in attributes.items():
+        if isinstance(value, (bool, int, float, str)):
+            span.set_attribute(f'ilthermopy.{key}', value)
+    
+    return
+
+
+def EnableOpenTelemetry(tracer = None) -> None:
+    '''Reports instrumented operations as OpenTelemetry spans
+    
+    Spans are nested in the span active in the calling thread, and event
+    attributes are set as span attributes.
+    
+    Arguments:
+        tracer: opentelemetry.trace.Tracer; tracer named ilthermopy from the
+            global tracer provider is used if not specified
+    
+    '''
+    global _tracer
+    if tracer is None:
+        try:
+            from opentelemetry import trace as _trace
+        except ImportError:
+            raise ImportError('OpenTelemetry spans require opentelemetry-api package: pip install opentelemetry-api')
+        tracer = _trace.get_tracer('ilthermopy')
+    with _lock:
+        _tracer = tracer
+        _Update()
+    
+    return
+
+
+def DisableOpenTelemetry() -> None:
+    '''Stops reporting OpenTelemetry spans'''
+    global _tracer
+    with _lock:
+        _tracer = None
+        _Update()
+    
+    return
+
+
+#%% Spans
+
+class _Span():
+    '''Context manager measuring the operation and emitting the event on exit'''
+    
+    __slots__ = ('name', 'attributes', '_start', '_clock', '_otel', '_otel_span')
+    
+    def __init__(self, name: str, attributes: _typing.Dict[str, _typing.Any]):
+        self.name = name
+        self.attributes = attributes
+        self._otel = None
+        
+        return
+    
+    
+    def set(self, **attributes) -> None:
+        '''Adds attributes to the event'''
+        self.attributes.update(attributes)
+        
+        return
+    
+    
+    def __enter__(self):
+        tracer = _tracer
+        if tracer is not None:
+            self._otel = tracer.start_as_current_span(self.name)
+            self._otel_span = self._otel.__enter__()
+        self._start = _time.time()
+        self._clock = _time.perf_counter()
+        
+        return self
+    
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration = _time.perf_counter() - self._clock
+        error = exc_type.__name__ if exc_type is not None else None
+        if self._otel is not None:
+            self._finish_otel(exc_type, exc, tb)
+        if _handlers:
+            _Emit(Event(self.name, self._start, duration, self.attributes, error))
+        
+        return False
+    
+    
+    def _finish_otel(self, exc_type, exc, tb) -> None:
+        '''Sets attributes of the OpenTelemetry span and ends it'''
+        _SetAttributes(self._otel_span, self.attributes)
+        self._otel.__exit__(exc_type, exc, tb)
+        self._otel = None
+        
+        return
+
+
+
+class _NoSpan():
+    '''Span doing nothing, used while instrumentation is disabled'''
+    
+    __slots__ = ()
+    
+    def set(self, **attributes) -> None:
+        return
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+
+_NO_SPAN = _NoSpan()
+
+
+def Span(name: str, **attributes):
+    '''Returns context manager reporting the enclosed operation as an event
+    
+    Arguments:
+        name: operation name
+        attributes: initial event attributes; more can be added with the
+            set method of the returned object
+    
+    Returns:
+        context manager; does nothing if instrumentation is disabled
+    
+    Examples:
+        >>> with Span('user.export', path = path) as span:
+        ...     n_rows = WriteParquet(entries, path)
+        ...     span.set(items = n_rows)
+    
+    '''
+    if not _active:
+        return _NO_SPAN
+    
+    return _Span(name, attributes)
+
+
+def Instrument(name: str,
+               attributes: _typing.Optional[_typing.Callable[[_typing.Any], _typing.Dict]] = None) -> _typing.Callable:
+    '''Decorator reporting each call of the function as an event
+    
+    Arguments:
+        name: operation name
+        attributes: function computing event attributes from the returned value
+    
+    Returns:
+        decorator
+    
+    '''
+    def decorator(func):
+        @_functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            with _Span(name, {}) as span:
+                result = func(*args, **kwargs)
+                if attributes is not None:
+                    span.attributes.update(attributes(result))
+            return result
+        return wrapper
+    
+    return decorator
+
+
+#%% Aggregation
+
+class _Stats():
+    '''Aggregated events of a single operation'''
+    
+    __slots__ = ('count', 'errors', 'total', 'min', 'max', 'sums')
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.sums = {}
+        
+        return
+
+
+
+class MetricsRegistry():
+    '''Event handler aggregating counts, timings, and numeric attributes per operation
+    
+    Numeric attributes of events (e.g. bytes, items, cached) are summed.
+    
+    Examples:
+        >>> registry = MetricsRegistry()
+        >>> AddHandler(registry)
+        >>> df = Search(n_compounds = 1)
+        >>> registry.summary()
+    
+    '''
+    
+    def __init__(self):
+        self._stats = {}
+        self._lock = _threading.Lock()
+        
+        return
+    
+    
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            stats = self._stats.get(event.name)
+            if stats is None:
+                stats = self._stats[event.name] = _Stats()
+            stats.count += 1
+            stats.errors += event.error is not None
+            stats.total += event.duration
+            stats.min = min(stats.min, event.duration)
+            stats.max = max(stats.max, event.duration)
+            for key, value in event.attributes.items():
+                if isinstance(value, (bool, int, float)):
+                    stats.sums[key] = stats.sums.get(key, 0) + value
+        
+        return
+    
+    
+    def reset(self) -> None:
+        '''Discards collected statistics'''
+        with self._lock:
+            self._stats = {}
+        
+        return
+    
+    
+    def summary(self):
+        '''Returns collected statistics
+        
+        Returns:
+            dataframe indexed by operation names, sorted by total time, with
+                count, errors, total_s, mean_ms, min_ms, and max_ms columns
+                and one column per summed numeric attribute
+        
+        '''
+        import pandas as _pd
+        with self._lock:
+            rows = [{'operation': name,
+                     'count': s.count,
+                     'errors': s.errors,
+                     'total_s': s.total,
+                     'mean_ms': 1e3 * s.total / s.count,
+                     'min_ms': 1e3 * s.min,
+                     'max_ms': 1e3 * s.max,
+                     **s.sums} for name, s in self._stats.items()]
+        if not rows:
+            return _pd.DataFrame(columns = ['count', 'errors', 'total_s', 'mean_ms', 'min_ms', 'max_ms'])
+        df = _pd.DataFrame(rows).set_index('operation').sort_values('total_s', ascending = False)
+        
+        return df
+    
+    
+    def report(self) -> str:
+        '''Returns collected statistics as a text table
+        
+        Returns:
+            human-readable summary, see the summary method
+        
+        '''
+        df = self.summary()
+        if df.empty:
+            return 'No instrumented operations were recorded'
+        if 'bytes' in df:
+            df['MB'] = df.pop('bytes') / 2**20
+        
+        return df.to_string(float_format = lambda x: f'{x:.3f}', na_rep = '')
+
+
+
+@_contextlib.contextmanager
+def Collect(registry: _typing.Optional[MetricsRegistry] = None) -> _typing.Iterator[MetricsRegistry]:
+    '''Context manager collecting events into the registry while it is active
+    
+    Arguments:
+        registry: registry to collect events into; a new one is created if
+            not specified
+    
+    Returns:
+        context manager returning the registry
+    
+    '''
+    registry = MetricsRegistry() if registry is None else registry
+    AddHandler(registry)
+    try:
+        yield registry
+    finally:
+        RemoveHandler(registry)
+    
+    return
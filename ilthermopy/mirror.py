@@ -0,0 +1,307 @@
+'''Local mirror of the ILThermo 2.0 database with incremental synchronization'''
+
+import os as _os
+import json as _json
+import time as _time
+import zlib as _zlib
+import sqlite3 as _sqlite3
+import typing as _typing
+from dataclasses import dataclass as _dataclass
+from dataclasses import field as _field
+
+import pandas as _pd
+
+import ilthermopy.requests as _req
+import ilthermopy.data_structs as _ds
+import ilthermopy.search as _search
+import ilthermopy.bulk as _bulk
+
+
+#%% Progress
+
+@_dataclass
+class SyncProgress():
+    '''State of the running synchronization'''
+    
+    done: int
+    '''number of processed entries, including failed ones'''
+    
+    total: int
+    '''number of entries to download'''
+    
+    failed: int
+    '''number of entries which failed to download'''
+    
+    elapsed: float
+    '''time since the start of the download, seconds'''
+    
+    bytes: int
+    '''size of downloaded response bodies, bytes'''
+    
+    @property
+    def rate(self) -> float:
+        '''download throughput, entries per second'''
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+
+@_dataclass
+class SyncReport():
+    '''Summary of the finished synchronization'''
+    
+    new: int
+    '''number of downloaded new entries'''
+    
+    updated: int
+    '''number of re-downloaded changed entries'''
+    
+    removed: int
+    '''number of entries removed as they are no longer listed'''
+    
+    unchanged: int
+    '''number of entries which were not downloaded as they are up-to-date'''
+    
+    elapsed: float
+    '''total synchronization time, seconds'''
+    
+    failed: _typing.Dict[str, str] = _field(default_factory = dict, repr = False)
+    '''maps IDs of entries which failed to download to error messages'''
+
+
+
+def PrintProgress(progress: SyncProgress) -> None:
+    '''Prints synchronization progress; can be used as the progress callback'''
+    print(f'{progress.done}/{progress.total} entries, {progress.failed} failed, '
+          f'{progress.rate:.1f} entries/s, {progress.bytes / 2**20:.1f} MB', flush = True)
+    
+    return
+
+
+#%% Mirror
+
+def _Fingerprint(row: _typing.Dict) -> str:
+    '''Summarizes listing row to detect changed entries'''
+    fields = ['reference', 'property', 'phases', 'num_data_points',
+              'cmp1_id', 'cmp2_id', 'cmp3_id']
+    values = [row.get(f) for f in fields]
+    values = [None if _pd.isna(v) else str(v) for v in values]
+    
+    return _json.dumps(values)
+
+
+
+def _Download(code: str, client: _typing.Optional[_req.Client]) -> bytes:
+    '''Downloads data entry API response; the body is decoded, so that
+    malformed responses fail'''
+    content = _req._get(_req.DATA_URL, {'set': code}, client)
+    _req._decode(content)
+    
+    return content
+
+
+
+class Mirror():
+    '''Local copy of ILThermo entries stored in a single SQLite file
+    
+    Data entry API responses are stored compressed as received together with the
+    search listing (GetAllEntries output) used to download them. Each entry
+    is stored with a fingerprint of its listing row (reference, property,
+    phases, number of data points, compound IDs), so the following calls of
+    sync only download new and changed entries. Downloaded entries are
+    committed in batches, so the interrupted synchronization is resumed
+    from the last checkpoint.
+    
+    Arguments:
+        path: path to the SQLite file
+    
+    Examples:
+        >>> mirror = Mirror('ilthermo.sqlite')
+        >>> report = mirror.sync(max_workers = 8, rate_limit = 10, progress = PrintProgress)
+        >>> entry = mirror.get_entry('cDowJ')
+    
+    '''
+    
+    def __init__(self, path: str):
+        directory = _os.path.dirname(_os.path.abspath(path))
+        _os.makedirs(directory, exist_ok = True)
+        self.path = path
+        self._conn = _sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS payloads (
+                                      id TEXT PRIMARY KEY,
+                                      fingerprint TEXT,
+                                      downloaded REAL,
+                                      data BLOB)''')
+        
+        return
+    
+    
+    def close(self) -> None:
+        '''Closes the database connection'''
+        self._conn.close()
+        
+        return
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        return
+    
+    
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM payloads').fetchone()[0]
+    
+    
+    def __contains__(self, code: str) -> bool:
+        row = self._conn.execute('SELECT 1 FROM payloads WHERE id = ?', (code,)).fetchone()
+        return row is not None
+    
+    
+    def ids(self) -> _typing.List[str]:
+        '''Returns IDs of stored entries'''
+        return [row[0] for row in self._conn.execute('SELECT id FROM payloads')]
+    
+    
+    def listing(self) -> _pd.DataFrame:
+        '''Returns search listing saved during the last synchronization
+        
+        Returns:
+            dataframe formatted as GetAllEntries output
+        
+        '''
+        exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'listing'").fetchone()
+        if not exists:
+            raise ValueError('Mirror was not synchronized yet')
+        df = _pd.read_sql('SELECT * FROM listing', self._conn)
+        
+        return df
+    
+    
+    def get_entry_data(self, code: str) -> dict:
+        '''Returns stored data entry API response
+        
+        Arguments:
+            code: data entry ID
+        
+        Returns:
+            dictionary containing info on data entry
+        
+        '''
+        row = self._conn.execute('SELECT data FROM payloads WHERE id = ?', (code,)).fetchone()
+        if row is None:
+            raise KeyError(f'Entry is not stored in the mirror: {code}')
+        
+        return _json.loads(_zlib.decompress(row[0]))
+    
+    
+    def get_entry(self, code: str) -> _ds.Entry:
+        '''Returns stored data entry
+        
+        Arguments:
+            code: data entry ID
+        
+        Returns:
+            Entry object
+        
+        '''
+        return _ds.ResponseToEntry(code, self.get_entry_data(code))
+    
+    
+    def iter_entry_data(self) -> _typing.Iterator[_typing.Tuple[str, dict]]:
+        '''Iterates over stored data entry API responses
+        
+        Returns:
+            iterator over (entry ID, response) tuples
+        
+        '''
+        for code, data in self._conn.execute('SELECT id, data FROM payloads ORDER BY id'):
+            yield code, _json.loads(_zlib.decompress(data))
+        
+        return
+    
+    
+    def iter_raw_data(self) -> _typing.Iterator[_typing.Tuple[str, bytes]]:
+        '''Iterates over stored data entry API responses without decoding them
+        
+        Returns:
+            iterator over (entry ID, zlib-compressed JSON) tuples, which can be
+                passed to parallel.ParsePayloads as is
+        
+        '''
+        for code, data in self._conn.execute('SELECT id, data FROM payloads ORDER BY id'):
+            yield code, data
+        
+        return
+    
+    
+    def sync(self, max_workers: int = 8,
+                   rate_limit: _typing.Optional[float] = None,
+                   client: _typing.Optional[_req.Client] = None,
+                   listing: _typing.Optional[_pd.DataFrame] = None,
+                   progress: _typing.Optional[_typing.Callable[[SyncProgress], None]] = None,
+                   checkpoint_every: int = 100) -> SyncReport:
+        '''Downloads new and changed entries and removes delisted ones
+        
+        Arguments:
+            max_workers: number of download threads
+            rate_limit: max number of requests per second; no limit if None
+            client: HTTP client; default client is used if not specified
+            listing: GetAllEntries output; loaded from ILThermo if not specified
+            progress: callback receiving SyncProgress after each checkpoint
+            checkpoint_every: number of downloaded entries committed at once
+        
+        Returns:
+            SyncReport object
+        
+        '''
+        start = _time.monotonic()
+        if listing is None:
+            listing = _search.GetAllEntries(client = client)
+        # compare with stored entries
+        stored = dict(self._conn.execute('SELECT id, fingerprint FROM payloads'))
+        fingerprints = {row['id']: _Fingerprint(row) for row in listing.to_dict('records')}
+        new = [code for code in fingerprints if code not in stored]
+        updated = [code for code, fp in fingerprints.items() if code in stored and stored[code] != fp]
+        removed = [code for code in stored if code not in fingerprints]
+        with self._conn:
+            self._conn.executemany('DELETE FROM payloads WHERE id = ?', [(code,) for code in removed])
+            listing.to_sql('listing', self._conn, if_exists = 'replace', index = False)
+        # download
+        start_download = _time.monotonic()
+        todo = new + updated
+        state = SyncProgress(done = 0, total = len(todo), failed = 0, elapsed = 0.0, bytes = 0)
+        failed = {}
+        batch = []
+        func = lambda code: _Download(code, client)
+        for code, content, error in _bulk._BulkMap(func, todo, max_workers, rate_limit):
+            state.done += 1
+            if error is not None:
+                state.failed += 1
+                failed[code] = f'{type(error).__name__}: {error}'
+            else:
+                state.bytes += len(content)
+                data = _zlib.compress(content)
+                batch.append( (code, fingerprints[code], _time.time(), data) )
+            if len(batch) >= checkpoint_every or state.done == state.total:
+                with self._conn:
+                    self._conn.executemany('INSERT OR REPLACE INTO payloads VALUES (?, ?, ?, ?)', batch)
+                batch = []
+                if progress is not None:
+                    state.elapsed = _time.monotonic() - start_download
+                    progress(state)
+        # report
+        report = SyncReport(new = len([code for code in new if code not in failed]),
+                            updated = len([code for code in updated if code not in failed]),
+                            removed = len(removed),
+                            unchanged = len(fingerprints) - len(todo),
+                            elapsed = _time.monotonic() - start,
+                            failed = failed)
+        
+        return report
+
+
@@ -1,11 +1,21 @@
 '''Miscellaneous functions'''
 
 import re as _re
+import typing as _typing
+import dataclasses as _dataclasses
+from functools import lru_cache as _lru_cache
 
 
+_ELEMENT_BOUNDARY = _re.compile(r'(?<=[A-Za-z])(?=[A-Z])')
+_ELEMENT_COUNT = _re.compile(r'([A-Z][a-z]*)(\d+(?:\.\d+)?)?')
+
+
+@_lru_cache(maxsize = 8192)
 def format_formula(formula: str) -> str:
     '''Formats chemical formula from ILThermo format to the alphabetically-ordered one
     
+    Results are memoized, as the same formulas recur across many entries.
+    
     Arguments:
         formula: HTML-formatted chemical formula in ILThermo 2.0 format
     
@@ -17,12 +27,76 @@ def format_formula(formula: str) -> str:
         'C4 H10 O'
     
     '''
-    formula = formula.replace('<SUB>', '').replace('</SUB>', ' ').strip()
-    while _re.search(r'([A-Z])([A-Z])', formula):
-        formula = _re.sub(r'([A-Z])([A-Z])', r'\1 \2', formula)
-    formula = _re.sub(r'([a-z])([A-Z])', r'\1 \2', formula)
+    formula = formula.replace('<SUB>', '').replace('</SUB>', ' ')
+    formula = _ELEMENT_BOUNDARY.sub(' ', formula)
     formula = ' '.join(sorted(formula.split()))
     
     return formula
 
 
+@_lru_cache(maxsize = 8192)
+def _parse_formula(formula: str) -> _typing.Tuple[_typing.Tuple[str, _typing.Union[int, float]], ...]:
+    '''Returns element counts of the formula as the hashable tuple'''
+    counts = {}
+    for element, count in _ELEMENT_COUNT.findall(format_formula(formula)):
+        count = (float(count) if '.' in count else int(count)) if count else 1
+        counts[element] = counts.get(element, 0) + count
+    
+    return tuple(counts.items())
+
+
+def parse_formula(formula: str) -> _typing.Dict[str, _typing.Union[int, float]]:
+    '''Parses chemical formula to element counts
+    
+    Arguments:
+        formula: chemical formula in ILThermo 2.0 format or formatted by
+            format_formula
+    
+    Returns:
+        dictionary mapping element symbols to their counts in alphabetical order
+    
+    Examples:
+        >>> parse_formula('C<SUB>4</SUB>H<SUB>10</SUB>O')
+        {'C': 4, 'H': 10, 'O': 1}
+    
+    '''
+    return dict(_parse_formula(formula))
+
+
+def add_slots(cls: type) -> type:
+    '''Recreates dataclass with __slots__ to reduce memory footprint of its instances
+    
+    Works like dataclass(slots = True) which is only available in Python 3.10+;
+    must be applied on top of the dataclass decorator. Instances of frozen
+    dataclasses get __getstate__ and __setstate__ methods, so that they can
+    be pickled and copied.
+    
+    Arguments:
+        cls: dataclass
+    
+    Returns:
+        dataclass with __slots__ containing all its fields
+    
+    '''
+    names = tuple(f.name for f in _dataclasses.fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict['__slots__'] = names
+    for name in names:
+        cls_dict.pop(name, None) # default values are kept by generated __init__
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    if cls.__dataclass_params__.frozen:
+        # default state restoring calls __setattr__, which raises in frozen dataclasses
+        def __getstate__(self):
+            return [getattr(self, name) for name in names]
+        def __setstate__(self, state):
+            for name, value in zip(names, state):
+                object.__setattr__(self, name, value)
+        cls_dict['__getstate__'] = __getstate__
+        cls_dict['__setstate__'] = __setstate__
+    slotted = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted.__qualname__ = cls.__qualname__
+    
+    return slotted
+
+
@@ -0,0 +1,286 @@
+'''Parsing of stored data entry API responses in a process pool
+
+Parsing is CPU-bound and holds the GIL, so reparsing a large archive of raw
+responses (e.g. a mirror.Mirror) in threads does not scale. Here payloads are
+sent to worker processes in chunks, and workers send back compact results:
+float64 arrays of data points with a small metadata dictionary, or Arrow
+record batches of the long-format table, instead of pickled DataFrames and
+Entry objects. Compressed payloads and file paths are decoded in the workers,
+so the calling process only reads the archive.
+
+Payloads can be given as:
+
+* (entry ID, response) tuples, where response is a decoded dictionary,
+  CompressedResponse, or bytes containing JSON, optionally zlib- or
+  gzip-compressed (the format of mirror.Mirror.iter_raw_data);
+* paths to JSON files (optionally gzip-compressed, \\*.json.gz) named after
+  entry IDs.
+
+'''
+
+import os as _os
+import gzip as _gzip
+import json as _json
+import zlib as _zlib
+import itertools as _itertools
+import collections as _collections
+import typing as _typing
+from collections.abc import Mapping as _Mapping
+from concurrent import futures as _futures
+from dataclasses import dataclass as _dataclass
+from dataclasses import field as _field
+
+import numpy as _np
+import pandas as _pd
+
+import ilthermopy.errors as _err
+import ilthermopy.data_structs as _ds
+import ilthermopy.export as _export
+
+
+Payload = _typing.Union[str, _typing.Tuple[str, _typing.Union[_Mapping, bytes]]]
+
+
+#%% Payloads
+
+def _PayloadID(payload: Payload) -> str:
+    '''Returns entry ID of the payload'''
+    if isinstance(payload, str):
+        name = _os.path.basename(payload)
+        for ext in ('.gz', '.json'):
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+        return name
+    
+    return payload[0]
+
+
+def _LoadPayload(payload: Payload) -> _typing.Mapping:
+    '''Returns decoded data entry API response'''
+    if isinstance(payload, str):
+        with open(payload, 'rb') as inpf:
+            response = inpf.read()
+    else:
+        response = payload[1]
+    if isinstance(response, _ds.CompressedResponse):
+        return response.decode()
+    if isinstance(response, _Mapping):
+        return response
+    if response[:2] == b'\x1f\x8b':
+        response = _gzip.decompress(response)
+    elif response[:1] == b'\x78':
+        response = _zlib.decompress(response)
+    
+    return _json.loads(response)
+
+
+def _Prepare(payload: Payload) -> Payload:
+    '''Replaces objects, which are expensive to send to workers, with bytes'''
+    if not isinstance(payload, str) and isinstance(payload[1], _ds.CompressedResponse):
+        return payload[0], payload[1]._data
+    
+    return payload
+
+
+#%% Results
+
+@_dataclass
+class ParsedEntry():
+    '''Compact result of parsing a single data entry API response
+    
+    Use to_entry to get the Entry object.
+    
+    '''
+    
+    id: str
+    '''data entry ID'''
+    
+    values: _typing.Optional[_np.ndarray] = _field(default = None, repr = False)
+    '''float64 array of data points, one row per point and one column per
+    column of Entry.data; None if parsing failed'''
+    
+    columns: _typing.List[str] = _field(default_factory = list, repr = False)
+    '''names of columns of values, e.g. V1, dV1, V2'''
+    
+    header: _typing.Dict[str, str] = _field(default_factory = dict, repr = False)
+    '''dictionary mapping column names to fullnames (see Entry.header)'''
+    
+    meta: _typing.Dict = _field(default_factory = dict, repr = False)
+    '''data entry API response without data points'''
+    
+    error: _typing.Optional[str] = _field(default = None)
+    '''description of the exception raised during parsing; None if the
+    response was parsed successfully'''
+    
+    @property
+    def ok(self) -> bool:
+        '''True if the response was parsed successfully'''
+        return self.error is None
+    
+    
+    @property
+    def data(self) -> _pd.DataFrame:
+        '''experimental data formatted as Entry.data'''
+        return _pd.DataFrame(self.values, columns = self.columns, copy = False)
+    
+    
+    def to_entry(self, registry: _typing.Optional[_ds.CompoundRegistry] = None) -> _ds.Entry:
+        '''Builds Entry object; raw response is not stored in the entry
+        
+        Arguments:
+            registry: if specified, components are shared with other entries
+                parsed with this registry (see data_structs.CompoundRegistry)
+        
+        Returns:
+            Entry object
+        
+        '''
+        if not self.ok:
+            raise _err.ILThermoResponseError('Data API (ilset)', f'{self.id}: {self.error}')
+        
+        return _ds._ResponseToEntry(self.id, self.meta, self.data, self.header, False, registry)
+
+
+
+def _ParseChunk(payloads: _typing.List[Payload]) -> _typing.List[ParsedEntry]:
+    '''Parses payloads to ParsedEntry objects; runs in worker processes'''
+    results = []
+    for payload in payloads:
+        code = _PayloadID(payload)
+        try:
+            response = _LoadPayload(payload)
+            data, header = _ds.ResponseToData(response)
+            meta = {key: value for key, value in response.items() if key != 'data'}
+            results.append(ParsedEntry(id = code,
+                                       values = data.to_numpy(dtype = _np.float64),
+                                       columns = list(data.columns),
+                                       header = header,
+                                       meta = meta))
+        except Exception as e:
+            results.append(ParsedEntry(id = code, error = f'{type(e).__name__}: {e}'))
+    
+    return results
+
+
+def _ParseChunkToRecordBatch(payloads: _typing.List[Payload]) -> _typing.Tuple[_typing.Any, _typing.List[_typing.Tuple[str, str]]]:
+    '''Parses payloads to the single long-format Arrow record batch; runs in
+    worker processes and returns the batch (None if all payloads failed) and
+    (entry ID, error) tuples'''
+    registry = _ds.CompoundRegistry()
+    entries, errors = [], []
+    for parsed in _ParseChunk(payloads):
+        if parsed.ok:
+            entries.append(parsed.to_entry(registry))
+        else:
+            errors.append( (parsed.id, parsed.error) )
+    batch = None
+    if entries:
+        batch = next(_export.EntriesToRecordBatches(entries, batch_rows = _np.iinfo(_np.int64).max))
+    
+    return batch, errors
+
+
+#%% Process pool
+
+def _MapChunks(func: _typing.Callable,
+               payloads: _typing.Iterable[Payload],
+               max_workers: _typing.Optional[int],
+               chunksize: int) -> _typing.Iterator:
+    '''Applies func to chunks of payloads in a process pool and yields results
+    in order of chunks; only a bounded window of chunks is submitted at once'''
+    if chunksize < 1:
+        raise ValueError(f'Chunk size must be positive: {chunksize}')
+    if max_workers is None:
+        max_workers = _os.cpu_count() or 1
+    if max_workers < 1:
+        raise ValueError(f'Number of workers must be positive: {max_workers}')
+    payloads = iter(payloads)
+    chunks = iter(lambda: [_Prepare(p) for p in _itertools.islice(payloads, chunksize)], [])
+    if max_workers == 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+    window = _collections.deque()
+    executor = _futures.ProcessPoolExecutor(max_workers)
+    try:
+        for chunk in _itertools.islice(chunks, 2 * max_workers):
+            window.append(executor.submit(func, chunk))
+        while window:
+            future = window.popleft()
+            for chunk in _itertools.islice(chunks, 1):
+                window.append(executor.submit(func, chunk))
+            yield future.result()
+    finally:
+        for future in window:
+            future.cancel()
+        executor.shutdown(wait = True)
+    
+    return
+
+
+def ParsePayloads(payloads: _typing.Iterable[Payload],
+                  max_workers: _typing.Optional[int] = None,
+                  chunksize: int = 64) -> _typing.Iterator[ParsedEntry]:
+    '''Parses data entry API responses in a process pool
+    
+    Failure of a single payload does not abort parsing; the error is
+    returned in the corresponding ParsedEntry instead.
+    
+    Arguments:
+        payloads: (entry ID, response) tuples or paths to JSON files; can be
+            a lazy iterator, e.g. mirror.Mirror.iter_raw_data output
+        max_workers: number of worker processes; number of CPUs by default;
+            if 1, payloads are parsed in the calling process
+        chunksize: number of payloads sent to a worker at once
+    
+    Returns:
+        iterator over ParsedEntry objects in order of payloads
+    
+    Examples:
+        >>> with Mirror('ilthermo.sqlite') as mirror:
+        ...     registry = CompoundRegistry()
+        ...     for parsed in ParsePayloads(mirror.iter_raw_data()):
+        ...         if parsed.ok:
+        ...             process(parsed.to_entry(registry))
+    
+    '''
+    for results in _MapChunks(_ParseChunk, payloads, max_workers, chunksize):
+        yield from results
+    
+    return
+
+
+def ParsePayloadsToRecordBatches(payloads: _typing.Iterable[Payload],
+                                 max_workers: _typing.Optional[int] = None,
+                                 chunksize: int = 64,
+                                 skip_errors: bool = False) -> _typing.Iterator:
+    '''Parses data entry API responses to long-format Arrow record batches
+    in a process pool
+    
+    Each chunk of payloads is converted to the single batch in a worker, so
+    the batches can be passed directly to the Parquet writer. Requires pyarrow
+    package.
+    
+    Arguments:
+        payloads: (entry ID, response) tuples or paths to JSON files; can be
+            a lazy iterator
+        max_workers: number of worker processes; number of CPUs by default;
+            if 1, payloads are parsed in the calling process
+        chunksize: number of payloads converted to a single batch
+        skip_errors: if True, payloads which failed to parse are skipped,
+            otherwise ILThermoResponseError is raised
+    
+    Returns:
+        iterator over pyarrow.RecordBatch objects with export.LongFormatSchema
+            schema in order of payloads
+    
+    '''
+    _export._CheckArrow()
+    for batch, errors in _MapChunks(_ParseChunkToRecordBatch, payloads, max_workers, chunksize):
+        if errors and not skip_errors:
+            code, error = errors[0]
+            raise _err.ILThermoResponseError('Data API (ilset)', f'{code}: {error}')
+        if batch is not None:
+            yield batch
+    
+    return
@@ -6,16 +6,30 @@ Attributes:
     SEARCH_URL (str): relative URL for the search API
     DATA_URL   (str): relative URL for loading entrie's data
     IMAGE_URL  (str): relative URL for compound's image API
+    RETRY_STATUSES (tuple): HTTP status codes of responses which are retried
+    UPDATE_CHECK_RETRY (float): delay before the next check of the database
+        update date if ILThermo homepage was unreachable, seconds
 
 '''
 
-import requests as _requests
+import time as _time
+import threading as _threading
 import typing as _typing
 try:
     from typing import Literal as _Literal
 except ImportError:
     from typing_extensions import Literal as _Literal
 
+import requests as _requests
+from requests.adapters import HTTPAdapter as _HTTPAdapter
+from urllib3.util.retry import Retry as _Retry
+
+import ilthermopy.errors as _err
+import ilthermopy.json_stream as _json_stream
+import ilthermopy.metrics as _metrics
+
+from ilthermopy.cache import ResponseCache
+
 
 # API URLs
 BASE_URL   = 'https://ilthermo.boulder.nist.gov/'
@@ -24,40 +38,332 @@ SEARCH_URL = f'{BASE_URL}/ILT2/ilsearch'
 DATA_URL   = f'{BASE_URL}/ILT2/ilset'
 IMAGE_URL = f'{BASE_URL}/ILT2/ilimage'
 
+# HTTP settings
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+UPDATE_CHECK_RETRY = 600
+
+
+#%% HTTP client
+
+def _Rebase(url: str, base_url: _typing.Optional[str]) -> str:
+    '''Replaces BASE_URL in the URL with base_url if it is specified'''
+    if base_url is not None and url.startswith(BASE_URL):
+        url = base_url.rstrip('/') + '/' + url[len(BASE_URL):].lstrip('/')
+    
+    return url
+
+
+
+class Client():
+    '''HTTP client shared by all ILThermo API wrappers
+    
+    Keeps a single requests.Session with a pool of keep-alive connections,
+    so consecutive requests do not pay for a new TCP+TLS handshake. Failed
+    connections and responses with RETRY_STATUSES codes are retried with
+    exponential backoff (Retry-After header is respected).
+    
+    Arguments:
+        timeout: connect and read timeout, seconds
+        pool_size: max number of kept-alive connections per host; should not be
+            less than the number of threads using the client simultaneously
+        retries: max number of retries for a single request
+        backoff_factor: backoff factor for delays between retries, seconds
+        headers: additional HTTP headers sent with every request
+        cache: persistent response cache; responses are not cached if None
+        base_url: if specified, replaces BASE_URL in requested URLs, e.g. to
+            use a local stand-in server (see testing.FixtureServer)
+    
+    Attributes:
+        session (requests.Session): underlying HTTP session
+        timeout (float): connect and read timeout, seconds
+        cache (ResponseCache): persistent response cache
+        base_url (str): URL replacing BASE_URL; None if ILThermo is used
+    
+    Examples:
+        >>> with Client(pool_size = 16, retries = 5) as client:
+        ...     entry = GetEntry('cDowJ', client = client)
+    
+    '''
+    
+    def __init__(self, timeout: float = 60,
+                       pool_size: int = 10,
+                       retries: int = 3,
+                       backoff_factor: float = 0.5,
+                       headers: _typing.Optional[_typing.Dict[str, str]] = None,
+                       cache: _typing.Optional[ResponseCache] = None,
+                       base_url: _typing.Optional[str] = None):
+        self.timeout = timeout
+        self.cache = cache
+        self.base_url = base_url
+        self._cache_check_after = 0.0
+        retry = _Retry(total = retries,
+                       backoff_factor = backoff_factor,
+                       status_forcelist = RETRY_STATUSES,
+                       respect_retry_after_header = True,
+                       raise_on_status = False)
+        adapter = _HTTPAdapter(pool_connections = pool_size,
+                               pool_maxsize = pool_size,
+                               max_retries = retry)
+        self.session = _requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        
+        return
+    
+    
+    def get(self, url: str,
+                  params: _typing.Optional[_typing.Dict] = None,
+                  use_cache: bool = True) -> bytes:
+        '''Sends GET request and checks the response status
+        
+        Arguments:
+            url: requested URL
+            params: query parameters
+            use_cache: if False, the response cache is bypassed
+        
+        Returns:
+            response body
+        
+        '''
+        url = self._url(url)
+        use_cache = use_cache and self.cache is not None
+        with _metrics.Span('http.get', url = url) as span:
+            if use_cache:
+                self._check_cache()
+                content = self.cache.get(url, params)
+                if content is not None:
+                    span.set(bytes = len(content), cached = True)
+                    return content
+            r = self.session.get(url, params = params, timeout = self.timeout)
+            r.raise_for_status()
+            content = r.content
+            span.set(bytes = len(content), cached = False)
+        if use_cache:
+            self.cache.set(url, params, content)
+        
+        return content
+    
+    
+    def stream(self, url: str,
+                     params: _typing.Optional[_typing.Dict] = None,
+                     chunk_size: int = 2**16,
+                     use_cache: bool = True) -> _typing.Iterator[bytes]:
+        '''Sends GET request and yields the response body in chunks as it is received
+        
+        If the response cache is used, the cached body is yielded in chunks,
+        and the downloaded body is cached once it is entirely received.
+        
+        Arguments:
+            url: requested URL
+            params: query parameters
+            chunk_size: max size of a chunk, bytes
+            use_cache: if False, the response cache is bypassed
+        
+        Returns:
+            iterator over chunks of the response body
+        
+        '''
+        url = self._url(url)
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            self._check_cache()
+            content = self.cache.get(url, params)
+            if content is not None:
+                _metrics._Record('http.stream', _time.time(), 0.0, url = url, bytes = len(content), cached = True)
+                for start in range(0, len(content), chunk_size):
+                    yield content[start:start+chunk_size]
+                return
+        received = []
+        # time spent by the consumer between chunks is not measured
+        start, waited, size = _time.time(), _time.perf_counter(), 0
+        with self.session.get(url, params = params, timeout = self.timeout, stream = True) as r:
+            r.raise_for_status()
+            chunks = r.iter_content(chunk_size)
+            waited = _time.perf_counter() - waited
+            while True:
+                clock = _time.perf_counter()
+                chunk = next(chunks, None)
+                waited += _time.perf_counter() - clock
+                if chunk is None:
+                    break
+                size += len(chunk)
+                if use_cache:
+                    received.append(chunk)
+                yield chunk
+        _metrics._Record('http.stream', start, waited, url = url, bytes = size, cached = False)
+        if use_cache:
+            self.cache.set(url, params, b''.join(received))
+        
+        return
+    
+    
+    def _url(self, url: str) -> str:
+        '''Replaces BASE_URL with base_url if it is specified'''
+        return _Rebase(url, self.base_url)
+    
+    
+    def _check_cache(self) -> None:
+        '''Clears outdated cache once per client if cache.invalidate_on_update is set;
+        if ILThermo homepage is unreachable, cached responses are served and the
+        check is retried in UPDATE_CHECK_RETRY seconds'''
+        if not self.cache.invalidate_on_update or _time.monotonic() < self._cache_check_after:
+            return
+        from ilthermopy.updates import GetLastUpdate
+        try:
+            db_updated = GetLastUpdate(self)
+        except (_requests.RequestException, _err.ILThermoResponseError):
+            self._cache_check_after = _time.monotonic() + UPDATE_CHECK_RETRY
+            return
+        self.cache.check_update(db_updated.strftime('%Y-%m-%d'))
+        self._cache_check_after = float('inf')
+        
+        return
+    
+    
+    def close(self) -> None:
+        '''Closes all pooled connections'''
+        self.session.close()
+        
+        return
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        return
+
+
+_default_client = None
+_default_client_lock = _threading.Lock()
+
+
+def GetDefaultClient() -> Client:
+    '''Returns client used by API wrappers if no client is passed explicitly
+    
+    Returns:
+        module-wide Client object, created on first call
+    
+    '''
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = Client()
+    
+    return _default_client
+
 
-def GetHomepage() -> str:
+def SetDefaultClient(client: _typing.Optional[Client]) -> None:
+    '''Replaces client used by API wrappers if no client is passed explicitly
+    
+    Arguments:
+        client: new default client; if None, the default one will be recreated
+            with default settings on the next request
+    
+    '''
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+    
+    return
+
+
+def _get(url: str, params: _typing.Optional[_typing.Dict] = None,
+         client: _typing.Optional[Client] = None,
+         use_cache: bool = True) -> bytes:
+    '''Sends GET request via the given client or the default one'''
+    if client is None:
+        client = GetDefaultClient()
+    
+    return client.get(url, params, use_cache)
+
+
+def _decode(content: bytes) -> _typing.Any:
+    '''Decodes JSON response'''
+    with _metrics.Span('json.decode', bytes = len(content)):
+        return _json_stream.loads(content)
+
+
+#%% API wrappers
+
+def SearchParams(compound: _typing.Optional[str] = None,
+                 n_compounds: _Literal[None,1,2,3] = None,
+                 prop_key: _typing.Optional[str] = None,
+                 year: _typing.Optional[int] = None,
+                 author: _typing.Optional[str] = None,
+                 keywords: _typing.Optional[str] = None) -> _typing.Dict[str, str]:
+    '''Prepares query parameters of the search API
+    
+    Arguments:
+        compound: chemical formula, CAS registry number, or name (part or full)
+        n_compounds: number of mixture compounds
+        prop_key: key of physico-chemical property (view available via GetPropertyList)
+        year: publication year
+        author: author's last name
+        keywords: keywords presumably specified in paper's title
+    
+    Returns:
+        dictionary of query parameters
+    
+    '''
+    params = {'cmp' : compound,
+              'ncmp': n_compounds,
+              'year': year,
+              'auth': author,
+              'keyw': keywords,
+              'prp' : prop_key}
+    params = {key: '' if val is None else str(val) for key, val in params.items()} # to get the same url as in the website
+    
+    return params
+
+
+@_metrics.Instrument('api.GetHomepage')
+def GetHomepage(client: _typing.Optional[Client] = None) -> str:
     '''Returns HTML of the ILThermo's homepage
     
+    Arguments:
+        client: HTTP client; default client is used if not specified
+    
     Returns:
         HTML-formatted ILThermo homepage (JS functionality disabled)
     
     '''
-    r = _requests.get(BASE_URL)
-    r.raise_for_status()
+    content = _get(BASE_URL, client = client, use_cache = False)
     
-    return r.text
+    return content.decode('utf-8', errors = 'replace')
 
 
-def GetPropertyList() -> dict:
+@_metrics.Instrument('api.GetPropertyList')
+def GetPropertyList(client: _typing.Optional[Client] = None) -> dict:
     '''Extracts available ILThermo properties and their API keys
     
+    Arguments:
+        client: HTTP client; default client is used if not specified
+    
     Returns:
         dictionary containing two-level structured info on
             currently available physchemical properties and their API keys
     
     '''
-    r = _requests.get(PROPS_URL)
-    r.raise_for_status()
+    content = _get(PROPS_URL, client = client)
     
-    return r.json()
+    return _decode(content)
 
 
+@_metrics.Instrument('api.GetEntries')
 def GetEntries(compound: _typing.Optional[str] = None,
                n_compounds: _Literal[None,1,2,3] = None,
                prop_key: _typing.Optional[str] = None,
                year: _typing.Optional[int] = None,
                author: _typing.Optional[str] = None,
-               keywords: _typing.Optional[str] = None) -> dict:
+               keywords: _typing.Optional[str] = None,
+               client: _typing.Optional[Client] = None) -> dict:
     '''Wrapper for database search request
     
     Arguments:
@@ -67,29 +373,57 @@ def GetEntries(compound: _typing.Optional[str] = None,
         year: publication year
         author: author's last name
         keywords: keywords presumably specified in paper's title
+        client: HTTP client; default client is used if not specified
     
     Returns:
         dictionary containing ILThermo search response
     
     '''
-    params = {'cmp' : compound,
-              'ncmp': n_compounds,
-              'year': year,
-              'auth': author,
-              'keyw': keywords,
-              'prp' : prop_key}
-    params = {key: '' if val is None else val for key, val in params.items()} # to get the same url as in the website
-    r = _requests.get(SEARCH_URL, params)
-    r.raise_for_status()
+    params = SearchParams(compound, n_compounds, prop_key, year, author, keywords)
+    content = _get(SEARCH_URL, params, client)
+    
+    return _decode(content)
+
+
+def StreamEntries(compound: _typing.Optional[str] = None,
+                  n_compounds: _Literal[None,1,2,3] = None,
+                  prop_key: _typing.Optional[str] = None,
+                  year: _typing.Optional[int] = None,
+                  author: _typing.Optional[str] = None,
+                  keywords: _typing.Optional[str] = None,
+                  client: _typing.Optional[Client] = None,
+                  other: _typing.Optional[_typing.Dict] = None) -> _typing.Iterator[_typing.List]:
+    '''Wrapper for database search request decoding found entries as they are received
+    
+    Arguments:
+        compound: chemical formula, CAS registry number, or name (part or full)
+        n_compounds: number of mixture compounds
+        prop_key: key of physico-chemical property (view available via GetPropertyList)
+        year: publication year
+        author: author's last name
+        keywords: keywords presumably specified in paper's title
+        client: HTTP client; default client is used if not specified
+        other: if specified, the other members of the search response (e.g.
+            errors) are stored in this dictionary once the iterator is exhausted
+    
+    Returns:
+        iterator over rows of the res member of the search response
+    
+    '''
+    params = SearchParams(compound, n_compounds, prop_key, year, author, keywords)
+    if client is None:
+        client = GetDefaultClient()
     
-    return r.json()
+    return _json_stream.IterArray(client.stream(SEARCH_URL, params), 'res', other)
 
 
-def GetEntryData(setid: str) -> dict:
+@_metrics.Instrument('api.GetEntryData')
+def GetEntryData(setid: str, client: _typing.Optional[Client] = None) -> dict:
     '''Wrapper for loading of data entry
     
     Arguments:
         setid: entry ID
+        client: HTTP client; default client is used if not specified
     
     Returns:
         dictionary containing info on data entry, including reference, compounds,
@@ -97,26 +431,26 @@ def GetEntryData(setid: str) -> dict:
     
     '''
     
-    r = _requests.get(DATA_URL, {'set': setid})
-    r.raise_for_status()
+    content = _get(DATA_URL, {'set': setid}, client)
     
-    return r.json()
+    return _decode(content)
 
 
-def GetCompoundImage(idout: str) -> bytes:
+@_metrics.Instrument('api.GetCompoundImage')
+def GetCompoundImage(idout: str, client: _typing.Optional[Client] = None) -> bytes:
     '''Wrapper for loading of compound's image
     
     Arguments:
         idout: compound ID
+        client: HTTP client; default client is used if not specified
     
     Returns:
         bytes-formatted PNG image
     
     '''
     
-    r = _requests.get(IMAGE_URL, {'key': idout})
-    r.raise_for_status()
+    content = _get(IMAGE_URL, {'key': idout}, client)
     
-    return r.content
+    return content
 
 
@@ -1,60 +1,174 @@
-'''Search-related functions'''
+'''Search-related functions
 
+Attributes:
+    SEARCH_COLUMNS (list): columns of the dataframe containing search results
+
+'''
+
+import itertools as _itertools
 import typing as _typing
+from concurrent import futures as _futures
 try:
     from typing import Literal as _Literal
 except ImportError:
     from typing_extensions import Literal as _Literal
 
+import numpy as _np
 import pandas as _pd
 
 import ilthermopy.errors as _err
 import ilthermopy.requests as _req
 import ilthermopy.data_structs as _ds
+import ilthermopy.metrics as _metrics
+import ilthermopy.listing as _listing
+
+from ilthermopy.compound_list import SharedCompounds as _SharedCompounds
+
 
-from ilthermopy.compound_list import _compounds as _cmp
+SEARCH_COLUMNS = ['id', 'reference', 'property', 'phases', 'num_phases',
+                  'num_components', 'num_data_points'] + \
+                 [f'cmp{i}{suffix}' for i in (1,2,3) for suffix in ('', '_id', '_smiles')]
 
 
-def ShowPropertyList() -> None:
-    '''Prints list of properties available in ILThermo 2.0 database'''
-    _ds.PropertyList().Show()
+def ShowPropertyList(client: _typing.Optional[_req.Client] = None) -> None:
+    '''Prints list of properties available in ILThermo 2.0 database
+    
+    Arguments:
+        client: HTTP client; default client is used if not specified
+    
+    '''
+    _ds.SharedPropertyList(client).Show()
     
     return
 
 
-def _SearchItemToRow(r: _typing.List) -> _typing.Dict:
-    '''Transforms row in ILThermo search response to the dictionary formatted 
-    for the dataframe containing search results'''
-    # basic info
-    row = {'id': r[0],
-           'reference': r[1],
-           'property': r[2],
-           'phases': r[3],
-           'num_phases': r[3].count(';') + 1,
-           'num_components': len(r) - 8,
-           'num_data_points': int(r[7])}
+@_metrics.Instrument('parse.SearchItems', lambda df: {'items': df.shape[0]})
+def _SearchItemsToFrame(res: _typing.List[_typing.List]) -> _pd.DataFrame:
+    '''Transforms rows of ILThermo search response to the dataframe column-wise'''
+    if not res:
+        return _pd.DataFrame(columns = SEARCH_COLUMNS)
+    # row layout: id, reference, property, phases, 3 compound IDs,
+    # number of data points, compound names
+    lengths = _np.fromiter(map(len, res), dtype = _np.int64, count = len(res))
+    if lengths.min() < 8:
+        raise IndexError('Search result row is too short')
+    ids, refs, props, phases, code1, code2, code3, points = zip(*[r[:8] for r in res])
+    columns = {'id': ids,
+               'reference': refs,
+               'property': props,
+               'phases': phases,
+               'num_phases': _np.char.count(_np.array(phases, dtype = str), ';') + 1,
+               'num_components': lengths - 8,
+               'num_data_points': _np.asarray(points).astype(_np.int64)}
     # compounds
-    for i, j in enumerate(range(4, 7)):
-        code, name = (r[j], r[j+4]) if r[j] is not None else (None, None)
-        row[f'cmp{i+1}'] = name
-        row[f'cmp{i+1}_id'] = code
-        smiles = _cmp.id2smiles.get(code, None)
-        if not smiles:
-            smiles = _cmp.name2smiles.get(name, None)
-        row[f'cmp{i+1}_smiles'] = smiles
+    id2smiles, name2smiles = _SharedCompounds().id2smiles, _SharedCompounds().name2smiles
+    for i, codes in enumerate( (code1, code2, code3) ):
+        names = [r[8+i] if code is not None else None for r, code in zip(res, codes)]
+        columns[f'cmp{i+1}'] = names
+        columns[f'cmp{i+1}_id'] = codes
+        columns[f'cmp{i+1}_smiles'] = [id2smiles.get(code) or name2smiles.get(name)
+                                       for code, name in zip(codes, names)]
+    df = _pd.DataFrame(columns)
+    
+    return df
+
+
+def PropertyKey(prop: str, plist: _ds.PropertyList) -> str:
+    '''Translates property name to its API key
+    
+    Arguments:
+        prop: name of physico-chemical property
+        plist: list of available properties
+    
+    Returns:
+        API key of the property
+    
+    '''
+    prop_key = plist.prop2key.get(prop, None)
+    if prop_key is None:
+        raise ValueError(f'Unknown property: {prop}\nCheck available properties via the ilt.ShowPropertyList function')
+    
+    return prop_key
+
+
+@_metrics.Instrument('parse.ResponseToSearchResults')
+def ResponseToSearchResults(response: _typing.Dict) -> _pd.DataFrame:
+    '''Transforms search API response to the dataframe
+    
+    Arguments:
+        response: search API response
+    
+    Returns:
+        dataframe containing main info on found entries
+    
+    '''
+    # process returned errors
+    errors = response.get('errors', [])
+    if errors:
+        raise _err.ILThermoSearchError(errors)
+    # transform to table
+    try:
+        df = _SearchItemsToFrame(response['res'])
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise _err.ILThermoResponseError('Search API', 'Unexpected JSON structure')
     
-    return row
+    return df
 
 
+def _StreamToSearchResults(rows: _typing.Iterator[_typing.List],
+                           other: _typing.Dict,
+                           chunk_rows: int) -> _pd.DataFrame:
+    '''Transforms incrementally decoded rows of search API response to the
+    dataframe in chunks of chunk_rows rows'''
+    frames = []
+    try:
+        while True:
+            chunk = list(_itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            frames.append(_SearchItemsToFrame(chunk))
+            del chunk
+    except (KeyError, IndexError, ValueError, TypeError):
+        # error responses may contain no res member
+        if other.get('errors'):
+            raise _err.ILThermoSearchError(other['errors'])
+        raise _err.ILThermoResponseError('Search API', 'Unexpected JSON structure')
+    # process returned errors
+    errors = other.get('errors', [])
+    if errors:
+        raise _err.ILThermoSearchError(errors)
+    if not frames:
+        return _pd.DataFrame(columns = SEARCH_COLUMNS)
+    # columns containing only None values in some chunks are not inferred as strings
+    df = _pd.concat(frames, ignore_index = True).infer_objects()
+    
+    return df
+
+
+@_metrics.Instrument('search.Search')
 def Search(compound: _typing.Optional[str] = None,
            n_compounds: _Literal[None,1,2,3] = None,
            prop: _typing.Optional[str] = None,
            prop_key: _typing.Optional[str] = None,
            year: _typing.Optional[int] = None,
            author: _typing.Optional[str] = None,
-           keywords: _typing.Optional[str] = None) -> _pd.DataFrame:
+           keywords: _typing.Optional[str] = None,
+           client: _typing.Optional[_req.Client] = None,
+           stream: bool = False,
+           chunk_rows: int = 10000,
+           offline: _typing.Union[bool, '_listing.LocalListing'] = False) -> _pd.DataFrame:
     '''Runs ILThermo search and returns results as a dataframe
     
+    By default, the whole response is decoded before the dataframe is built.
+    With stream = True, the response is decoded while it is being downloaded,
+    and found entries are transformed to the dataframe in chunks of chunk_rows
+    rows, so peak memory of large searches depends on the chunk size rather
+    than on the number of decoded rows.
+    
+    With offline = True, the search is answered from the search listing
+    stored by listing.UpdateListing without requests to ILThermo; see the
+    listing module for differences from ILThermo search.
+    
     Arguments:
         compound: chemical formula, CAS registry number, or name (part or full)
         n_compounds: number of mixture compounds
@@ -63,47 +177,91 @@ def Search(compound: _typing.Optional[str] = None,
         year: publication year
         author: author's last name
         keywords: keywords presumably specified in paper's title
+        client: HTTP client; default client is used if not specified
+        stream: if True, the response is decoded and transformed incrementally
+        chunk_rows: number of rows transformed at once if stream is True
+        offline: if True, the shared stored listing (listing.SharedListing)
+            is searched; listing.LocalListing object can be passed instead;
+            client and stream must not be specified, as no requests are sent
     
     Returns:
         dataframe containing main info on found entries
     
     '''
+    # search stored listing
+    if offline is not False:
+        if client is not None or stream:
+            raise ValueError('client and stream are not used by offline search')
+        if offline is True:
+            offline = _listing.SharedListing()
+        return offline.search(compound = compound,
+                              n_compounds = n_compounds,
+                              prop = prop,
+                              prop_key = prop_key,
+                              year = year,
+                              author = author,
+                              keywords = keywords)
     # get property key
     if not prop_key and prop:
-        plist = _ds.PropertyList()
-        prop_key = plist.prop2key.get(prop, None)
-        if prop_key is None:
-            raise ValueError(f'Unknown property: {prop}\nCheck available properties via the ilt.ShowPropertyList function')
+        prop_key = PropertyKey(prop, _ds.SharedPropertyList(client))
     # run search API
+    if stream:
+        other = {}
+        rows = _req.StreamEntries(compound = compound,
+                                  n_compounds = n_compounds,
+                                  prop_key = prop_key,
+                                  year = year,
+                                  author = author,
+                                  keywords = keywords,
+                                  client = client,
+                                  other = other)
+        return _StreamToSearchResults(rows, other, chunk_rows)
     data = _req.GetEntries(compound = compound,
                            n_compounds = n_compounds,
                            prop_key = prop_key,
                            year = year,
                            author = author,
-                           keywords = keywords)
-    # process returned errors
-    errors = data.get('errors', [])
-    if errors:
-        raise _err.ILThermoSearchError(errors)
-    # transform to table
-    try:
-        rows = [_SearchItemToRow(r) for r in data['res']]
-    except (KeyError, IndexError, ValueError, TypeError):
-        raise _err.ILThermoResponseError('Search API', 'Unexpected JSON structure')
-    df = _pd.DataFrame(rows)
+                           keywords = keywords,
+                           client = client)
+    df = ResponseToSearchResults(data)
     
     return df
 
 
-def GetAllEntries() -> _pd.DataFrame:
+def GetAllEntries(client: _typing.Optional[_req.Client] = None,
+                  shard_by_property: bool = False,
+                  max_workers: int = 3,
+                  stream: bool = False) -> _pd.DataFrame:
     '''Returns main info on all available ILThermo entries
     
+    The listing is split into shards by the number of compounds and,
+    optionally, by property; shards are loaded and parsed concurrently,
+    and duplicated entries are removed.
+    
+    Arguments:
+        client: HTTP client; default client is used if not specified
+        shard_by_property: if True, each number of compounds is further split
+            by properties from SharedPropertyList, which results in many smaller
+            responses; entries with properties missing in the list are not loaded
+        max_workers: number of shards loaded simultaneously
+        stream: if True, shards are decoded and transformed incrementally
+            (see Search)
+    
     Returns:
         dataframe containing all currently available entries
     
     '''
-    df = _pd.concat([Search(n_compounds = i) for i in (1,2,3)],
-                    ignore_index = True)
+    shards = [{'n_compounds': i} for i in (1,2,3)]
+    if shard_by_property:
+        prop_keys = list(_ds.SharedPropertyList(client).key2prop)
+        shards = [{'n_compounds': i, 'prop_key': key} for i in (1,2,3) for key in prop_keys]
+    search = lambda kwargs: Search(client = client, stream = stream, **kwargs)
+    with _futures.ThreadPoolExecutor(max_workers) as executor:
+        frames = [df for df in executor.map(search, shards) if not df.empty]
+    if not frames:
+        return _pd.DataFrame(columns = SEARCH_COLUMNS)
+    df = _pd.concat(frames, ignore_index = True)
+    df = df.drop_duplicates('id', ignore_index = True)
     
     return df
 
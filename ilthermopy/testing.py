@@ -0,0 +1,408 @@
+'''Offline stand-ins for the ILThermo API: recorded fixtures, record/replay
+transport, and a local HTTP server
+
+Recorded responses are stored in a fixture directory, one JSON file per
+request, and are matched by API endpoint (ilprpls, ilsearch, ilset, ilimage,
+or the homepage) and query parameters regardless of the host. They can be
+replayed in-process by ReplayClient or served over HTTP by FixtureServer,
+which additionally emulates network latency and server errors, so that
+concurrency, caching, and retries can be exercised deterministically offline.
+
+Examples:
+    >>> with RecordingClient('fixtures') as client:  # online, once
+    ...     entry = GetEntry('cDowJ', client = client)
+    >>> with FixtureServer('fixtures', latency = 0.05, error_rate = 0.1, seed = 0) as server:
+    ...     client = Client(base_url = server.base_url)
+    ...     entry = GetEntry('cDowJ', client = client)
+
+'''
+
+import io as _io
+import os as _os
+import json as _json
+import time as _time
+import base64 as _base64
+import random as _random
+import threading as _threading
+import typing as _typing
+import http.server as _http_server
+from urllib.parse import urlsplit as _urlsplit
+from urllib.parse import parse_qsl as _parse_qsl
+
+import requests as _requests
+from requests.adapters import BaseAdapter as _BaseAdapter
+from requests.structures import CaseInsensitiveDict as _CaseInsensitiveDict
+
+import ilthermopy.requests as _req
+from ilthermopy.cache import CacheKey as _CacheKey
+
+
+#%% Fixtures
+
+def _SplitURL(url: str) -> _typing.Tuple[str, _typing.Dict[str, str]]:
+    '''Returns API endpoint (last path component) and query parameters of the URL'''
+    parts = _urlsplit(url)
+    endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1]
+    params = dict(_parse_qsl(parts.query, keep_blank_values = True))
+    
+    return endpoint, params
+
+
+class Fixtures():
+    '''Directory of recorded API responses
+    
+    Arguments:
+        path: fixture directory; created if missing
+    
+    Attributes:
+        path (str): fixture directory
+    
+    '''
+    
+    def __init__(self, path: str):
+        _os.makedirs(path, exist_ok = True)
+        self.path = path
+        self._lock = _threading.Lock()
+        
+        return
+    
+    
+    def _file(self, endpoint: str, params: _typing.Dict[str, str]) -> str:
+        '''Returns path to the fixture file of the request'''
+        return _os.path.join(self.path, f'{endpoint or "home"}-{_CacheKey(endpoint, params)[:16]}.json')
+    
+    
+    def add(self, endpoint: str,
+                  params: _typing.Dict[str, str],
+                  body: bytes,
+                  status: int = 200,
+                  content_type: str = 'application/json') -> None:
+        '''Stores response
+        
+        Arguments:
+            endpoint: API endpoint, e.g. ilset; empty string for the homepage
+            params: query parameters
+            body: response body
+            status: HTTP status code
+            content_type: value of the Content-Type header
+        
+        '''
+        record = {'endpoint': endpoint, 'params': params,
+                  'status': status, 'content_type': content_type}
+        try:
+            record['text'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            record['base64'] = _base64.b64encode(body).decode('ascii')
+        path = self._file(endpoint, params)
+        with self._lock:
+            with open(f'{path}.tmp', 'w', encoding = 'utf-8') as outf:
+                _json.dump(record, outf, ensure_ascii = False, indent = 1)
+            _os.replace(f'{path}.tmp', path)
+        
+        return
+    
+    
+    def get(self, endpoint: str,
+                  params: _typing.Dict[str, str]) -> _typing.Optional[_typing.Tuple[int, str, bytes]]:
+        '''Returns stored response
+        
+        Arguments:
+            endpoint: API endpoint
+            params: query parameters
+        
+        Returns:
+            (status, content type, body) tuple; None if response is not recorded
+        
+        '''
+        path = self._file(endpoint, params)
+        if not _os.path.exists(path):
+            return None
+        with open(path, encoding = 'utf-8') as inpf:
+            record = _json.load(inpf)
+        if 'text' in record:
+            body = record['text'].encode('utf-8')
+        else:
+            body = _base64.b64decode(record['base64'])
+        
+        return record['status'], record['content_type'], body
+    
+    
+    def __len__(self) -> int:
+        return len([f for f in _os.listdir(self.path) if f.endswith('.json')])
+
+
+
+#%% Record / replay transport
+
+class RecordingAdapter(_BaseAdapter):
+    '''Transport adapter passing requests to another adapter and recording responses
+    
+    Arguments:
+        fixtures: fixture storage
+        adapter: adapter sending the actual requests
+    
+    '''
+    
+    def __init__(self, fixtures: Fixtures, adapter: _BaseAdapter):
+        super().__init__()
+        self.fixtures = fixtures
+        self.adapter = adapter
+        
+        return
+    
+    
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code == 200:
+            endpoint, params = _SplitURL(request.url)
+            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            self.fixtures.add(endpoint, params, response.content, response.status_code, content_type)
+        
+        return response
+    
+    
+    def close(self):
+        self.adapter.close()
+        
+        return
+
+
+
+class ReplayAdapter(_BaseAdapter):
+    '''Transport adapter serving recorded responses without network access
+    
+    Requests missing in fixtures raise requests.ConnectionError.
+    
+    Arguments:
+        fixtures: fixture storage
+    
+    '''
+    
+    def __init__(self, fixtures: Fixtures):
+        super().__init__()
+        self.fixtures = fixtures
+        
+        return
+    
+    
+    def send(self, request, **kwargs):
+        endpoint, params = _SplitURL(request.url)
+        record = self.fixtures.get(endpoint, params)
+        if record is None:
+            raise _requests.ConnectionError(f'Response is not recorded: {request.url}', request = request)
+        status, content_type, body = record
+        response = _requests.Response()
+        response.status_code = status
+        response.reason = _http_server.BaseHTTPRequestHandler.responses.get(status, ('',))[0]
+        response.headers = _CaseInsensitiveDict({'Content-Type': content_type,
+                                                 'Content-Length': str(len(body))})
+        # raw stream serves both content and iter_content (streamed requests)
+        response.raw = _io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        
+        return response
+    
+    
+    def close(self):
+        return
+
+
+
+def RecordingClient(fixtures: _typing.Union[str, Fixtures], **kwargs) -> _req.Client:
+    '''Creates HTTP client recording all successful responses
+    
+    Arguments:
+        fixtures: fixture directory or Fixtures object
+        kwargs: parameters of the Client
+    
+    Returns:
+        Client object
+    
+    '''
+    fixtures = Fixtures(fixtures) if isinstance(fixtures, str) else fixtures
+    client = _req.Client(**kwargs)
+    for prefix in ('https://', 'http://'):
+        adapter = RecordingAdapter(fixtures, client.session.get_adapter(prefix))
+        client.session.mount(prefix, adapter)
+    
+    return client
+
+
+def ReplayClient(fixtures: _typing.Union[str, Fixtures], **kwargs) -> _req.Client:
+    '''Creates HTTP client serving recorded responses without network access
+    
+    Arguments:
+        fixtures: fixture directory or Fixtures object
+        kwargs: parameters of the Client
+    
+    Returns:
+        Client object
+    
+    '''
+    fixtures = Fixtures(fixtures) if isinstance(fixtures, str) else fixtures
+    client = _req.Client(**kwargs)
+    adapter = ReplayAdapter(fixtures)
+    for prefix in ('https://', 'http://'):
+        client.session.mount(prefix, adapter)
+    
+    return client
+
+
+#%% Local server
+
+class _FixtureHandler(_http_server.BaseHTTPRequestHandler):
+    '''Serves recorded responses of FixtureServer'''
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        return
+    
+    
+    def _send(self, status: int, content_type: str, body: bytes,
+                    headers: _typing.Optional[_typing.Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        
+        return
+    
+    
+    def do_GET(self):
+        server = self.server.fixture_server
+        endpoint, params = _SplitURL(self.path)
+        delay, error = server._next_request(endpoint)
+        if delay:
+            _time.sleep(delay)
+        if error:
+            headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else None
+            self._send(server.error_status, 'text/plain', b'Injected error', headers)
+            return
+        record = server.fixtures.get(endpoint, params)
+        if record is None:
+            self._send(404, 'text/plain', b'Response is not recorded')
+            return
+        self._send(*record)
+        
+        return
+
+
+
+class FixtureServer():
+    '''Local HTTP server imitating ILThermo API with recorded responses
+    
+    The server runs in a background thread. Pass its base_url to the HTTP
+    client to redirect all API wrappers to it:
+    
+        >>> with FixtureServer('fixtures', latency = (0.01, 0.1), seed = 0) as server:
+        ...     SetDefaultClient(Client(base_url = server.base_url))
+    
+    Arguments:
+        fixtures: fixture directory or Fixtures object
+        latency: delay before each response, seconds; either a constant or
+            (min, max) range of uniformly distributed delays
+        error_rate: probability of responding with error_status instead of
+            the recorded response
+        error_status: HTTP status code of injected errors
+        retry_after: value of Retry-After header of injected errors; not sent if None
+        seed: seed of the random generator of latencies and errors
+        host: host to bind
+        port: port to bind; a free port is chosen if 0
+    
+    Attributes:
+        base_url (str): URL of the running server
+        requests (dict): number of received requests per endpoint
+    
+    '''
+    
+    def __init__(self, fixtures: _typing.Union[str, Fixtures],
+                       latency: _typing.Union[float, _typing.Tuple[float, float]] = 0.0,
+                       error_rate: float = 0.0,
+                       error_status: int = 503,
+                       retry_after: _typing.Optional[float] = None,
+                       seed: _typing.Optional[int] = None,
+                       host: str = '127.0.0.1',
+                       port: int = 0):
+        self.fixtures = Fixtures(fixtures) if isinstance(fixtures, str) else fixtures
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = {}
+        self._failures = {}
+        self._random = _random.Random(seed)
+        self._lock = _threading.Lock()
+        self._server = _http_server.ThreadingHTTPServer( (host, port), _FixtureHandler)
+        self._server.daemon_threads = True
+        self._server.fixture_server = self
+        self._thread = None
+        host, port = self._server.server_address[:2]
+        self.base_url = f'http://{host}:{port}/'
+        
+        return
+    
+    
+    def _next_request(self, endpoint: str) -> _typing.Tuple[float, bool]:
+        '''Registers request and returns its delay and whether it must fail'''
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if isinstance(self.latency, (tuple, list)):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            error = self._random.random() < self.error_rate
+            if self._failures.get(endpoint, 0) > 0:
+                self._failures[endpoint] -= 1
+                error = True
+        
+        return delay, error
+    
+    
+    def fail_next(self, endpoint: str, n: int = 1) -> None:
+        '''Makes the next n requests to the endpoint fail with error_status
+        
+        Arguments:
+            endpoint: API endpoint, e.g. ilset
+            n: number of failed requests
+        
+        '''
+        with self._lock:
+            self._failures[endpoint] = self._failures.get(endpoint, 0) + n
+        
+        return
+    
+    
+    def start(self) -> 'FixtureServer':
+        '''Starts serving in a background thread'''
+        if self._thread is None:
+            self._thread = _threading.Thread(target = self._server.serve_forever, daemon = True)
+            self._thread.start()
+        
+        return self
+    
+    
+    def stop(self) -> None:
+        '''Stops the server and closes its socket'''
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        
+        return
+    
+    
+    def __enter__(self):
+        return self.start()
+    
+    
+    def __exit__(self, *args):
+        self.stop()
+        
+        return
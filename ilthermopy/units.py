@@ -0,0 +1,213 @@
+'''Parsing of data column fullnames and conversion of values to SI units
+
+ILThermo describes each data column with a free-text fullname, e.g.
+"Temperature, K" or "Viscosity, Pa&#8226;s => Liquid", which is stored in the
+Entry.header attribute. The set of distinct fullnames is small, so parsed
+fullnames are memoized.
+
+Attributes:
+    SI_UNITS (dict): maps ILThermo units to (SI unit, conversion factor) tuples
+
+'''
+
+import re as _re
+import html as _html
+import typing as _typing
+from functools import lru_cache as _lru_cache
+from dataclasses import dataclass as _dataclass
+
+import numpy as _np
+import pandas as _pd
+
+import ilthermopy.misc as _misc
+
+
+SI_UNITS = {
+    # temperature
+    'K': ('K', 1.0),
+    '1/K': ('1/K', 1.0),
+    # pressure
+    'Pa': ('Pa', 1.0),
+    'kPa': ('Pa', 1e3),
+    'MPa': ('Pa', 1e6),
+    'bar': ('Pa', 1e5),
+    '1/Pa': ('1/Pa', 1.0),
+    '1/kPa': ('1/Pa', 1e-3),
+    '1/MPa': ('1/Pa', 1e-6),
+    # volumetric properties
+    'kg/m^3': ('kg/m^3', 1.0),
+    'g/cm^3': ('kg/m^3', 1e3),
+    'm^3/mol': ('m^3/mol', 1.0),
+    'cm^3/mol': ('m^3/mol', 1e-6),
+    'm^3/kg': ('m^3/kg', 1.0),
+    # transport properties
+    'Pa·s': ('Pa·s', 1.0),
+    'mPa·s': ('Pa·s', 1e-3),
+    'm^2/s': ('m^2/s', 1.0),
+    'S/m': ('S/m', 1.0),
+    'mS/cm': ('S/m', 0.1),
+    'W/m/K': ('W/m/K', 1.0),
+    # energetic properties
+    'J/mol': ('J/mol', 1.0),
+    'kJ/mol': ('J/mol', 1e3),
+    'J/K/mol': ('J/K/mol', 1.0),
+    'J/g': ('J/kg', 1e3),
+    'J/K/g': ('J/K/kg', 1e3),
+    'J/kg': ('J/kg', 1.0),
+    'J/K/kg': ('J/K/kg', 1.0),
+    # surface tension, speed of sound
+    'N/m': ('N/m', 1.0),
+    'mN/m': ('N/m', 1e-3),
+    'm/s': ('m/s', 1.0),
+    # concentrations
+    'mol/kg': ('mol/kg', 1.0),
+    'mol/m^3': ('mol/m^3', 1.0),
+    'mol/dm^3': ('mol/m^3', 1e3),
+    'mol/l': ('mol/m^3', 1e3),
+    # miscellaneous
+    'm': ('m', 1.0),
+    'nm': ('m', 1e-9),
+    'Hz': ('Hz', 1.0),
+    'kHz': ('Hz', 1e3),
+    'MHz': ('Hz', 1e6),
+}
+
+
+@_misc.add_slots
+@_dataclass(frozen = True)
+class ColumnInfo():
+    '''Parsed fullname of the data column'''
+    
+    variable: str
+    '''variable name, e.g. "Temperature" or "Mole fraction of water"'''
+    
+    unit: _typing.Optional[str]
+    '''plain-text measurement unit, e.g. "Pa·s" or "kg/m^3"; None for
+    dimensionless variables'''
+    
+    phase: _typing.Optional[str]
+    '''phase name; None if not specified'''
+    
+    is_error: bool
+    '''True if the column contains measurement errors of the variable'''
+
+
+
+def _CleanUnit(unit: str) -> str:
+    '''Transforms HTML-formatted unit to the plain text'''
+    unit = _re.sub(r'<SUP>(.*?)</SUP>', r'^\1', unit)
+    unit = _re.sub(r'<SUB>(.*?)</SUB>', r'\1', unit)
+    unit = _html.unescape(unit).replace('•', '·')
+    
+    return unit.strip()
+
+
+@_lru_cache(maxsize = None)
+def ParseFullname(fullname: str) -> ColumnInfo:
+    '''Splits data column fullname to variable name, unit, and phase
+    
+    Arguments:
+        fullname: column fullname from Entry.header
+    
+    Returns:
+        ColumnInfo object
+    
+    Examples:
+        >>> ParseFullname('Error of viscosity, Pa&#8226;s => Liquid')
+        ColumnInfo(variable='Viscosity', unit='Pa·s', phase='Liquid', is_error=True)
+    
+    '''
+    text, _, phase = fullname.partition(' => ')
+    is_error = text.startswith('Error of ')
+    if is_error:
+        text = text[len('Error of '):]
+        text = text[:1].upper() + text[1:]
+    variable, unit = text, None
+    if ', ' in text:
+        head, tail = text.rsplit(', ', 1)
+        # compound names may contain commas too, e.g. "1-pentanol, 5-phenyl-"
+        bare = _re.sub(r'<SUP>.*?</SUP>|&#\d+;', '', tail)
+        if _re.fullmatch(r'[A-Za-z0-9%/.() ]+', bare) and \
+           all(len(word) <= 5 for word in _re.findall(r'[A-Za-z]+', bare)):
+            variable, unit = head, _CleanUnit(tail)
+    
+    return ColumnInfo(variable.strip(), unit, phase.strip() or None, is_error)
+
+
+def ParseHeader(header: _typing.Dict[str, str]) -> _typing.Dict[str, ColumnInfo]:
+    '''Parses all column fullnames of the data entry
+    
+    Arguments:
+        header: Entry.header dictionary
+    
+    Returns:
+        dictionary mapping column names to ColumnInfo objects
+    
+    '''
+    return {col: ParseFullname(fullname) for col, fullname in header.items()}
+
+
+@_lru_cache(maxsize = None)
+def CanonicalName(variable: str) -> str:
+    '''Transforms variable name to the snake-case column name
+    
+    Arguments:
+        variable: variable name
+    
+    Returns:
+        lowercase name containing only letters, digits, and underscores
+    
+    Examples:
+        >>> CanonicalName('Heat capacity at constant pressure')
+        'heat_capacity_at_constant_pressure'
+    
+    '''
+    name = _re.sub(r'[^0-9a-z]+', '_', variable.lower()).strip('_')
+    
+    return name or 'value'
+
+
+def NormalizeData(data: _pd.DataFrame,
+                  header: _typing.Dict[str, str],
+                  si: bool = True) -> _typing.Tuple[_pd.DataFrame, _typing.Dict[str, ColumnInfo]]:
+    '''Renames data columns to canonical names and converts values to SI units
+    
+    Columns are named after variables (see CanonicalName); phase name is
+    appended if the same variable is given for several phases, and "_error"
+    suffix is added to measurement errors. Values in units missing in SI_UNITS
+    are kept as is.
+    
+    Arguments:
+        data: Entry.data dataframe
+        header: Entry.header dictionary
+        si: if True, values and errors are converted to SI units
+    
+    Returns:
+        dataframe with canonical column names, and dictionary mapping them to
+        ColumnInfo objects with updated units
+    
+    '''
+    infos = [ParseFullname(header[col]) for col in data.columns]
+    # canonical names
+    names = [CanonicalName(info.variable) for info in infos]
+    counts = {}
+    for name, info in zip(names, infos):
+        if not info.is_error:
+            counts[name] = counts.get(name, 0) + 1
+    columns = []
+    for name, info in zip(names, infos):
+        if counts.get(name, 0) > 1 and info.phase:
+            name = f'{name}_{CanonicalName(info.phase)}'
+        columns.append(f'{name}_error' if info.is_error else name)
+    columns = [f'{name}_{i+1}' if name in columns[:i] else name for i, name in enumerate(columns)]
+    # unit conversion
+    factors = _np.ones(len(infos))
+    if si:
+        for i, info in enumerate(infos):
+            if info.unit in SI_UNITS:
+                unit, factors[i] = SI_UNITS[info.unit]
+                infos[i] = ColumnInfo(info.variable, unit, info.phase, info.is_error)
+    values = data.to_numpy(dtype = _np.float64) * factors
+    df = _pd.DataFrame(values, columns = columns, index = data.index)
+    
+    return df, dict(zip(columns, infos))
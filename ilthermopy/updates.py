@@ -1,6 +1,7 @@
 '''Checks if ilthermopy package is up-to-date with ILThermo 2.0 database'''
 
 import re as _re
+import typing as _typing
 from datetime import datetime as _datetime
 
 from ilthermopy import __updated__
@@ -8,18 +9,37 @@ import ilthermopy.errors as _err
 import ilthermopy.requests as _req
 
 
-def CheckLastUpdate() -> None:
-    '''Prints date of the last ILThermo 2.0 update'''
-    # get update date from homepage
-    html = _req.GetHomepage()
+def GetLastUpdate(client: _typing.Optional[_req.Client] = None) -> _datetime:
+    '''Extracts date of the last ILThermo 2.0 update from its homepage
+    
+    Arguments:
+        client: HTTP client; default client is used if not specified
+    
+    Returns:
+        date of the last database update
+    
+    '''
+    html = _req.GetHomepage(client)
     match = _re.search('Updated on ([a-zA-Z]+ +\d+, +\d+)', html)
     if match is None:
         raise _err.ILThermoResponseError('Homepage', 'cannot extract update date')
-    # compare dates
     try:
         db_updated = _datetime.strptime(match.group(1), '%B %d, %Y')
     except ValueError:
         raise _err.ILThermoResponseError('Homepage', f'cannot parse extracted update date: "{match.group(1)}"')
+    
+    return db_updated
+
+
+def CheckLastUpdate(client: _typing.Optional[_req.Client] = None) -> None:
+    '''Prints date of the last ILThermo 2.0 update
+    
+    Arguments:
+        client: HTTP client; default client is used if not specified
+    
+    '''
+    # compare dates
+    db_updated = GetLastUpdate(client)
     lib_updated = _datetime.strptime(__updated__, '%B %d, %Y')
     # message
     print(f'ILThermo 2.0 database was last updated on {db_updated.strftime("%B %d, %Y")}')
@@ -0,0 +1,50 @@
+'''Shared fixtures: synthetic API responses served by testing.FixtureServer'''
+
+import json
+
+import pytest
+
+import ilthermopy.requests as req
+from ilthermopy.testing import Fixtures, FixtureServer
+
+
+ENTRY_IDS = [f'E{i:04d}' for i in range(10)]
+
+
+def EntryResponse(code: str, n_points: int = 3) -> dict:
+    '''Returns data entry API response of a binary mixture with n_points points'''
+    components = [{'idout': 'ABChct', 'name': '1-butyl-3-methylimidazolium hexafluorophosphate',
+                   'formula': 'C<SUB>8</SUB>H<SUB>15</SUB>F<SUB>6</SUB>N<SUB>2</SUB>P', 'mw': '284.18',
+                   'sample': [['Source:', 'commercial'], ['Purity:', '99 mass %']]},
+                  {'idout': 'AAdMNH', 'name': 'water', 'formula': 'H<SUB>2</SUB>O', 'mw': '18.02',
+                   'sample': [['Source:', 'distilled']]}]
+    data = [[[f'{100 + i}'], [f'{0.1 * (i + 1):.2f}'], [f'{298.15 + i}'], [f'{1.1 + 0.01 * i:.4f}', '0.0001']]
+            for i in range(n_points)]
+    return {'ref': {'full': 'Smith, J.; Doe, A. (2004) J. Chem. 6(8), 369-381.', 'title': f'A study of {code}'},
+            'title': 'Volumetric properties: Density', 'phases': ['Liquid'],
+            'components': components, 'expmeth': 'Pycnometric', 'solvent': None,
+            'constr': [], 'footer': '',
+            'dhead': [['Pressure, kPa'], ['Mole fraction of water', 'Liquid'], ['Temperature, K'],
+                      ['Density, g/cm<SUP>3</SUP>', 'Liquid']],
+            'data': data}
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    '''Fixture directory with responses of ENTRY_IDS entries'''
+    fixtures = Fixtures(str(tmp_path / 'fixtures'))
+    for code in ENTRY_IDS:
+        fixtures.add('ilset', {'set': code}, json.dumps(EntryResponse(code)).encode())
+    return fixtures
+
+
+@pytest.fixture
+def entry_server(fixtures):
+    with FixtureServer(fixtures) as server:
+        yield server
+
+
+@pytest.fixture
+def entry_client(entry_server):
+    with req.Client(base_url = entry_server.base_url, backoff_factor = 0) as client:
+        yield client
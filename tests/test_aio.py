@@ -0,0 +1,58 @@
+'''Asynchronous client against testing.FixtureServer'''
+
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from ilthermopy.aio import AsyncClient
+from ilthermopy.cache import ResponseCache
+
+from conftest import ENTRY_IDS
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_get_entry_via_base_url(entry_server):
+    async def main():
+        async with AsyncClient(base_url = entry_server.base_url) as client:
+            return await asyncio.gather(*(client.get_entry(code) for code in ENTRY_IDS))
+    entries = run(main())
+    assert [entry.id for entry in entries] == ENTRY_IDS
+    assert entries[0].num_data_points == 3
+    assert entry_server.requests['ilset'] == len(ENTRY_IDS)
+
+
+def test_retry(entry_server):
+    entry_server.fail_next('ilset', 2)
+    async def main():
+        async with AsyncClient(base_url = entry_server.base_url, retries = 3, backoff_factor = 0) as client:
+            return await client.get_entry(ENTRY_IDS[0])
+    assert run(main()).id == ENTRY_IDS[0]
+    assert entry_server.requests['ilset'] == 3
+
+
+def test_retries_exhausted(entry_server):
+    entry_server.fail_next('ilset', 3)
+    async def main():
+        async with AsyncClient(base_url = entry_server.base_url, retries = 2, backoff_factor = 0) as client:
+            return await client.get_entry(ENTRY_IDS[0])
+    with pytest.raises(aiohttp.ClientResponseError):
+        run(main())
+    assert entry_server.requests['ilset'] == 3
+
+
+def test_response_cache(entry_server, tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), invalidate_on_update = False)
+    async def main():
+        async with AsyncClient(base_url = entry_server.base_url, cache = cache) as client:
+            first = await client.get_entry(ENTRY_IDS[0])
+            second = await client.get_entry(ENTRY_IDS[0])
+            return first, second
+    first, second = run(main())
+    assert first.data.equals(second.data)
+    assert entry_server.requests['ilset'] == 1
+    assert cache.stats().hits == 1
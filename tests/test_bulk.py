@@ -0,0 +1,94 @@
+'''Concurrent and lazy download of data entries'''
+
+import time
+
+import pytest
+import requests
+
+from ilthermopy.bulk import RateLimiter, GetEntriesBulk, IterEntries
+from ilthermopy.requests import Client
+from ilthermopy.testing import FixtureServer
+
+from conftest import ENTRY_IDS
+
+
+def test_failed_entry_does_not_abort_batch(entry_client):
+    ids = ENTRY_IDS[:3] + ['MISSING'] + ENTRY_IDS[3:]
+    results = {res.id: res for res in GetEntriesBulk(ids, max_workers = 4, client = entry_client)}
+    assert sorted(results) == sorted(ids)
+    assert not results['MISSING'].ok
+    assert isinstance(results['MISSING'].error, requests.HTTPError)
+    assert results['MISSING'].entry is None
+    for code in ENTRY_IDS:
+        assert results[code].ok
+        assert results[code].entry.id == code
+        assert results[code].entry.num_data_points == 3
+
+
+def test_rate_limit(entry_client):
+    start = time.monotonic()
+    results = list(GetEntriesBulk(ENTRY_IDS, max_workers = 8, rate_limit = 20, client = entry_client))
+    elapsed = time.monotonic() - start
+    assert len(results) == len(ENTRY_IDS)
+    # requests are spaced by 1/rate seconds
+    assert elapsed >= (len(ENTRY_IDS) - 1) / 20
+
+
+def test_rate_limiter_spacing():
+    limiter = RateLimiter(50)
+    times = []
+    for _ in range(5):
+        limiter.wait()
+        times.append(time.monotonic())
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 0.02 * 0.9
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+
+def test_single_worker_keeps_input_order(entry_client):
+    ids = list(reversed(ENTRY_IDS))
+    assert [res.id for res in GetEntriesBulk(ids, max_workers = 1, client = entry_client)] == ids
+
+
+def test_iter_entries_keeps_input_order(entry_client):
+    ids = list(reversed(ENTRY_IDS))
+    entries = list(IterEntries(ids, prefetch = 4, max_workers = 4, client = entry_client))
+    assert [entry.id for entry in entries] == ids
+
+
+def test_iter_entries_prefetch_window(entry_client):
+    consumed = []
+    def ids():
+        for code in ENTRY_IDS:
+            consumed.append(code)
+            yield code
+    entries = IterEntries(ids(), prefetch = 3, max_workers = 2, client = entry_client)
+    assert next(entries).id == ENTRY_IDS[0]
+    # the window is refilled when an entry is taken from it
+    assert len(consumed) == 4
+    assert next(entries).id == ENTRY_IDS[1]
+    assert len(consumed) == 5
+    assert [entry.id for entry in entries] == ENTRY_IDS[2:]
+
+
+def test_iter_entries_skip_errors(entry_client):
+    ids = ENTRY_IDS[:3] + ['MISSING'] + ENTRY_IDS[3:]
+    entries = IterEntries(ids, skip_errors = True, client = entry_client)
+    assert [entry.id for entry in entries] == ENTRY_IDS
+    loaded = []
+    with pytest.raises(requests.HTTPError):
+        for entry in IterEntries(ids, client = entry_client):
+            loaded.append(entry.id)
+    assert loaded == ENTRY_IDS[:3]
+
+
+def test_iter_entries_close_cancels_downloads(fixtures):
+    with FixtureServer(fixtures, latency = 0.2) as server, \
+         Client(base_url = server.base_url, backoff_factor = 0) as client:
+        entries = IterEntries(ENTRY_IDS, prefetch = 5, max_workers = 1, client = client)
+        assert next(entries).id == ENTRY_IDS[0]
+        entries.close()
+        time.sleep(0.2 * 6)
+        # the first entry and the one being downloaded at closing
+        assert server.requests['ilset'] <= 2
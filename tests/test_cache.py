@@ -0,0 +1,105 @@
+'''Persistent response cache'''
+
+import os
+import time
+import json
+
+import pytest
+
+from ilthermopy.cache import ResponseCache
+
+
+URL = 'https://ilthermo.boulder.nist.gov/ILT2/ilsearch'
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'responses.sqlite')
+
+
+def Body(i: int, size: int = 1000) -> bytes:
+    '''Returns incompressible response body of given size'''
+    return str(i).encode() + os.urandom(size)
+
+
+def test_get_set(path):
+    cache = ResponseCache(path)
+    assert cache.get(URL, {'cmp': 'water'}) is None
+    cache.set(URL, {'cmp': 'water'}, b'{"res": []}')
+    assert cache.get(URL, {'cmp': 'water'}) == b'{"res": []}'
+    assert cache.get(URL, {'cmp': 'ethanol'}) is None
+
+
+def test_ttl_expiry(path):
+    cache = ResponseCache(path, ttl = 0.2)
+    cache.set(URL, {'n': 1}, b'body')
+    assert cache.get(URL, {'n': 1}) == b'body'
+    time.sleep(0.3)
+    assert cache.get(URL, {'n': 1}) is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.expired, stats.entries) == (1, 1, 1, 0)
+
+
+def test_lru_eviction(path):
+    cache = ResponseCache(path, max_size = 3500, compression = 0)
+    for i in range(3):
+        cache.set(URL, {'n': i}, Body(i))
+        time.sleep(0.01)
+    # response 0 becomes the most recently used one
+    assert cache.get(URL, {'n': 0}) is not None
+    time.sleep(0.01)
+    cache.set(URL, {'n': 3}, Body(3))
+    assert cache.get(URL, {'n': 1}) is None
+    for i in (0, 2, 3):
+        assert cache.get(URL, {'n': i}) is not None
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.entries == 3
+    assert stats.size <= 3500
+
+
+def test_size_shared_by_processes(path):
+    first = ResponseCache(path, max_size = 3500, compression = 0)
+    second = ResponseCache(path, max_size = 3500, compression = 0)
+    for i in range(4):
+        (first if i % 2 else second).set(URL, {'n': i}, Body(i))
+        time.sleep(0.01)
+    assert first.stats().entries == 3
+    assert first.stats().size == second.stats().size <= 3500
+
+
+def test_check_update(path):
+    cache = ResponseCache(path)
+    cache.set(URL, None, b'body')
+    assert cache.check_update('2024-01-01')
+    assert cache.get(URL) is None
+    cache.set(URL, None, b'body')
+    assert not cache.check_update('2024-01-01')
+    assert cache.get(URL) == b'body'
+    # the stored date persists
+    assert not ResponseCache(path).check_update('2024-01-01')
+    assert ResponseCache(path).check_update('2024-06-01')
+    assert cache.stats().entries == 0
+
+
+def test_stats(path):
+    cache = ResponseCache(path, compression = 0)
+    cache.set(URL, {'n': 1}, b'x' * 100)
+    cache.get(URL, {'n': 1})
+    cache.get(URL, {'n': 1})
+    cache.get(URL, {'n': 2})
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 1, 1)
+    assert stats.hit_rate == pytest.approx(2/3)
+    assert stats.size > 100
+    cache.clear()
+    assert (cache.stats().entries, cache.stats().size) == (0, 0)
+
+
+def test_error_response_not_stored(path):
+    cache = ResponseCache(path)
+    cache.set(URL, {'n': 1}, json.dumps({'errors': ['Too many results']}).encode())
+    assert cache.get(URL, {'n': 1}) is None
+    body = json.dumps({'res': [['errors']], 'errors': []}).encode()
+    cache.set(URL, {'n': 2}, body)
+    assert cache.get(URL, {'n': 2}) == body
@@ -0,0 +1,75 @@
+'''HTTP client retries and response caching against the local fixture server'''
+
+import json
+
+import pytest
+import requests
+
+import ilthermopy.errors as err
+import ilthermopy.requests as req
+import ilthermopy.search as search
+from ilthermopy.cache import ResponseCache
+from ilthermopy.testing import Fixtures, FixtureServer
+
+
+SEARCH_PARAMS = req.SearchParams(n_compounds = 1)
+SEARCH_RESPONSE = {'res': [['S00001', 'Kabo et al. (2004)', 'Density', 'Liquid',
+                            'ABChct', None, None, '12', '1-butyl-3-methylimidazolium hexafluorophosphate']],
+                   'errors': []}
+
+
+@pytest.fixture
+def server(tmp_path):
+    fixtures = Fixtures(str(tmp_path / 'fixtures'))
+    fixtures.add('ilset', {'set': 'AAAAA'}, json.dumps({'title': 'Volumetric properties: Density'}).encode())
+    fixtures.add('ilsearch', SEARCH_PARAMS, json.dumps(SEARCH_RESPONSE).encode())
+    fixtures.add('ilsearch', req.SearchParams(n_compounds = 2), b'{"errors": ["Bad query"]}')
+    with FixtureServer(fixtures) as server:
+        yield server
+
+
+def test_retry_and_cache(server, tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    client = req.Client(base_url = server.base_url, retries = 3, backoff_factor = 0, cache = cache)
+    server.fail_next('ilset', 2)
+    assert req.GetEntryData('AAAAA', client)['title'] == 'Volumetric properties: Density'
+    assert server.requests['ilset'] == 3
+    # served from the cache
+    assert req.GetEntryData('AAAAA', client)['title'] == 'Volumetric properties: Density'
+    assert server.requests['ilset'] == 3
+    assert cache.stats().hits == 1
+    cache.close()
+
+
+def test_retries_exhausted(server):
+    client = req.Client(base_url = server.base_url, retries = 1, backoff_factor = 0)
+    server.fail_next('ilset', 2)
+    with pytest.raises(requests.HTTPError):
+        req.GetEntryData('AAAAA', client)
+    assert server.requests['ilset'] == 2
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_search(server, tmp_path, stream):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    client = req.Client(base_url = server.base_url, backoff_factor = 0, cache = cache)
+    for _ in range(2):
+        df = search.Search(n_compounds = 1, client = client, stream = stream)
+        assert df.columns.tolist() == search.SEARCH_COLUMNS
+        assert df['id'].tolist() == ['S00001']
+        assert df['num_data_points'].tolist() == [12]
+    assert server.requests['ilsearch'] == 1
+    with pytest.raises(err.ILThermoSearchError):
+        search.Search(n_compounds = 2, client = client, stream = stream)
+    cache.close()
+
+
+def test_get_all_entries_empty(tmp_path):
+    fixtures = Fixtures(str(tmp_path / 'fixtures'))
+    for i in (1,2,3):
+        fixtures.add('ilsearch', req.SearchParams(n_compounds = i), b'{"res": [], "errors": []}')
+    with FixtureServer(fixtures) as server:
+        client = req.Client(base_url = server.base_url, backoff_factor = 0)
+        df = search.GetAllEntries(client = client)
+    assert df.empty
+    assert df.columns.tolist() == search.SEARCH_COLUMNS
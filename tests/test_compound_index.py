@@ -0,0 +1,96 @@
+'''Offline lookups of compounds by ID, SMILES, formula, and name'''
+
+import pytest
+
+from ilthermopy.compound_list import Compounds
+from ilthermopy.compound_index import CompoundIndex, FormulaKey, FindCompounds
+
+
+RECORDS = [('ABChct', '1-butyl-3-methylimidazolium hexafluorophosphate', 'C8 F6 H15 N2 P',
+            'CCCC[n+]1ccn(C)c1.F[P-](F)(F)(F)(F)F'),
+           ('AAiERH', '1-ethyl-3-methylimidazolium dicyanamide', 'C8 H11 N5', 'CC[n+]1ccn(C)c1.N#C[N-]C#N'),
+           ('ABAeYk', '1-butyl-3-methylimidazolium chloride', 'C8 Cl H15 N2', 'CCCC[n+]1ccn(C)c1.[Cl-]'),
+           ('AAdMNH', 'water', 'H2 O', 'O'),
+           ('AAZFgW', 'ethanol', 'C2 H6 O', 'CCO'),
+           ('ABfqOv', 'dimethyl ether', 'C2 H6 O', 'COC'),
+           ('AAbpHs', 'sodium chloride', 'Cl Na', '[Na+].[Cl-]')]
+
+
+@pytest.fixture
+def index():
+    return CompoundIndex(Compounds(records = RECORDS))
+
+
+def ids(records):
+    return [record[0] for record in records]
+
+
+@pytest.mark.parametrize('formula, key', [('C8H15F6N2P', 'C8 F6 H15 N2 P'),
+                                          ('P N2 F6 H15 C8', 'C8 F6 H15 N2 P'),
+                                          ('C<SUB>8</SUB>H<SUB>15</SUB>F<SUB>6</SUB>N<SUB>2</SUB>P', 'C8 F6 H15 N2 P'),
+                                          ('H2O', 'H2 O'),
+                                          ('OH2', 'H2 O'),
+                                          ('C2H6O1', 'C2 H6 O'),
+                                          ('water', None),
+                                          ('', None)])
+def test_formula_key(formula, key):
+    assert FormulaKey(formula) == key
+
+
+def test_by_formula(index):
+    assert ids(index.by_formula('C8H15F6N2P')) == ['ABChct']
+    assert ids(index.by_formula('H15 C8 P F6 N2')) == ['ABChct']
+    # isomers
+    assert ids(index.by_formula('C2H6O')) == ['AAZFgW', 'ABfqOv']
+    assert index.by_formula('C9H15F6N2P') == []
+    assert index.by_formula('butyl') == []
+
+
+def test_by_id_and_smiles(index):
+    assert ids(index.by_id('AAdMNH')) == ['AAdMNH']
+    assert index.by_id('XXXXX') == []
+    assert ids(index.by_smiles('CCO')) == ['AAZFgW']
+    # ions of the salts
+    assert ids(index.by_smiles('[Cl-]')) == ['ABAeYk', 'AAbpHs']
+    assert ids(index.by_smiles('CCCC[n+]1ccn(C)c1')) == ['ABChct', 'ABAeYk']
+
+
+def test_by_name(index):
+    # exact match, then names starting with the fragment, then the others
+    assert ids(index.by_name('WATER')) == ['AAdMNH']
+    assert ids(index.by_name('chloride')) == ['AAbpHs', 'ABAeYk']
+    assert ids(index.by_name('methylimidazolium')) == ['ABAeYk', 'AAiERH', 'ABChct']
+    assert ids(index.by_name('ethanol')) == ['AAZFgW']
+    assert ids(index.by_name('et')) == ['AAZFgW', 'ABfqOv', 'ABAeYk', 'AAiERH', 'ABChct']
+    assert index.by_name('pyridinium') == []
+    assert index.by_name('  ') == []
+
+
+def test_find(index):
+    assert ids(index.find('AAdMNH')) == ['AAdMNH']
+    assert ids(index.find('O')) == ['AAdMNH']
+    assert ids(index.find('ClNa')) == ['AAbpHs']
+    assert ids(index.find('imidazolium', limit = 2)) == ['ABAeYk', 'AAiERH']
+    assert ids(index.find('chloride', kind = 'formula')) == []
+    with pytest.raises(ValueError):
+        index.find('water', kind = 'cas')
+
+
+def test_fuzzy(index):
+    found = index.fuzzy('1-butyl-3-metylimidazolium chlorid', limit = 3)
+    assert ids(record for record, score in found)[0] == 'ABAeYk'
+    scores = [score for record, score in found]
+    assert scores == sorted(scores, reverse = True)
+    assert 0.9 < scores[0] < 1
+    assert index.fuzzy('ethanol')[0] == (RECORDS[4], 1.0)
+    assert index.fuzzy('ethanol', min_score = 0.99) == [(RECORDS[4], 1.0)]
+    assert index.fuzzy('xyz') == []
+
+
+def test_find_compounds():
+    df = FindCompounds('C8H15F6N2P')
+    assert df.columns.tolist() == ['id', 'name', 'formula', 'smiles']
+    assert 'ABChct' in df['id'].tolist()
+    df = FindCompounds('1-butyl-3-methylimidazolium hexafluorphosphate', fuzzy = True, limit = 1)
+    assert df['id'].tolist() == ['ABChct']
+    assert df['score'].iloc[0] > 0.9
@@ -0,0 +1,27 @@
+'''Parsing of data entry API responses'''
+
+import numpy as np
+import pytest
+
+from ilthermopy.data_structs import ResponseToData
+from ilthermopy.errors import ILThermoResponseError
+
+from conftest import EntryResponse
+
+
+def test_response_to_data():
+    data, header = ResponseToData(EntryResponse('E0000', n_points = 4))
+    assert list(data.columns) == ['V1', 'V2', 'V3', 'V4', 'dV4']
+    assert data.shape == (4, 5)
+    assert all(dtype == np.float64 for dtype in data.dtypes)
+    assert data['V1'].tolist() == [100, 101, 102, 103]
+    assert data['dV4'].tolist() == [0.0001] * 4
+    assert header['V2'] == 'Mole fraction of water => Liquid'
+    assert header['dV4'] == 'Error of density, g/cm<SUP>3</SUP> => Liquid'
+
+
+def test_response_to_data_rejects_ragged_rows():
+    response = EntryResponse('E0000')
+    response['data'][1][3] = ['1.1']
+    with pytest.raises(ILThermoResponseError):
+        ResponseToData(response)
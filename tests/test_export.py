@@ -0,0 +1,86 @@
+'''Long-format table and Parquet export'''
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+from ilthermopy.data_structs import ResponseToEntry
+from ilthermopy.export import (LONG_COLUMNS, EntryToLongFormat, EntriesToLongFormat,
+                               LongFormatSchema, EntriesToRecordBatches, WriteParquet)
+
+from conftest import EntryResponse
+
+
+def Entry(code, n_points = 3, prop = 'Volumetric properties: Density'):
+    response = EntryResponse(code, n_points)
+    response['title'] = prop
+    return ResponseToEntry(code, response)
+
+
+def test_entry_to_long_format():
+    df = EntryToLongFormat(Entry('E0000'))
+    assert df.columns.tolist() == LONG_COLUMNS
+    assert df.shape[0] == 4 * 3
+    assert (df['entry_id'] == 'E0000').all()
+    assert (df['property'] == 'Density').all()
+    assert df['point'].tolist() == [0, 1, 2] * 4
+    assert df['variable'].unique().tolist() == ['Pressure', 'Mole fraction of water', 'Temperature', 'Density']
+    density = df[df['variable'] == 'Density']
+    assert density['unit'].tolist() == ['g/cm^3'] * 3
+    assert density['phase'].tolist() == ['Liquid'] * 3
+    assert density['value'].tolist() == pytest.approx([1.1, 1.11, 1.12])
+    assert density['error'].tolist() == pytest.approx([0.0001] * 3)
+    # values without error column
+    assert df[df['variable'] == 'Temperature']['error'].isna().all()
+    assert df[df['variable'] == 'Pressure']['value'].tolist() == [100, 101, 102]
+    assert (df['cmp2_id'] == 'AAdMNH').all()
+    assert df['cmp3_id'].isna().all()
+
+
+def test_empty_long_format():
+    assert EntriesToLongFormat([]).columns.tolist() == LONG_COLUMNS
+
+
+def test_record_batches():
+    entries = [Entry(f'E{i:04d}') for i in range(5)]
+    batches = list(EntriesToRecordBatches(entries, batch_rows = 20))
+    # entries are not split between batches
+    assert [batch.num_rows for batch in batches] == [24, 24, 12]
+    for batch in batches:
+        assert batch.schema.equals(LongFormatSchema())
+    table = pa.Table.from_batches(batches).to_pandas()
+    expected = EntriesToLongFormat(entries)
+    assert table['entry_id'].tolist() == expected['entry_id'].tolist()
+    np.testing.assert_array_equal(table['value'], expected['value'])
+
+
+def test_parquet_file_round_trip(tmp_path):
+    entries = [Entry(f'E{i:04d}') for i in range(3)]
+    path = str(tmp_path / 'entries.parquet')
+    assert WriteParquet(entries, path, partition_cols = None, batch_rows = 10) == 36
+    table = pq.read_table(path)
+    assert table.schema.equals(LongFormatSchema())
+    assert pq.ParquetFile(path).num_row_groups == 3
+    df = table.to_pandas()
+    expected = EntriesToLongFormat(entries)
+    assert df['entry_id'].tolist() == expected['entry_id'].tolist()
+    assert df['variable'].tolist() == expected['variable'].tolist()
+    np.testing.assert_array_equal(df['error'], expected['error'])
+
+
+def test_partitioned_dataset_replaces_partitions(tmp_path):
+    path = str(tmp_path / 'dataset')
+    viscosity = Entry('V0000', prop = 'Transport properties: Viscosity')
+    WriteParquet([viscosity, Entry('E0000'), Entry('E0001')], path)
+    # e.g. left by the previous export split into several files
+    partition = os.path.join(path, 'property=Density')
+    shutil.copy(os.path.join(partition, 'part-0.parquet'), os.path.join(partition, 'part-1.parquet'))
+    WriteParquet([Entry('E0002')], path)
+    df = pq.read_table(path).to_pandas()
+    assert sorted(df['entry_id'].unique()) == ['E0002', 'V0000']
+    assert sorted(df['property'].astype(str).unique()) == ['Density', 'Viscosity']
@@ -0,0 +1,70 @@
+'''Compound image cache and concurrent download'''
+
+import pytest
+
+import ilthermopy.requests as req
+from ilthermopy.cache import ResponseCache
+from ilthermopy.images import ImageCache, GetCompoundImages, PrefetchImages
+from ilthermopy.testing import Fixtures, FixtureServer
+
+
+PNG = b'\x89PNG\r\n\x1a\n'
+IMAGES = {'AAAAA': PNG + b'benzene', 'BBBBB': PNG + b'water', 'CCCCC': PNG + b'benzene'}
+
+
+@pytest.fixture
+def server(tmp_path):
+    fixtures = Fixtures(str(tmp_path / 'fixtures'))
+    for idout, content in IMAGES.items():
+        fixtures.add('ilimage', {'key': idout}, content, content_type = 'image/png')
+    with FixtureServer(fixtures) as server:
+        yield server
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ImageCache(str(tmp_path / 'images'))
+    yield cache
+    cache.close()
+
+
+def test_image_cache(cache):
+    assert cache.get('AAAAA') is None
+    digest = cache.set('AAAAA', IMAGES['AAAAA'])
+    assert cache.set('CCCCC', IMAGES['CCCCC']) == digest
+    assert cache.get('CCCCC') == IMAGES['AAAAA']
+    assert 'AAAAA' in cache and 'BBBBB' not in cache
+    # identical images are stored once
+    assert (len(cache), cache.num_files()) == (2, 1)
+
+
+def test_get_compound_images(server, cache):
+    client = req.Client(base_url = server.base_url, backoff_factor = 0)
+    ids = ['AAAAA', 'BBBBB', None, 'AAAAA', 'CCCCC', 'MISSING']
+    images = GetCompoundImages(ids, max_workers = 2, client = client, cache = cache)
+    assert list(images) == ['AAAAA', 'BBBBB', 'CCCCC', 'MISSING']
+    assert images['MISSING'] is None
+    for idout, content in IMAGES.items():
+        assert images[idout] == content
+    assert (len(cache), cache.num_files()) == (3, 2)
+    # cached images are not downloaded again
+    images = GetCompoundImages(['BBBBB', 'CCCCC'], client = client, cache = cache)
+    assert images['BBBBB'] == IMAGES['BBBBB']
+    assert server.requests['ilimage'] == 4
+
+
+def test_prefetch_images(server, cache):
+    client = req.Client(base_url = server.base_url, backoff_factor = 0)
+    cache.set('AAAAA', IMAGES['AAAAA'])
+    failed = PrefetchImages(['AAAAA', 'BBBBB', 'MISSING'], client = client, cache = cache)
+    assert list(failed) == ['MISSING']
+    assert server.requests['ilimage'] == 2
+    assert cache.get('BBBBB') == IMAGES['BBBBB']
+
+
+def test_response_cache_bypassed(server, cache, tmp_path):
+    responses = ResponseCache(str(tmp_path / 'responses.sqlite'))
+    client = req.Client(base_url = server.base_url, backoff_factor = 0, cache = responses)
+    GetCompoundImages(list(IMAGES), client = client, cache = cache)
+    assert responses.stats().entries == 0
+    responses.close()
@@ -0,0 +1,75 @@
+'''Equivalence of the incremental JSON parser with json.loads'''
+
+import json
+import random
+
+import pytest
+
+from ilthermopy.json_stream import IterArray
+
+
+def _Response(n_rows: int = 50, seed: int = 0) -> dict:
+    '''Returns search-like response with strings, numbers, literals, and nested values'''
+    rnd = random.Random(seed)
+    names = ['1-butyl-3-methylimidazolium chloride', 'тест "quoted" \\ name', 'naïve ☃ 𝄞', '']
+    rows = []
+    for i in range(n_rows):
+        rows.append([f'S{i:05d}', f'Author{i} et al. ({2000 + i % 20})', rnd.choice(names),
+                     rnd.choice([None, True, False]), rnd.uniform(-1e5, 1e5), rnd.randint(-10**12, 10**12),
+                     1500., 1e-7, {'nested': [1, [2, {'x': None}]], 'empty': {}}, []])
+    return {'errors': [], 'res': rows, 'after': {'n': n_rows, 'ok': True}}
+
+
+def _Split(content: bytes, rnd: random.Random) -> list:
+    '''Splits content into chunks at random positions, including empty chunks'''
+    cuts = sorted(rnd.randint(0, len(content)) for _ in range(rnd.randint(0, 40)))
+    bounds = [0] + cuts + [len(content)]
+    return [content[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_random_chunk_splits(indent):
+    response = _Response()
+    content = json.dumps(response, ensure_ascii = False, indent = indent).encode('utf-8')
+    rnd = random.Random(indent)
+    for _ in range(1000):
+        other = {}
+        rows = list(IterArray(_Split(content, rnd), 'res', other))
+        assert rows == response['res']
+        assert other == {'errors': [], 'after': response['after']}
+
+
+def test_single_byte_chunks():
+    response = _Response(n_rows = 5)
+    content = json.dumps(response, ensure_ascii = False).encode('utf-8')
+    other = {}
+    rows = list(IterArray([content[i:i+1] for i in range(len(content))], 'res', other))
+    assert rows == response['res']
+    assert other['after'] == response['after']
+
+
+def test_empty_array():
+    assert list(IterArray([b'{"res": [ ], "errors": []}'], 'res')) == []
+
+
+def test_missing_key_keeps_other_members():
+    other = {}
+    with pytest.raises(KeyError):
+        list(IterArray([b'{"errors": ["Bad ', b'query"]}'], 'res', other))
+    assert other == {'errors': ['Bad query']}
+
+
+def test_truncated_body():
+    content = json.dumps(_Response(n_rows = 3)).encode('utf-8')
+    with pytest.raises(json.JSONDecodeError):
+        list(IterArray([content[:len(content) // 2]], 'res'))
+
+
+def test_source_is_exhausted():
+    consumed = []
+    def chunks():
+        for chunk in (b'{"res": [1, 2]', b', "x": 1}', b' '):
+            consumed.append(chunk)
+            yield chunk
+    assert list(IterArray(chunks(), 'res')) == [1, 2]
+    assert len(consumed) == 3
@@ -0,0 +1,47 @@
+'''Offline search over the stored listing'''
+
+import pytest
+import pandas as pd
+
+import ilthermopy.search as search
+from ilthermopy.listing import LocalListing, SaveListing, LoadListing
+
+
+ROWS = [['S00001', 'Kabo et al. (2004)', 'Density', 'Liquid', 'ABChct', None, None, '12',
+         '1-butyl-3-methylimidazolium hexafluorophosphate'],
+        ['S00002', 'Smith et al. (2010)', 'Viscosity', 'Liquid', 'ABChct', 'AAdMNH', None, '5',
+         '1-butyl-3-methylimidazolium hexafluorophosphate', 'water'],
+        ['S00003', 'Kabo et al. (2010)', 'Viscosity', 'Liquid', 'AAdMNH', None, None, '7', 'water']]
+
+
+@pytest.fixture
+def listing():
+    return LocalListing(search._SearchItemsToFrame(ROWS))
+
+
+@pytest.mark.parametrize('filters, ids', [({}, ['S00001', 'S00002', 'S00003']),
+                                          ({'compound': 'METHYLIMIDAZOLIUM'}, ['S00001', 'S00002']),
+                                          ({'compound': 'C8H15F6N2P'}, ['S00001', 'S00002']),
+                                          ({'n_compounds': 1, 'prop': 'Viscosity'}, ['S00003']),
+                                          ({'year': 2010, 'author': 'kabo'}, ['S00003']),
+                                          ({'compound': 'chloride'}, [])])
+def test_filters(listing, filters, ids):
+    df = search.Search(offline = listing, **filters)
+    assert df['id'].tolist() == ids
+    assert df.columns.tolist() == search.SEARCH_COLUMNS
+
+
+def test_same_schema_as_remote(listing):
+    expected = search._SearchItemsToFrame(ROWS[1:])
+    pd.testing.assert_frame_equal(listing.search(prop = 'Viscosity'), expected)
+
+
+def test_unsupported_arguments(listing):
+    for kwargs in ({'keywords': 'ionic'}, {'prop': 'Unknown property'}, {'stream': True}):
+        with pytest.raises(ValueError):
+            search.Search(offline = listing, **kwargs)
+
+
+def test_save_and_load(tmp_path):
+    path = SaveListing(search._SearchItemsToFrame(ROWS), str(tmp_path / 'listing.sqlite'))
+    assert LoadListing(path).search(year = 2004)['id'].tolist() == ['S00001']
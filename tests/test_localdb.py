@@ -0,0 +1,86 @@
+'''Queries of the local database by data point values'''
+
+import pytest
+
+from ilthermopy.data_structs import ResponseToEntry
+from ilthermopy.localdb import LocalDatabase
+
+from conftest import EntryResponse
+
+
+def DensityEntry(code, unit = 'kPa', factor = 1.0):
+    '''Density entry with pressures 100, 101, 102 kPa given in the unit'''
+    response = EntryResponse(code)
+    response['dhead'][0] = [f'Pressure, {unit}']
+    for i, row in enumerate(response['data']):
+        row[0] = [f'{(100 + i) * factor:g}']
+    return ResponseToEntry(code, response)
+
+
+def EquilibriumEntry(code):
+    '''Vapor-liquid equilibrium entry with water mole fractions in both phases'''
+    response = EntryResponse(code)
+    response['title'] = 'Phase transition properties: Vapor-liquid equilibrium'
+    response['phases'] = ['Liquid', 'Gas']
+    response['dhead'] = [['Temperature, K'], ['Mole fraction of water', 'Liquid'],
+                         ['Mole fraction of water', 'Gas']]
+    response['data'] = [[['350'], ['0.1'], ['0.6']], [['360'], ['0.2'], ['0.4']]]
+    return ResponseToEntry(code, response)
+
+
+@pytest.fixture
+def db():
+    with LocalDatabase(':memory:') as db:
+        db.add([DensityEntry('K0001'), DensityEntry('M0001', 'MPa', 1e-3), EquilibriumEntry('V0001')])
+        yield db
+
+
+def test_si_conversion(db):
+    df = db.query(prop = 'Density', conditions = {'Pressure': (100.5e3, 102e3)})
+    assert df.index.tolist() == [('K0001', 1), ('K0001', 2), ('M0001', 1), ('M0001', 2)]
+    assert df['Pressure'].tolist() == pytest.approx([101e3, 102e3] * 2)
+    long = db.query(conditions = {'Pressure': (None, 100e3)}, wide = False)
+    pressure = long[long['variable'] == 'Pressure']
+    assert pressure['unit'].tolist() == ['kPa', 'MPa']
+    assert pressure['value'].tolist() == pytest.approx([100, 0.1])
+    assert set(pressure['si_unit']) == {'Pa'}
+
+
+def test_several_conditions(db):
+    conditions = {'Pressure': (100e3, 101e3), 'Temperature': (299, None)}
+    df = db.query(conditions = conditions)
+    assert df.index.tolist() == [('K0001', 1), ('M0001', 1)]
+
+
+def test_phase_conditions(db):
+    df = db.query(conditions = {('Mole fraction of water', 'Gas'): (0.5, None)})
+    assert df.index.tolist() == [('V0001', 0)]
+    # without phase, a value of either phase matches
+    df = db.query(conditions = {'Mole fraction of water': (0.35, 0.45)})
+    assert df.index.tolist() == [('V0001', 1)]
+
+
+def test_phase_qualified_columns(db):
+    df = db.query(prop = 'Vapor-liquid equilibrium')
+    assert sorted(df.columns) == ['Mole fraction of water => Gas', 'Mole fraction of water => Liquid',
+                                  'Temperature']
+    assert df['Mole fraction of water => Gas'].tolist() == [0.6, 0.4]
+    # the variable is given for single phase
+    df = db.query(prop = 'Density')
+    assert 'Mole fraction of water' in df.columns
+
+
+def test_empty_results(db):
+    assert db.query(prop = 'Viscosity').empty
+    assert db.query(conditions = {'Pressure': (1e9, None)}, wide = False).empty
+    assert db.entries(compound = 'chloride').empty
+    assert len(db.entries(compound = 'water')) == 3
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / 'points.sqlite')
+    with LocalDatabase(path) as db:
+        db.add([DensityEntry('K0001')])
+    with LocalDatabase(path) as db:
+        assert 'K0001' in db
+        assert db.query(conditions = {'Pressure': (101e3, 101e3)}).shape[0] == 1
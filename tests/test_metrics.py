@@ -0,0 +1,167 @@
+'''Instrumentation events, aggregation, and OpenTelemetry spans'''
+
+import pytest
+
+import ilthermopy.metrics as metrics
+from ilthermopy.data_structs import GetEntry
+from ilthermopy.metrics import Event, MetricsRegistry, Span, Instrument, Collect
+
+from conftest import ENTRY_IDS
+
+
+@pytest.fixture(autouse = True)
+def reset():
+    yield
+    for handler in list(metrics._handlers):
+        metrics.RemoveHandler(handler)
+    metrics.DisableOpenTelemetry()
+
+
+@Instrument('test.Divide', lambda result: {'items': 1})
+def Divide(a, b):
+    return a / b
+
+
+def test_events():
+    events = []
+    metrics.AddHandler(events.append)
+    with Span('test.span', bytes = 10) as span:
+        span.set(cached = True)
+    assert Divide(1, 2) == 0.5
+    assert [event.name for event in events] == ['test.span', 'test.Divide']
+    assert events[0].attributes == {'bytes': 10, 'cached': True}
+    assert events[1].attributes == {'items': 1}
+    assert all(event.error is None and event.duration >= 0 for event in events)
+
+
+def test_error_events():
+    events = []
+    metrics.AddHandler(events.append)
+    with pytest.raises(ValueError):
+        with Span('test.span'):
+            raise ValueError('failed')
+    with pytest.raises(ZeroDivisionError):
+        Divide(1, 0)
+    assert [(event.name, event.error) for event in events] == [('test.span', 'ValueError'),
+                                                               ('test.Divide', 'ZeroDivisionError')]
+
+
+def test_failing_handler_is_ignored():
+    def handler(event):
+        raise RuntimeError
+    events = []
+    metrics.AddHandler(handler)
+    metrics.AddHandler(events.append)
+    assert Divide(4, 2) == 2
+    assert len(events) == 1
+
+
+def test_no_events_after_remove_handler():
+    events = []
+    metrics.AddHandler(events.append)
+    Divide(1, 2)
+    metrics.RemoveHandler(events.append)
+    assert not metrics._active
+    assert Span('test.span') is metrics._NO_SPAN
+    with Span('test.span'):
+        pass
+    Divide(1, 2)
+    metrics._Record('test.record', 0.0, 1.0)
+    assert len(events) == 1
+    # removing an unknown handler is allowed
+    metrics.RemoveHandler(events.append)
+
+
+def test_summary():
+    registry = MetricsRegistry()
+    for event in (Event('a', 0.0, 0.1, {'bytes': 10, 'url': 'x'}),
+                  Event('a', 0.0, 0.3, {'bytes': 5, 'cached': True}),
+                  Event('b', 0.0, 0.5, error = 'HTTPError')):
+        registry(event)
+    df = registry.summary()
+    assert df.index.tolist() == ['b', 'a']
+    assert df.loc['a', 'count'] == 2 and df.loc['a', 'errors'] == 0
+    assert df.loc['b', 'errors'] == 1
+    assert df.loc['a', 'total_s'] == pytest.approx(0.4)
+    assert df.loc['a', 'mean_ms'] == pytest.approx(200)
+    assert (df.loc['a', 'min_ms'], df.loc['a', 'max_ms']) == pytest.approx((100, 300))
+    assert (df.loc['a', 'bytes'], df.loc['a', 'cached']) == (15, 1)
+    assert 'url' not in df
+    assert 'MB' in registry.report()
+    registry.reset()
+    assert registry.summary().empty
+    assert registry.report() == 'No instrumented operations were recorded'
+
+
+def test_collect(entry_client):
+    with Collect() as registry:
+        GetEntry(ENTRY_IDS[0], client = entry_client)
+    GetEntry(ENTRY_IDS[1], client = entry_client)
+    df = registry.summary()
+    for name in ('http.get', 'json.decode', 'api.GetEntryData', 'parse.ResponseToData', 'parse.ResponseToEntry'):
+        assert df.loc[name, 'count'] == 1
+    assert df.loc['http.get', 'bytes'] > 0
+    assert df.loc['parse.ResponseToData', 'items'] == 3
+    assert not metrics._active
+
+
+class StubSpan():
+    
+    def __init__(self, tracer, name, start_time = None):
+        self.tracer = tracer
+        self.name = name
+        self.start_time = start_time
+        self.end_time = None
+        self.attributes = {}
+        self.error = None
+    
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+    
+    def end(self, end_time = None):
+        self.end_time = end_time
+        self.tracer.finished.append(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.error = exc_type
+        self.end()
+        return False
+
+
+class StubTracer():
+    
+    def __init__(self):
+        self.finished = []
+    
+    def start_as_current_span(self, name):
+        return StubSpan(self, name)
+    
+    def start_span(self, name, start_time = None):
+        return StubSpan(self, name, start_time)
+
+
+def test_open_telemetry():
+    tracer = StubTracer()
+    metrics.EnableOpenTelemetry(tracer)
+    assert metrics._active
+    with Span('test.span', bytes = 10, url = 'x', extra = [1]) as span:
+        span.set(cached = False)
+    with pytest.raises(ZeroDivisionError):
+        Divide(1, 0)
+    metrics._Record('test.record', 1.5, 0.25, items = 3)
+    names = [span.name for span in tracer.finished]
+    assert names == ['test.span', 'test.Divide', 'test.record']
+    first, second, third = tracer.finished
+    # attributes of primitive types are prefixed
+    assert first.attributes == {'ilthermopy.bytes': 10, 'ilthermopy.url': 'x', 'ilthermopy.cached': False}
+    assert second.error is ZeroDivisionError
+    assert (third.start_time, third.end_time) == (1_500_000_000, 1_750_000_000)
+    assert third.attributes == {'ilthermopy.items': 3}
+    metrics.DisableOpenTelemetry()
+    assert not metrics._active
+    with Span('test.span'):
+        pass
+    assert len(tracer.finished) == 3
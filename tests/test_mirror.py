@@ -0,0 +1,61 @@
+'''Incremental synchronization of the local mirror'''
+
+import json
+
+import pytest
+
+import ilthermopy.search as search
+from ilthermopy.mirror import Mirror
+
+from conftest import ENTRY_IDS, EntryResponse
+
+
+def Listing(ids, n_points = None):
+    '''Returns GetAllEntries output listing entries with given IDs'''
+    n_points = n_points or {}
+    rows = [[code, 'Smith et al. (2004)', 'Density', 'Liquid', 'ABChct', 'AAdMNH', None,
+             str(n_points.get(code, 3)), '1-butyl-3-methylimidazolium hexafluorophosphate', 'water']
+            for code in ids]
+    return search._SearchItemsToFrame(rows)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    with Mirror(str(tmp_path / 'mirror.sqlite')) as mirror:
+        yield mirror
+
+
+def test_incremental_sync(mirror, entry_server, entry_client, fixtures):
+    progress = []
+    report = mirror.sync(client = entry_client, listing = Listing(ENTRY_IDS[:5]),
+                         progress = progress.append, checkpoint_every = 2)
+    assert (report.new, report.updated, report.removed, report.unchanged) == (5, 0, 0, 0)
+    assert sorted(mirror.ids()) == ENTRY_IDS[:5]
+    assert mirror.get_entry('E0002').num_data_points == 3
+    assert mirror.get_entry_data('E0002') == EntryResponse('E0002')
+    sizes = [len(fixtures.get('ilset', {'set': code})[2]) for code in ENTRY_IDS[:5]]
+    assert progress[-1].bytes == sum(sizes)
+    assert (progress[-1].done, progress[-1].total) == (5, 5)
+    # E0000 is delisted, E0001 is changed, E0005 is new
+    listing = Listing(ENTRY_IDS[1:6], n_points = {'E0001': 4})
+    fixtures.add('ilset', {'set': 'E0001'}, json.dumps(EntryResponse('E0001', 4)).encode())
+    report = mirror.sync(client = entry_client, listing = listing)
+    assert (report.new, report.updated, report.removed, report.unchanged) == (1, 1, 1, 3)
+    assert sorted(mirror.ids()) == ENTRY_IDS[1:6]
+    assert mirror.get_entry('E0001').num_data_points == 4
+    assert entry_server.requests['ilset'] == 7
+    assert mirror.listing()['id'].tolist() == ENTRY_IDS[1:6]
+
+
+def test_failed_entries_retried_on_resume(mirror, entry_server, entry_client, fixtures):
+    ids = ENTRY_IDS[:3] + ['E0100']
+    report = mirror.sync(client = entry_client, listing = Listing(ids))
+    assert (report.new, report.unchanged) == (3, 0)
+    assert list(report.failed) == ['E0100']
+    assert 'HTTPError' in report.failed['E0100']
+    assert 'E0100' not in mirror
+    fixtures.add('ilset', {'set': 'E0100'}, json.dumps(EntryResponse('E0100')).encode())
+    report = mirror.sync(client = entry_client, listing = Listing(ids))
+    assert (report.new, report.updated, report.unchanged) == (1, 0, 3)
+    assert not report.failed
+    assert mirror.get_entry('E0100').id == 'E0100'
@@ -0,0 +1,87 @@
+'''Parsing of stored responses in a process pool'''
+
+import gzip
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from ilthermopy.data_structs import CompressedResponse, ResponseToEntry
+from ilthermopy.errors import ILThermoResponseError
+from ilthermopy.parallel import ParsePayloads, ParsePayloadsToRecordBatches
+
+from conftest import ENTRY_IDS, EntryResponse
+
+
+@pytest.fixture
+def payloads(tmp_path):
+    '''Payloads of ENTRY_IDS entries in all supported formats'''
+    payloads = []
+    for i, code in enumerate(ENTRY_IDS):
+        response = EntryResponse(code, n_points = i + 1)
+        body = json.dumps(response).encode()
+        fmt = i % 6
+        if fmt == 0:
+            payloads.append( (code, response) )
+        elif fmt == 1:
+            payloads.append( (code, zlib.compress(body)) )
+        elif fmt == 2:
+            payloads.append( (code, gzip.compress(body)) )
+        elif fmt == 3:
+            payloads.append( (code, CompressedResponse(response)) )
+        else:
+            path = tmp_path / (f'{code}.json' if fmt == 4 else f'{code}.json.gz')
+            path.write_bytes(body if fmt == 4 else gzip.compress(body))
+            payloads.append(str(path))
+    return payloads
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_same_as_serial_parsing(payloads, max_workers):
+    results = list(ParsePayloads(payloads, max_workers = max_workers, chunksize = 3))
+    assert [parsed.id for parsed in results] == ENTRY_IDS
+    for i, parsed in enumerate(results):
+        assert parsed.ok
+        expected = ResponseToEntry(parsed.id, EntryResponse(parsed.id, n_points = i + 1))
+        entry = parsed.to_entry()
+        assert entry.data.equals(expected.data)
+        assert entry.header == expected.header
+        assert (entry.property, entry.ref.full, entry.num_data_points) == \
+               (expected.property, expected.ref.full, expected.num_data_points)
+        assert [c.id for c in entry.components] == [c.id for c in expected.components]
+
+
+def test_per_payload_errors(payloads):
+    ragged = EntryResponse('BAD02')
+    ragged['data'][0].pop()
+    bad = [('BAD00', b'not json'), ('BAD01', {'title': 'no data'}), ('BAD02', ragged)]
+    mixed = payloads[:2] + bad[:1] + payloads[2:4] + bad[1:] + payloads[4:]
+    results = list(ParsePayloads(mixed, max_workers = 2, chunksize = 2))
+    assert [parsed.id for parsed in results] == ENTRY_IDS[:2] + ['BAD00'] + ENTRY_IDS[2:4] + \
+                                                ['BAD01', 'BAD02'] + ENTRY_IDS[4:]
+    errors = {parsed.id: parsed.error for parsed in results if not parsed.ok}
+    assert sorted(errors) == ['BAD00', 'BAD01', 'BAD02']
+    assert errors['BAD01'].startswith('KeyError')
+    assert errors['BAD02'].startswith('ILThermoResponseError')
+    assert [parsed.id for parsed in results if parsed.ok] == ENTRY_IDS
+    with pytest.raises(ILThermoResponseError):
+        next(parsed for parsed in results if not parsed.ok).to_entry()
+
+
+def test_record_batches(payloads):
+    pa = pytest.importorskip('pyarrow')
+    from ilthermopy.export import EntriesToLongFormat, LongFormatSchema
+    batches = list(ParsePayloadsToRecordBatches(payloads, max_workers = 2, chunksize = 4))
+    assert len(batches) == 3
+    assert all(batch.schema.equals(LongFormatSchema()) for batch in batches)
+    df = pa.Table.from_batches(batches).to_pandas()
+    expected = EntriesToLongFormat(ResponseToEntry(code, EntryResponse(code, n_points = i + 1))
+                                   for i, code in enumerate(ENTRY_IDS))
+    assert df['entry_id'].tolist() == expected['entry_id'].tolist()
+    np.testing.assert_array_equal(df['value'], expected['value'])
+    bad = payloads[:2] + [('BAD00', b'not json')]
+    with pytest.raises(ILThermoResponseError):
+        list(ParsePayloadsToRecordBatches(bad, max_workers = 2, chunksize = 2))
+    batches = list(ParsePayloadsToRecordBatches(bad, max_workers = 2, chunksize = 2, skip_errors = True))
+    assert sum(batch.num_rows for batch in batches) == 4 * (1 + 2)
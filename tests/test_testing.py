@@ -0,0 +1,96 @@
+'''Recorded fixtures, record/replay transport, and the fixture server'''
+
+import json
+import time
+
+import pytest
+import requests
+
+import ilthermopy.requests as req
+import ilthermopy.search as search
+from ilthermopy.data_structs import GetEntry
+from ilthermopy.testing import Fixtures, FixtureServer, RecordingClient, ReplayClient
+
+from conftest import ENTRY_IDS, EntryResponse
+
+
+CMP_IDS = ['ABChct', 'AAdMNH', 'AAZFgW']
+CMP_NAMES = ['1-butyl-3-methylimidazolium hexafluorophosphate', 'water', 'ethanol']
+SEARCH_ROWS = {i: [[f'S0000{i}', 'Kabo et al. (2004)', 'Density', 'Liquid'] + CMP_IDS[:i] + [None] * (3 - i) +
+                   ['12'] + CMP_NAMES[:i]]
+               for i in (1,2,3)}
+
+
+def test_fixtures(tmp_path):
+    fixtures = Fixtures(str(tmp_path))
+    fixtures.add('ilset', {'set': 'E0000'}, b'{"data": []}')
+    fixtures.add('ilimage', {'key': 'AAAAA'}, b'\x89PNG\x00', content_type = 'image/png')
+    assert fixtures.get('ilset', {'set': 'E0000'}) == (200, 'application/json', b'{"data": []}')
+    assert fixtures.get('ilimage', {'key': 'AAAAA'}) == (200, 'image/png', b'\x89PNG\x00')
+    assert fixtures.get('ilset', {'set': 'E0001'}) is None
+    assert len(fixtures) == 2
+
+
+def test_record_replay(entry_server, tmp_path):
+    path = str(tmp_path / 'recorded')
+    with RecordingClient(path, base_url = entry_server.base_url) as client:
+        recorded = [GetEntry(code, client = client) for code in ENTRY_IDS[:3]]
+    assert len(Fixtures(path)) == 3
+    entry_server.stop()
+    # replayed requests go to the default host and match by endpoint and parameters
+    with ReplayClient(path) as client:
+        for entry in recorded:
+            replayed = GetEntry(entry.id, client = client)
+            assert replayed.data.equals(entry.data)
+            assert replayed.header == entry.header
+        with pytest.raises(requests.ConnectionError):
+            GetEntry(ENTRY_IDS[3], client = client)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_replay_search(tmp_path, stream):
+    fixtures = Fixtures(str(tmp_path))
+    for i, rows in SEARCH_ROWS.items():
+        fixtures.add('ilsearch', req.SearchParams(n_compounds = i), json.dumps({'res': rows, 'errors': []}).encode())
+    with ReplayClient(fixtures) as client:
+        df = search.Search(n_compounds = 2, client = client, stream = stream)
+        assert df['id'].tolist() == ['S00002']
+        df = search.GetAllEntries(client = client, stream = stream)
+        assert sorted(df['id']) == ['S00001', 'S00002', 'S00003']
+        assert df.columns.tolist() == search.SEARCH_COLUMNS
+
+
+def test_fail_next(entry_server):
+    entry_server.fail_next('ilset', 2)
+    with req.Client(base_url = entry_server.base_url, retries = 3, backoff_factor = 0) as client:
+        assert GetEntry(ENTRY_IDS[0], client = client).id == ENTRY_IDS[0]
+        assert entry_server.requests['ilset'] == 3
+        entry_server.fail_next('ilset', 4)
+        with pytest.raises(requests.RequestException):
+            GetEntry(ENTRY_IDS[0], client = client)
+        assert entry_server.requests['ilset'] == 3 + 4
+
+
+def test_error_rate(fixtures):
+    with FixtureServer(fixtures, error_rate = 0.3, seed = 1) as server, \
+         req.Client(base_url = server.base_url, retries = 10, backoff_factor = 0) as client:
+        entries = [GetEntry(code, client = client) for code in ENTRY_IDS]
+        assert [entry.id for entry in entries] == ENTRY_IDS
+        # failed requests are retried
+        assert server.requests['ilset'] > len(ENTRY_IDS)
+    with FixtureServer(fixtures, error_rate = 1.0, error_status = 500) as server, \
+         req.Client(base_url = server.base_url, retries = 2, backoff_factor = 0) as client:
+        with pytest.raises(requests.RequestException):
+            GetEntry(ENTRY_IDS[0], client = client)
+        assert server.requests['ilset'] == 3
+
+
+@pytest.mark.parametrize('latency, low, high', [(0.1, 0.1, 0.1), ((0.05, 0.15), 0.05, 0.15)])
+def test_latency(fixtures, latency, low, high):
+    with FixtureServer(fixtures, latency = latency, seed = 0) as server, \
+         req.Client(base_url = server.base_url) as client:
+        for code in ENTRY_IDS[:3]:
+            start = time.monotonic()
+            GetEntry(code, client = client)
+            elapsed = time.monotonic() - start
+            assert low <= elapsed < high + 0.5
@@ -0,0 +1,26 @@
+'''Parsing of column fullnames and conversion to SI units'''
+
+import copy
+import pickle
+import dataclasses
+
+import pytest
+
+from ilthermopy.units import ColumnInfo, ParseFullname
+
+
+def test_parse_fullname():
+    info = ParseFullname('Error of viscosity, Pa&#8226;s => Liquid')
+    assert info == ColumnInfo('Viscosity', 'Pa·s', 'Liquid', True)
+
+
+@pytest.mark.parametrize('clone', [lambda x: pickle.loads(pickle.dumps(x)),
+                                   lambda x: pickle.loads(pickle.dumps(x, protocol = 0)),
+                                   copy.copy, copy.deepcopy])
+def test_column_info_is_copyable(clone):
+    info = ParseFullname('Temperature, K')
+    cloned = clone(info)
+    assert cloned == info
+    assert not hasattr(cloned, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cloned.unit = 'C'